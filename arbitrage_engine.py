@@ -0,0 +1,297 @@
+"""
+Motor vetorizado de arbitragem para o OddsHunter
+
+Empacota o feed de odds em um layout ragged (vetores planos + offsets), que
+comporta mercados de larguras diferentes, e avalia todos os eventos de uma vez
+com NumPy. Uma odd só é válida acima de 1 (abaixo disso a aposta não devolve
+nem o valor apostado).
+
+O layout ragged faz o papel do tensor denso eventos × casas × resultados
+(NaN nos preços ausentes): as mesmas operações (melhor odd por resultado,
+soma das probabilidades, frações de stake) rodam sobre os preços cotados,
+sem alocar casas × resultados para cada evento nem limitar os mercados à
+largura do maior deles.
+"""
+import time
+import numpy as np
+from arbitrage_opportunity import Oportunidade
+
+
+def montar_oportunidade(evento, nomes_resultados, nomes_casas, odds, fracoes_stake, soma, agora, lucro_percentual=None):
+    """Monta uma Oportunidade a partir das apostas e dos metadados do evento (lucro padrão: o das odds)"""
+    if lucro_percentual is None:
+        lucro_percentual = (1 - soma) * 100
+    return Oportunidade(
+        nomes_casas, nomes_resultados, odds, fracoes_stake, float(soma), float(lucro_percentual),
+        timestamp=agora, **evento
+    )
+
+
+def avaliar_mercados_ragged(odds, offsets, investimento_total=100):
+    """
+    Avalia a arbitragem de vários mercados de larguras diferentes em uma única chamada
+
+    As odds de todos os mercados ficam concatenadas em um vetor plano; o mercado m
+    ocupa odds[offsets[m]:offsets[m + 1]]. Assim mercados de 2, 3 ou N resultados
+    (placar exato, primeiro marcador, sets de tênis) seguem o mesmo caminho vetorizado.
+
+    Args:
+        odds: Vetor plano com a melhor odd de cada resultado (NaN se ausente)
+        offsets: Vetor com len(mercados) + 1 posições de início no vetor de odds
+        investimento_total: Valor total a ser distribuído em cada mercado
+
+    Returns:
+        dict: Resultado colunar
+            oportunidade: máscara booleana dos mercados com arbitragem
+            soma_probabilidades: soma das probabilidades implícitas de cada mercado
+            lucro_percentual: lucro garantido em %
+            retorno_garantido: retorno garantido para o investimento informado
+            investimento_total: soma dos stakes de cada mercado
+            stakes: vetor plano (mesmo layout de `odds`) com o stake sugerido
+            fracoes_stake: vetor plano com a fração do investimento em cada aposta
+            retorno_por_unidade: retorno garantido por unidade investida
+    """
+    odds = np.asarray(odds, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    larguras = np.diff(offsets)
+    n_mercados = len(larguras)
+    id_mercado = np.repeat(np.arange(n_mercados), larguras)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        odd_valida = odds > 1
+        probs = np.where(odd_valida, 1.0 / odds, 0.0)
+    # bincount lida com mercados vazios, ao contrário de np.add.reduceat
+    soma = np.bincount(id_mercado, weights=probs, minlength=n_mercados).astype(float)
+    invalidas = np.bincount(id_mercado, weights=~odd_valida, minlength=n_mercados)
+
+    oportunidade = (larguras >= 2) & (invalidas == 0) & (soma < 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        retorno_por_unidade = np.where(oportunidade, 1.0 / soma, np.nan)
+    fracoes = retorno_por_unidade[id_mercado] * probs
+
+    return {
+        "oportunidade": oportunidade,
+        "soma_probabilidades": soma,
+        "lucro_percentual": (1 - soma) * 100,
+        "retorno_garantido": retorno_por_unidade * investimento_total,
+        "investimento_total": np.where(oportunidade, investimento_total, np.nan),
+        "stakes": fracoes * investimento_total,
+        "fracoes_stake": fracoes,
+        "retorno_por_unidade": retorno_por_unidade
+    }
+
+
+def verificar_arbitragem_n_vias(odds, nomes_casas, nomes_resultados):
+    """
+    Verifica arbitragem em um único mercado com qualquer número de resultados
+
+    Args:
+        odds: Lista com a odd de cada resultado
+        nomes_casas: Lista com a casa de cada odd
+        nomes_resultados: Lista com o nome de cada resultado
+
+    Returns:
+        Oportunidade: Oportunidade encontrada ou None se não houver arbitragem
+    """
+    resultado = avaliar_mercados_ragged(odds, [0, len(odds)])
+    if not resultado["oportunidade"][0]:
+        return None
+    return montar_oportunidade(
+        {}, nomes_resultados, nomes_casas, list(odds), resultado["fracoes_stake"].tolist(),
+        resultado["soma_probabilidades"][0], time.time()
+    )
+
+
+def montar_mercados_ragged(dados_odds_api):
+    """
+    Empacota o feed de odds (formato `odds_por_casa`) no layout ragged
+
+    Cada resultado de cada evento vira um "slot"; os preços de todas as casas
+    ficam em vetores planos de entradas (preço, casa, slot).
+
+    Args:
+        dados_odds_api: Lista de eventos no formato do odds_api_simulator
+
+    Returns:
+        dict: Layout ragged e metadados
+            precos, codigo_casa, slot: vetores planos com uma entrada por preço cotado
+            offsets: posições de início dos slots de cada evento (len(eventos) + 1)
+            resultados: Lista com os nomes dos resultados de cada evento
+            casas: Lista de nomes de casas indexada por `codigo_casa`
+            eventos: Lista de dicts com os metadados de cada evento
+    """
+    eventos = []
+    resultados = []
+    casas = []
+    indice_casas = {}
+    precos, codigo_casa, slot = [], [], []
+    offsets = [0]
+
+    for evento_data in dados_odds_api:
+        odds_por_casa = evento_data.get("odds_por_casa") or []
+        if not odds_por_casa:
+            continue
+        base = offsets[-1]
+        nomes_resultados = list(odds_por_casa[0]["odds"].keys())
+        posicao_resultado = {nome: base + j for j, nome in enumerate(nomes_resultados)}
+        for casa_odds in odds_por_casa:
+            nome_casa = casa_odds["nome_casa"]
+            codigo = indice_casas.get(nome_casa)
+            if codigo is None:
+                codigo = indice_casas[nome_casa] = len(casas)
+                casas.append(nome_casa)
+            for resultado, odd in casa_odds["odds"].items():
+                s = posicao_resultado.get(resultado)
+                if s is None:
+                    continue
+                precos.append(odd)
+                codigo_casa.append(codigo)
+                slot.append(s)
+        eventos.append({
+            "id_evento": evento_data["id_evento"],
+            "descricao_evento": evento_data["descricao_evento"],
+            "esporte": evento_data["esporte"],
+            "liga": evento_data["liga"]
+        })
+        resultados.append(nomes_resultados)
+        offsets.append(base + len(nomes_resultados))
+
+    return {
+        "precos": np.asarray(precos, dtype=float),
+        "codigo_casa": np.asarray(codigo_casa, dtype=np.int32),
+        "slot": np.asarray(slot, dtype=np.intp),
+        "offsets": np.asarray(offsets, dtype=np.intp),
+        "resultados": resultados,
+        "casas": casas,
+        "eventos": eventos
+    }
+
+
+def montar_mercados_de_linhas(linhas):
+    """
+    Empacota linhas de odds no formato interno das fontes (odds_sources) no layout ragged
+
+    Linhas de fontes diferentes com o mesmo `id_evento` caem no mesmo mercado;
+    os resultados ficam na ordem em que aparecem pela primeira vez. Linhas com
+    `posicao` são agrupadas pela posição do resultado (nomes repetidos como
+    'Sim/Sim' não se misturam); as demais, pelo nome.
+
+    Args:
+        linhas: Iterável de dicts com id_evento, resultado, posicao (opcional), casa, odd e metadados do evento
+
+    Returns:
+        dict: Mesmo layout de montar_mercados_ragged
+    """
+    eventos = []
+    resultados = []
+    posicoes = {}        # id_evento -> {posição na fonte ou nome do resultado: posição local}
+    indice_evento = {}   # id_evento -> índice em `eventos`
+    casas = []
+    indice_casas = {}
+    entradas = []        # (evento, posição local, preço, casa)
+
+    for linha in linhas:
+        id_evento = linha['id_evento']
+        e = indice_evento.get(id_evento)
+        if e is None:
+            e = indice_evento[id_evento] = len(eventos)
+            eventos.append({
+                campo: linha.get(campo, '') for campo in ('id_evento', 'descricao_evento', 'esporte', 'liga')
+            })
+            resultados.append([])
+            posicoes[id_evento] = {}
+        posicao_resultado = posicoes[id_evento]
+        chave = linha['resultado'] if linha.get('posicao') is None else ('posicao', linha['posicao'])
+        p = posicao_resultado.get(chave)
+        if p is None:
+            p = posicao_resultado[chave] = len(resultados[e])
+            resultados[e].append(linha['resultado'])
+        codigo = indice_casas.get(linha['casa'])
+        if codigo is None:
+            codigo = indice_casas[linha['casa']] = len(casas)
+            casas.append(linha['casa'])
+        entradas.append((e, p, linha['odd'], codigo))
+
+    offsets = np.zeros(len(eventos) + 1, dtype=np.intp)
+    offsets[1:] = np.cumsum([len(r) for r in resultados])
+    if entradas:
+        evento, posicao, precos, codigo_casa = (np.asarray(coluna) for coluna in zip(*entradas))
+    else:
+        evento = posicao = codigo_casa = np.array([], dtype=np.intp)
+        precos = np.array([])
+    return {
+        "precos": precos.astype(float),
+        "codigo_casa": codigo_casa.astype(np.int32),
+        "slot": (offsets[evento] + posicao).astype(np.intp),
+        "offsets": offsets,
+        "resultados": resultados,
+        "casas": casas,
+        "eventos": eventos
+    }
+
+
+def melhores_precos_ragged(mercados):
+    """
+    Seleciona a melhor odd (e a casa) de cada slot do layout ragged
+
+    Em caso de empate vence a primeira casa cotada, como no cálculo original.
+    Odds até 1 são ignoradas, como em avaliar_mercados_ragged.
+
+    Args:
+        mercados: Resultado de montar_mercados_ragged
+
+    Returns:
+        tuple: (melhores_odds, codigo_casa) com um valor por slot; NaN/-1 se o slot não tiver preço
+    """
+    n_slots = int(mercados["offsets"][-1])
+    precos = mercados["precos"]
+    melhores = np.full(n_slots, np.nan)
+    codigo_casa = np.full(n_slots, -1, dtype=np.int32)
+
+    validos = np.flatnonzero(precos > 1)
+    if len(validos):
+        slot = mercados["slot"][validos]
+        # Ordena por slot, odd decrescente e ordem de chegada: a primeira entrada de cada slot é a melhor
+        ordem = validos[np.lexsort((validos, -precos[validos], slot))]
+        slot_ordenado = mercados["slot"][ordem]
+        primeiros = np.flatnonzero(np.r_[True, slot_ordenado[1:] != slot_ordenado[:-1]])
+        escolhidos = ordem[primeiros]
+        melhores[slot_ordenado[primeiros]] = precos[escolhidos]
+        codigo_casa[slot_ordenado[primeiros]] = mercados["codigo_casa"][escolhidos]
+    return melhores, codigo_casa
+
+
+def ragged_para_oportunidades(mercados, melhores_odds, codigo_casa, resultado, mascara=None):
+    """
+    Converte os mercados selecionados do resultado ragged em objetos Oportunidade
+
+    Args:
+        mercados: Resultado de montar_mercados_ragged
+        melhores_odds: Melhor odd de cada slot (melhores_precos_ragged)
+        codigo_casa: Casa da melhor odd de cada slot (melhores_precos_ragged)
+        resultado: Resultado de avaliar_mercados_ragged
+        mascara: Máscara booleana adicional sobre os mercados (opcional)
+
+    Returns:
+        list: Lista de Oportunidade
+    """
+    selecionados = resultado["oportunidade"]
+    if mascara is not None:
+        selecionados = selecionados & mascara
+
+    offsets = mercados["offsets"]
+    casas = mercados["casas"]
+    agora = time.time()
+    oportunidades = []
+    for m in np.flatnonzero(selecionados):
+        ini, fim = offsets[m], offsets[m + 1]
+        oportunidades.append(montar_oportunidade(
+            mercados["eventos"][m],
+            mercados["resultados"][m],
+            [casas[c] for c in codigo_casa[ini:fim].tolist()],
+            melhores_odds[ini:fim].tolist(),
+            resultado["fracoes_stake"][ini:fim].tolist(),
+            resultado["soma_probabilidades"][m],
+            agora
+        ))
+    return oportunidades
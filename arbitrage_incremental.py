@@ -0,0 +1,380 @@
+"""
+Recálculo incremental de arbitragem a partir de variações de odds
+
+Mantém o melhor preço de cada (evento, resultado) e recalcula soma de
+probabilidades e frações de stake apenas dos eventos tocados por uma atualização.
+"""
+import time
+from itertools import repeat
+from arbitrage_engine import montar_oportunidade
+from arbitrage_ingest import montar_frame_surebets, odds_do_frame, lucro_do_frame, NOMES_PADRAO
+
+
+def posicao_resultado(nomes, resultado):
+    """
+    Posição de um resultado na lista de nomes do mercado
+
+    Args:
+        nomes: Nomes dos resultados do evento; nomes e posições novos são acrescentados no fim
+        resultado: Nome do resultado ou a sua posição (int)
+
+    Returns:
+        int: Posição do resultado
+    """
+    if isinstance(resultado, int):
+        while len(nomes) <= resultado:
+            nomes.append(f'Resultado {len(nomes) + 1}')
+        return resultado
+    if resultado not in nomes:
+        nomes.append(resultado)
+    return nomes.index(resultado)
+
+
+class MotorIncrementalArbitragem:
+    """
+    Mantém o estado de preços por evento/resultado/casa e as oportunidades atuais
+
+    Cada atualização é uma tupla (evento, casa, resultado, odd); odd None ou <= 0
+    remove o preço daquela casa. O resultado é o nome ou a posição (int) no
+    mercado: os documentos de surebet usam a posição, porque a `linha` pode
+    repetir nomes (ex: 'Sim/Sim'). O custo de aplicar um lote é proporcional
+    aos eventos alterados, não ao total de eventos conhecidos.
+    """
+
+    def __init__(self):
+        """Inicializa o motor sem nenhum evento"""
+        self._precos = {}        # evento -> {posição do resultado: {casa: odd}}
+        self._melhores = {}      # evento -> {posição do resultado: (odd, casa)}
+        self._resultados = {}    # evento -> nomes dos resultados, na ordem do mercado
+        self._metadados = {}     # evento -> dict com descrição, esporte, liga...
+        self._lucros = {}        # evento -> lucro informado pela fonte
+        self._oportunidades = {} # evento -> oportunidade atual
+
+    def definir_evento(self, id_evento, resultados=None, lucro_percentual=None, **metadados):
+        """
+        Registra (ou atualiza) os metadados e a lista de resultados de um evento
+
+        Args:
+            id_evento: Identificador do evento
+            resultados: Lista ordenada com os resultados do mercado (opcional)
+            lucro_percentual: Lucro informado pela fonte, usado no lugar do calculado pelas
+                odds (ex: `lucro_percentual` do documento de surebet, como na leitura completa)
+            **metadados: Campos copiados para a oportunidade (descricao_evento, esporte, liga...)
+        """
+        self._metadados.setdefault(id_evento, {"id_evento": id_evento}).update(metadados)
+        if resultados is not None:
+            self._resultados[id_evento] = list(resultados)
+        else:
+            self._resultados.setdefault(id_evento, [])
+        if lucro_percentual is not None:
+            self._lucros[id_evento] = lucro_percentual
+        self._precos.setdefault(id_evento, {})
+        self._melhores.setdefault(id_evento, {})
+
+    def remover_evento(self, id_evento):
+        """
+        Remove um evento e todo o seu estado
+
+        Returns:
+            bool: True se o evento tinha uma oportunidade ativa
+        """
+        self._descartar(id_evento)
+        return self._oportunidades.pop(id_evento, None) is not None
+
+    def _descartar(self, id_evento):
+        """Apaga preços, resultados e metadados de um evento (a oportunidade fica)"""
+        for estado in (self._precos, self._melhores, self._resultados, self._metadados, self._lucros):
+            estado.pop(id_evento, None)
+
+    def _aplicar_preco(self, id_evento, casa, resultado, odd):
+        """Atualiza o preço de uma casa e o melhor preço do resultado"""
+        if id_evento not in self._precos:
+            self.definir_evento(id_evento)
+        resultado = posicao_resultado(self._resultados[id_evento], resultado)
+
+        precos_resultado = self._precos[id_evento].setdefault(resultado, {})
+        melhores = self._melhores[id_evento]
+        melhor = melhores.get(resultado)
+
+        if odd is None or odd <= 0:
+            precos_resultado.pop(casa, None)
+        else:
+            precos_resultado[casa] = odd
+            if melhor is None or odd > melhor[0]:
+                melhores[resultado] = (odd, casa)
+                return
+            if melhor[1] != casa:
+                return
+
+        # A melhor casa piorou ou saiu: só então é preciso varrer as casas do resultado
+        if melhor is not None and melhor[1] == casa:
+            if precos_resultado:
+                casa_melhor = max(precos_resultado, key=precos_resultado.get)
+                melhores[resultado] = (precos_resultado[casa_melhor], casa_melhor)
+            else:
+                del melhores[resultado]
+
+    def _recalcular_evento(self, id_evento, agora):
+        """Recalcula a oportunidade de um evento a partir dos melhores preços"""
+        resultados = self._resultados.get(id_evento, [])
+        melhores = self._melhores.get(id_evento, {})
+        posicoes = range(len(resultados))
+        if len(resultados) < 2 or any(p not in melhores for p in posicoes):
+            return None
+
+        odds = [melhores[p][0] for p in posicoes]
+        soma = sum(1.0 / odd for odd in odds)
+        if soma >= 1:
+            return None
+
+        return montar_oportunidade(
+            self._metadados[id_evento], resultados, [melhores[p][1] for p in posicoes],
+            odds, [1.0 / (odd * soma) for odd in odds], soma, agora,
+            lucro_percentual=self._lucros.get(id_evento)
+        )
+
+    def aplicar_atualizacoes(self, atualizacoes, substituidos=(), removidos=()):
+        """
+        Aplica um lote de variações de preço e recalcula só os eventos tocados
+
+        Args:
+            atualizacoes: Iterável de tuplas (evento, casa, resultado, odd)
+            substituidos: Eventos reenviados por inteiro: os preços anteriores são descartados antes do lote
+            removidos: Eventos que deixaram de existir
+
+        Returns:
+            dict: Variações do conjunto de oportunidades
+                adicionadas: Lista de oportunidades novas
+                alteradas: Lista de oportunidades cujo preço ou casa mudou
+                removidas: Lista de ids de eventos que deixaram de ter arbitragem
+        """
+        tocados = set()
+        for id_evento in removidos:
+            # A oportunidade fica até _recalcular, que a reporta como removida
+            self._descartar(id_evento)
+            tocados.add(id_evento)
+        for id_evento in substituidos:
+            if id_evento in self._precos:
+                self._precos[id_evento] = {}
+                self._melhores[id_evento] = {}
+            tocados.add(id_evento)
+        for id_evento, casa, resultado, odd in atualizacoes:
+            self._aplicar_preco(id_evento, casa, resultado, odd)
+            tocados.add(id_evento)
+        return self._recalcular(tocados)
+
+    def _recalcular(self, tocados):
+        """Recalcula os eventos informados e devolve as variações"""
+        variacoes = {"adicionadas": [], "alteradas": [], "removidas": []}
+        agora = time.time()
+        for id_evento in tocados:
+            anterior = self._oportunidades.get(id_evento)
+            atual = self._recalcular_evento(id_evento, agora)
+            if atual is None:
+                if anterior is not None:
+                    del self._oportunidades[id_evento]
+                    variacoes["removidas"].append(id_evento)
+                continue
+            self._oportunidades[id_evento] = atual
+            if anterior is None:
+                variacoes["adicionadas"].append(atual)
+            elif _assinatura(anterior) != _assinatura(atual):
+                variacoes["alteradas"].append(atual)
+            else:
+                # Mantém o timestamp original quando nada relevante mudou
+                atual.timestamp = anterior.timestamp
+        return variacoes
+
+    @property
+    def oportunidades(self):
+        """Lista com as oportunidades ativas"""
+        return list(self._oportunidades.values())
+
+    def __len__(self):
+        return len(self._oportunidades)
+
+
+def _assinatura(oportunidade):
+    """Campos que definem se uma oportunidade mudou"""
+    return (oportunidade.casas, oportunidade.resultados, oportunidade.odds)
+
+
+def aplicar_documentos(motor, documentos=(), removidos=()):
+    """
+    Aplica documentos de surebet novos/alterados e remoções a um motor com um evento por documento
+
+    O id do evento é str(_id): um documento reenviado substitui os preços
+    anteriores do mesmo evento em vez de somar a eles. O lucro e as regras de
+    erro são os da leitura completa (avaliar_frame_surebets): vale o
+    `lucro_percentual` do documento, e documentos com lucro em texto não
+    numérico (ex: '4,76') não viram oportunidade.
+
+    Args:
+        motor: MotorIncrementalArbitragem
+        documentos: Documentos inseridos ou alterados (versão completa)
+        removidos: _id dos documentos removidos
+
+    Returns:
+        dict: Variações do conjunto de oportunidades (ver aplicar_atualizacoes)
+    """
+    documentos = list(documentos)
+    atualizacoes = atualizacoes_de_frame(montar_frame_surebets(documentos), motor=motor, lucro_informado=True) if documentos else []
+    return motor.aplicar_atualizacoes(
+        atualizacoes,
+        substituidos=[str(documento.get('_id', '')) for documento in documentos],
+        removidos=[str(chave) for chave in removidos]
+    )
+
+
+def atualizacoes_do_feed(dados_odds_api, motor=None):
+    """
+    Converte o feed no formato `odds_por_casa` em tuplas de atualização
+
+    Se um motor for informado, os metadados e resultados de cada evento são
+    registrados nele antes das atualizações.
+
+    Args:
+        dados_odds_api: Lista de eventos no formato do odds_api_simulator
+        motor: Instância de MotorIncrementalArbitragem (opcional)
+
+    Returns:
+        list: Lista de tuplas (evento, casa, resultado, odd)
+    """
+    atualizacoes = []
+    for evento_data in dados_odds_api:
+        odds_por_casa = evento_data.get("odds_por_casa") or []
+        if not odds_por_casa:
+            continue
+        id_evento = evento_data["id_evento"]
+        if motor is not None:
+            motor.definir_evento(
+                id_evento,
+                resultados=list(odds_por_casa[0]["odds"].keys()),
+                descricao_evento=evento_data["descricao_evento"],
+                esporte=evento_data["esporte"],
+                liga=evento_data["liga"]
+            )
+        for casa_odds in odds_por_casa:
+            for resultado, odd in casa_odds["odds"].items():
+                atualizacoes.append((id_evento, casa_odds["nome_casa"], resultado, odd))
+    return atualizacoes
+
+
+def atualizacoes_de_documentos(documentos, motor=None, chave_evento=None):
+    """
+    Converte documentos de surebet do MongoDB (odd_1/casa_1...) em tuplas de atualização
+
+    Por padrão cada documento vira um evento identificado pelo seu `_id`.
+    Documentos com odds em formato inválido são ignorados. O resultado de cada
+    tupla é a posição da odd no documento (os nomes vão para definir_evento).
+
+    Args:
+        documentos: Iterável de documentos de surebet
+        motor: Objeto com definir_evento (ex: MotorIncrementalArbitragem) para registrar os metadados
+        chave_evento: Função documento -> id do evento (opcional, padrão: str(_id))
+
+    Returns:
+        list: Lista de tuplas (evento, casa, posição do resultado, odd)
+    """
+    atualizacoes = []
+    for item in documentos:
+        odds = []
+        k = 1
+        try:
+            while item.get(f'odd_{k}'):
+                odds.append((float(str(item[f'odd_{k}']).replace(',', '.')), item.get(f'casa_{k}', '')))
+                k += 1
+        except (ValueError, TypeError):
+            continue
+        if len(odds) < 2:
+            continue
+
+        nomes_resultados = str(item.get('linha', '')).split('/')
+        if len(nomes_resultados) < len(odds):
+            nomes_resultados = NOMES_PADRAO.get(len(odds), [f'Resultado {j + 1}' for j in range(len(odds))])
+        nomes_resultados = nomes_resultados[:len(odds)]
+
+        id_evento = chave_evento(item) if chave_evento else str(item.get('_id', ''))
+        if motor is not None:
+            motor.definir_evento(
+                id_evento,
+                resultados=nomes_resultados,
+                descricao_evento=item.get('evento', item.get('times', '')),
+                esporte=item.get('esporte', ''),
+                liga=item.get('liga', ''),
+                data_hora_evento=item.get('data_hora', ''),
+                data_extracao=item.get('data_extracao', '')
+            )
+        for posicao, (odd, casa) in enumerate(odds):
+            atualizacoes.append((id_evento, casa, posicao, odd))
+    return atualizacoes
+
+
+def atualizacoes_de_frame(frame, motor=None, campos_chave=None, lucro_informado=False):
+    """
+    Versão colunar de atualizacoes_de_documentos para um frame de surebets
+
+    As odds são convertidas de uma vez (odds_do_frame); só a montagem das
+    tuplas e o registro dos metadados percorrem as linhas.
+
+    Args:
+        frame: DataFrame de surebets (ex: montar_frame_surebets)
+        motor: Objeto com definir_evento para registrar os metadados
+        campos_chave: Colunas unidas com "|" como id do evento (opcional, padrão: _id)
+        lucro_informado: Passar o `lucro_percentual` de cada linha para definir_evento e
+            descartar as linhas com lucro inválido, como na leitura completa (lucro_do_frame)
+
+    Returns:
+        list: Lista de tuplas (evento, casa, posição do resultado, odd)
+    """
+    odds, n_resultados, com_erro = odds_do_frame(frame)
+    linhas = (n_resultados >= 2) & ~com_erro
+    if lucro_informado:
+        lucro, lucro_invalido = lucro_do_frame(frame)
+        linhas &= ~lucro_invalido
+    if not linhas.any():
+        return []
+    frame = frame[linhas]
+    odds = odds[linhas].tolist()
+    n_resultados = n_resultados[linhas].tolist()
+    lucros = lucro[linhas].tolist() if lucro_informado else repeat(None)
+
+    def coluna(campo, padrao=''):
+        if campo not in frame.columns:
+            return [padrao] * len(frame)
+        serie = frame[campo]
+        return serie.astype(object).where(serie.notna(), padrao).tolist()
+
+    if campos_chave:
+        ids = ['|'.join(map(str, valores)) for valores in zip(*(coluna(campo) for campo in campos_chave))]
+    else:
+        ids = [str(valor) for valor in coluna('_id')]
+    casas = zip(*(coluna(f'casa_{k}') for k in range(1, len(odds[0]) + 1)))
+    # Sem `evento` no documento a descrição vem de `times`, como em atualizacoes_de_documentos
+    descricoes = [evento if evento is not None else times for evento, times in zip(coluna('evento', None), coluna('times'))]
+    metadados = zip(descricoes, coluna('esporte'), coluna('liga'), coluna('data_hora'), coluna('data_extracao'))
+
+    atualizacoes = []
+    nomes_por_linha = {}
+    for id_evento, n, linha, odds_linha, casas_linha, lucro_linha, (descricao, esporte, liga, data_hora, data_extracao) in zip(
+            ids, n_resultados, coluna('linha'), odds, casas, lucros, metadados):
+        nomes_resultados = nomes_por_linha.get((linha, n))
+        if nomes_resultados is None:
+            nomes_resultados = str(linha).split('/')
+            if len(nomes_resultados) < n:
+                nomes_resultados = NOMES_PADRAO.get(n, [f'Resultado {j + 1}' for j in range(n)])
+            nomes_resultados = nomes_por_linha[(linha, n)] = nomes_resultados[:n]
+        if motor is not None:
+            extras = {} if lucro_linha is None else {"lucro_percentual": lucro_linha}
+            motor.definir_evento(
+                id_evento,
+                resultados=nomes_resultados,
+                descricao_evento=descricao,
+                esporte=esporte,
+                liga=liga,
+                data_hora_evento=data_hora,
+                data_extracao=data_extracao,
+                **extras
+            )
+        atualizacoes.extend(zip(repeat(id_evento), casas_linha, range(n), odds_linha))
+    return atualizacoes
@@ -0,0 +1,292 @@
+"""
+Ingestão colunar dos documentos de surebet (MongoDB ou CSV de backup)
+
+Monta um DataFrame direto do cursor/lista de documentos ou do CSV e calcula
+normalização de vírgula decimal, máscaras de validade, probabilidades
+implícitas, lucro e frações de stake com operações vetorizadas do pandas/NumPy.
+"""
+import re
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from arbitrage_opportunity import Oportunidade, internar_coluna
+
+# Colunas de metadados lidas para cada oportunidade
+COLUNAS_METADADOS = ['_id', 'evento', 'times', 'esporte', 'liga', 'data_hora', 'data_extracao', 'linha', 'lucro_percentual']
+
+NOMES_PADRAO = {
+    2: ['Casa', 'Fora'],
+    3: ['Casa', 'Empate', 'Fora']
+}
+
+
+def montar_frame_surebets(fonte):
+    """
+    Monta o frame colunar de surebets
+
+    Args:
+        fonte: Lista/cursor de documentos, DataFrame ou caminho de um CSV de backup
+
+    Returns:
+        DataFrame: Um registro por documento
+    """
+    if isinstance(fonte, pd.DataFrame):
+        return fonte
+    if isinstance(fonte, str):
+        return pd.read_csv(fonte)
+
+    documentos = fonte if isinstance(fonte, list) else list(fonte)
+    # Iterar um documento produz as suas chaves: a união roda inteira em C
+    chaves = set().union(*documentos)
+    # Só as colunas usadas pelo processamento: evita converter campos que nunca são lidos
+    colunas = [col for col in COLUNAS_METADADOS if col in chaves]
+    colunas += sorted((col for col in chaves if re.fullmatch(r'(odd|casa)_\d+', str(col))), key=str)
+    return pd.DataFrame(documentos, columns=colunas)
+
+
+def _colunas_odds(frame):
+    """Colunas odd_1, odd_2, ... presentes no frame, em ordem"""
+    numeradas = [(int(m.group(1)), col) for col in frame.columns if (m := re.fullmatch(r'odd_(\d+)', str(col)))]
+    colunas = []
+    for esperado, (numero, col) in enumerate(sorted(numeradas), start=1):
+        if numero != esperado:
+            break
+        colunas.append(col)
+    return colunas
+
+
+def _normalizar_odds(serie):
+    """
+    Converte uma coluna de odds para float aceitando vírgula decimal
+
+    Returns:
+        tuple: (valores, presente, erro) como arrays NumPy
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        valores = serie.to_numpy(dtype=float)
+        presente = ~np.isnan(valores) & (valores != 0)
+        return valores, presente, np.zeros(len(serie), dtype=bool)
+
+    # Mesmo critério de "valor preenchido" do processamento original (None, '', 0 são vazios)
+    presente = (serie.notna() & (serie != '') & (serie != 0)).to_numpy()
+    try:
+        # Caminho rápido: coluna só com números e textos numéricos com ponto
+        valores = serie.to_numpy(dtype=object).astype(float)
+        return valores, presente, presente & np.isnan(valores)
+    except (ValueError, TypeError):
+        valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=float, copy=True)
+    # Só os valores que não converteram direto (ex: '2,35') passam pela troca de vírgula
+    pendentes = presente & np.isnan(valores)
+    if pendentes.any():
+        texto = serie[pendentes].astype(str).str.replace(',', '.', regex=False)
+        valores[pendentes] = pd.to_numeric(texto, errors='coerce').to_numpy(dtype=float)
+    erro = presente & np.isnan(valores)
+    return valores, presente, erro
+
+
+def odds_do_frame(frame):
+    """
+    Odds odd_1, odd_2, ... do frame como matriz float
+
+    Returns:
+        tuple: (odds, n_resultados, com_erro) como arrays NumPy
+            odds: linhas × colunas de odds (vírgula decimal já convertida)
+            n_resultados: odds preenchidas em sequência a partir de odd_1 (largura do mercado)
+            com_erro: linhas com alguma odd do mercado em formato inválido
+    """
+    colunas = _colunas_odds(frame)
+    n_linhas = len(frame)
+    if not colunas:
+        return np.empty((n_linhas, 0)), np.zeros(n_linhas, dtype=np.intp), np.zeros(n_linhas, dtype=bool)
+
+    valores, presentes, erros = zip(*(_normalizar_odds(frame[col]) for col in colunas))
+    odds = np.column_stack(valores)
+    presente = np.column_stack(presentes)
+    erro = np.column_stack(erros)
+
+    # Largura do mercado = quantidade de odds preenchidas em sequência a partir de odd_1
+    n_resultados = np.cumprod(presente, axis=1).sum(axis=1)
+    slots = np.arange(len(colunas)) < n_resultados[:, None]
+    return odds, n_resultados, (erro & slots).any(axis=1)
+
+
+def avaliar_frame_surebets(frame):
+    """
+    Avalia a arbitragem de todos os documentos do frame com operações vetorizadas
+
+    O resultado não depende do valor investido: os stakes saem como frações
+    do investimento e são escalados depois (ver Oportunidade.stakes).
+
+    Args:
+        frame: DataFrame gerado por montar_frame_surebets
+
+    Returns:
+        tuple: (resultado, registros_com_erro)
+            resultado: dict colunar com as linhas do frame que são oportunidades
+                indices, n_resultados, odds (linhas × resultados), fracoes_stake, soma_probabilidades,
+                retorno_por_unidade, lucro_percentual
+            registros_com_erro: quantidade de registros ignorados por erro de formato
+    """
+    n_linhas = len(frame)
+    odds, n_resultados, com_erro = odds_do_frame(frame)
+    if odds.shape[1] < 2 or n_linhas == 0:
+        return _resultado_vazio(odds.shape[1]), 0
+
+    slots = np.arange(odds.shape[1]) < n_resultados[:, None]
+    com_erro &= n_resultados >= 2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        validas = (n_resultados >= 2) & ~com_erro & ~((odds <= 1) & slots).any(axis=1)
+        probs = np.where(slots & validas[:, None], 1.0 / odds, 0.0)
+        soma = probs.sum(axis=1)
+
+    # Lucro informado no documento; valores não numéricos contam como erro de formato
+    lucro, lucro_invalido = lucro_do_frame(frame)
+
+    candidatas = validas & (soma < 1)
+    oportunidade = candidatas & ~lucro_invalido
+    registros_com_erro = int(com_erro.sum() + (candidatas & lucro_invalido).sum())
+
+    indices = np.flatnonzero(oportunidade)
+    soma = soma[indices]
+    retorno_por_unidade = 1.0 / soma
+    fracoes = np.where(slots[indices], retorno_por_unidade[:, None] * probs[indices], np.nan)
+    return {
+        "indices": indices,
+        "n_resultados": n_resultados[indices],
+        "odds": np.where(slots[indices], odds[indices], np.nan),
+        "fracoes_stake": fracoes,
+        "soma_probabilidades": soma,
+        "retorno_por_unidade": retorno_por_unidade,
+        "lucro_percentual": lucro[indices]
+    }, registros_com_erro
+
+
+def lucro_do_frame(frame):
+    """
+    Converte `lucro_percentual` do frame para float
+
+    Mesmo critério em todos os caminhos (leitura completa, busca incremental e
+    tempo real): o lucro exibido é o do documento.
+
+    Returns:
+        tuple: (lucro, invalido) como arrays NumPy - textos não numéricos são inválidos,
+            outros tipos viram 0
+    """
+    n_linhas = len(frame)
+    if 'lucro_percentual' not in frame.columns:
+        return np.zeros(n_linhas), np.zeros(n_linhas, dtype=bool)
+    bruto = frame['lucro_percentual']
+    lucro = pd.to_numeric(bruto, errors='coerce').to_numpy(dtype=float, copy=True)
+    if pd.api.types.is_numeric_dtype(bruto):
+        return lucro, np.zeros(n_linhas, dtype=bool)
+
+    # Só os valores que não converteram precisam ter o tipo inspecionado
+    invalido = np.zeros(n_linhas, dtype=bool)
+    pendentes = np.flatnonzero(bruto.notna().to_numpy() & np.isnan(lucro))
+    for i in pendentes:
+        valor = bruto.iat[i]
+        if isinstance(valor, str):
+            invalido[i] = True
+        elif not isinstance(valor, (int, float)):
+            lucro[i] = 0.0
+    # None (campo ausente no documento) vale 0; NaN continua NaN
+    lucro[bruto.to_numpy(dtype=object) == None] = 0.0  # noqa: E711
+    return lucro, invalido
+
+
+def _resultado_vazio(n_colunas):
+    """Resultado colunar sem nenhuma oportunidade"""
+    return {
+        "indices": np.array([], dtype=np.intp),
+        "n_resultados": np.array([], dtype=np.intp),
+        "odds": np.empty((0, n_colunas)),
+        "fracoes_stake": np.empty((0, n_colunas)),
+        "soma_probabilidades": np.array([]),
+        "retorno_por_unidade": np.array([]),
+        "lucro_percentual": np.array([])
+    }
+
+
+def _nomes_resultados(linha, n):
+    """Nomes dos resultados a partir do campo `linha` (ex: 'Casa/Empate/Fora')"""
+    nomes = linha.split('/') if isinstance(linha, str) else []
+    if len(nomes) < n:
+        return NOMES_PADRAO.get(n, [f'Resultado {j + 1}' for j in range(n)])
+    # Um resultado por odd: 'Casa/Empate/Fora' num mercado de 2 vias fica com os 2 primeiros
+    return nomes[:n]
+
+
+def _coluna(frame, col, padrao='', internar=False):
+    """Valores de uma coluna como lista, trocando ausentes (None/NaN) pelo padrão"""
+    if col not in frame.columns:
+        return [padrao] * len(frame)
+    serie = frame[col]
+    serie = serie.astype(object).where(serie.notna(), padrao)
+    return internar_coluna(serie) if internar else serie.tolist()
+
+
+def frame_para_oportunidades(frame, resultado):
+    """
+    Converte as oportunidades do resultado colunar em objetos Oportunidade
+
+    Args:
+        frame: DataFrame gerado por montar_frame_surebets
+        resultado: Resultado de avaliar_frame_surebets
+
+    Returns:
+        list: Lista de Oportunidade
+    """
+    indices = resultado["indices"]
+    if len(indices) == 0:
+        return []
+
+    n_colunas = resultado["odds"].shape[1]
+    selecionadas = frame.iloc[indices]
+    casas = [_coluna(selecionadas, f'casa_{k}', internar=True) for k in range(1, n_colunas + 1)]
+    ids = [str(v) for v in _coluna(selecionadas, '_id')]
+    eventos = _coluna(selecionadas, 'evento', None)
+    times = _coluna(selecionadas, 'times')
+    esportes = _coluna(selecionadas, 'esporte', internar=True)
+    ligas = _coluna(selecionadas, 'liga', internar=True)
+    datas_hora = _coluna(selecionadas, 'data_hora')
+    datas_extracao = _coluna(selecionadas, 'data_extracao', datetime.now())
+    linhas = _coluna(selecionadas, 'linha', None)
+
+    odds = resultado["odds"].tolist()
+    fracoes = resultado["fracoes_stake"].tolist()
+    n_resultados = resultado["n_resultados"].tolist()
+    somas = resultado["soma_probabilidades"].tolist()
+    lucros = resultado["lucro_percentual"].tolist()
+    agora = time.time()
+    cache_nomes = {}
+
+    return _montar_oportunidades(
+        n_resultados, linhas, cache_nomes, odds, fracoes, casas, somas, lucros,
+        ids, eventos, times, esportes, ligas, datas_hora, datas_extracao, agora
+    )
+
+
+def _montar_oportunidades(n_resultados, linhas, cache_nomes, odds, fracoes, casas, somas, lucros,
+                          ids, eventos, times, esportes, ligas, datas_hora, datas_extracao, agora):
+    """Laço de criação das oportunidades a partir das colunas já convertidas para listas"""
+    oportunidades = []
+    for i, n in enumerate(n_resultados):
+        chave_nomes = (linhas[i], n)
+        nomes = cache_nomes.get(chave_nomes)
+        if nomes is None:
+            nomes = cache_nomes[chave_nomes] = _nomes_resultados(linhas[i], n)
+        odds_i = odds[i]
+        fracoes_i = fracoes[i]
+        oportunidades.append(Oportunidade(
+            [casas[k][i] for k in range(n)], nomes, odds_i[:n], fracoes_i[:n], somas[i], lucros[i],
+            timestamp=agora,
+            id_evento=ids[i],
+            descricao_evento=eventos[i] if eventos[i] is not None else times[i],
+            esporte=esportes[i],
+            liga=ligas[i],
+            data_hora_evento=datas_hora[i],
+            data_extracao=datas_extracao[i]
+        ))
+    return oportunidades
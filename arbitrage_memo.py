@@ -0,0 +1,91 @@
+"""
+Memoização das oportunidades processadas
+
+Quando o cache devolve os mesmos dados, refazer a ingestão colunar a cada
+atualização só repete o mesmo resultado. As oportunidades ficam guardadas por
+versão dos dados brutos + parâmetros do processamento e são reaproveitadas
+entre reruns e entre sessões.
+
+A versão padrão é a identidade da lista de documentos: o cache compartilhado
+entrega o mesmo objeto (imutável por convenção) enquanto a entrada não muda,
+e uma nova busca gera outra lista. Um hash do conteúdo custaria mais que o
+próprio processamento vetorizado.
+"""
+import threading
+from collections import OrderedDict
+
+# Resultados guardados (cada um mantém a lista de documentos viva)
+DEFAULT_MAX_RESULTADOS_MEMO = 8
+
+
+class MemoOportunidades:
+    """
+    LRU de resultados de processamento, thread-safe, com contadores de acertos e falhas
+
+    Os resultados são compartilhados entre as sessões: as listas devolvidas
+    são cópias e as oportunidades não guardam nada da sessão (para_dict monta
+    um dict novo a cada chamada), então o mesmo objeto serve para qualquer investimento.
+    """
+
+    def __init__(self, max_resultados=DEFAULT_MAX_RESULTADOS_MEMO):
+        """
+        Args:
+            max_resultados: Quantidade máxima de resultados guardados
+        """
+        self.max_resultados = max_resultados
+        self._lock = threading.Lock()
+        # chave -> (documentos, oportunidades, registros_com_erro)
+        self._resultados = OrderedDict()
+        self._acertos = 0
+        self._falhas = 0
+
+    def obter(self, documentos, calcular, parametros=(), versao=None):
+        """
+        Devolve o resultado memorizado ou calcula e guarda
+
+        Args:
+            documentos: Documentos brutos (lista ou DataFrame)
+            calcular: Função documentos -> (oportunidades, registros_com_erro)
+            parametros: Valores hasheáveis que mudam o resultado do processamento
+            versao: Versão explícita dos dados (ex: timestamp do arquivo); padrão: identidade de `documentos`
+
+        Returns:
+            tuple: (lista de oportunidades, registros_com_erro)
+        """
+        chave = (versao if versao is not None else ("id", id(documentos)), parametros)
+        with self._lock:
+            guardado = self._resultados.get(chave)
+            # id() pode ser reaproveitado por outro objeto: a referência guardada confirma a identidade
+            if guardado is not None and (versao is not None or guardado[0] is documentos):
+                self._resultados.move_to_end(chave)
+                self._acertos += 1
+                return list(guardado[1]), guardado[2]
+            self._falhas += 1
+
+        # Cálculo fora do lock: sessões com dados diferentes não esperam umas pelas outras
+        oportunidades, registros_com_erro = calcular(documentos)
+        with self._lock:
+            self._resultados[chave] = (documentos if versao is None else None, tuple(oportunidades), registros_com_erro)
+            self._resultados.move_to_end(chave)
+            while len(self._resultados) > self.max_resultados:
+                self._resultados.popitem(last=False)
+        return list(oportunidades), registros_com_erro
+
+    def limpar(self):
+        """Descarta todos os resultados guardados"""
+        with self._lock:
+            self._resultados.clear()
+
+    def metricas(self):
+        """
+        Contadores desde o início do processo
+
+        Returns:
+            dict: acertos, falhas e resultados (quantidade guardada)
+        """
+        with self._lock:
+            return {"acertos": self._acertos, "falhas": self._falhas, "resultados": len(self._resultados)}
+
+
+# Memo do processo, compartilhado por todas as sessões
+MEMO_OPORTUNIDADES = MemoOportunidades()
@@ -0,0 +1,216 @@
+"""
+Representação compacta de uma oportunidade de arbitragem
+
+Guarda as apostas em tuplas paralelas (casas, resultados, odds, frações de
+stake) com textos repetidos (casas, esportes, ligas, resultados) internados,
+em vez de um dict por oportunidade com uma lista de dicts em `detalhes_apostas`.
+O formato de dict usado pela interface é montado sob demanda.
+
+Os stakes são guardados como frações do investimento (somam 1) junto com o
+retorno por unidade investida, então mudar o valor a investir não exige
+reprocessar os dados: basta multiplicar (ver escalar_stakes).
+"""
+import sys
+import numpy as np
+import pandas as pd
+
+
+def _internar(valor):
+    """Interna textos para que casas/esportes/ligas repetidos compartilhem a mesma string"""
+    return sys.intern(valor) if type(valor) is str else valor
+
+
+def internar_coluna(valores):
+    """
+    Interna uma coluna inteira de textos de uma vez
+
+    Cada valor distinto é internado uma única vez e a coluna é remontada por
+    índice, então milhares de linhas com a mesma casa/liga apontam para a mesma string.
+
+    Args:
+        valores: Lista ou Series com os textos
+
+    Returns:
+        list: Valores com as strings internadas
+    """
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=False)
+    unicos = np.array([_internar(v) for v in unicos], dtype=object)
+    return unicos[codigos].tolist()
+
+
+class Oportunidade:
+    """
+    Oportunidade de arbitragem com __slots__
+
+    Aceita leitura no estilo dict (`op["lucro_percentual_garantido"]`, `op.get(...)`)
+    para compatibilidade com o código que consumia os dicts, e converte para o
+    dict completo com para_dict() apenas quando necessário.
+    """
+
+    __slots__ = (
+        "id_evento", "descricao_evento", "esporte", "liga",
+        "casas", "resultados", "odds", "fracoes_stake",
+        "soma_probabilidades_implicitas", "lucro_percentual_garantido", "retorno_por_unidade",
+        "timestamp", "data_hora_evento", "data_extracao"
+    )
+
+    # Chaves do formato de dict disponíveis via op["chave"] (independentes do investimento)
+    CHAVES = (
+        "tipo_mercado", "oportunidade", "soma_probabilidades_implicitas", "lucro_percentual_garantido",
+        "id_evento", "descricao_evento", "esporte", "liga", "timestamp", "data_hora_evento", "data_extracao"
+    )
+
+    def __init__(self, casas, resultados, odds, fracoes_stake, soma_probabilidades, lucro_percentual,
+                 timestamp=None, id_evento='', descricao_evento='', esporte='', liga='',
+                 data_hora_evento=None, data_extracao=None):
+        """
+        Inicializa a oportunidade
+
+        Args:
+            casas: Casa de cada aposta
+            resultados: Resultado de cada aposta
+            odds: Odd de cada aposta
+            fracoes_stake: Fração do investimento em cada aposta (prob. implícita / soma)
+            soma_probabilidades: Soma das probabilidades implícitas
+            lucro_percentual: Lucro garantido em %
+            timestamp: Momento do cálculo
+            id_evento, descricao_evento, esporte, liga: Metadados do evento
+            data_hora_evento, data_extracao: Datas do evento e da extração (opcionais)
+        """
+        # Casas e resultados já chegam internados de internar_coluna / dos índices de casas
+        self.casas = tuple(casas)
+        self.resultados = tuple(resultados)
+        self.odds = tuple(odds)
+        self.fracoes_stake = tuple(fracoes_stake)
+        self.soma_probabilidades_implicitas = soma_probabilidades
+        self.lucro_percentual_garantido = lucro_percentual
+        self.retorno_por_unidade = 1.0 / soma_probabilidades
+        self.timestamp = timestamp
+        self.id_evento = id_evento
+        self.descricao_evento = descricao_evento
+        self.esporte = _internar(esporte)
+        self.liga = _internar(liga)
+        self.data_hora_evento = data_hora_evento
+        self.data_extracao = data_extracao
+
+    @property
+    def tipo_mercado(self):
+        return f"{len(self.odds)}-vias"
+
+    @property
+    def oportunidade(self):
+        return True
+
+    def stakes(self, investimento):
+        """Stake sugerido de cada aposta para o investimento informado"""
+        return tuple(fracao * investimento for fracao in self.fracoes_stake)
+
+    def detalhes_apostas(self, investimento, stakes=None):
+        """Lista de dicts por aposta, no formato usado pela interface (stakes: linha de escalar_stakes, opcional)"""
+        if stakes is None:
+            stakes = self.stakes(investimento)
+        return [
+            {"casa": casa, "resultado": resultado, "odd": odd, "stake_sugerido": float(stake), "retorno_individual": float(stake * odd)}
+            for casa, resultado, odd, stake in zip(self.casas, self.resultados, self.odds, stakes)
+        ]
+
+    def __getitem__(self, chave):
+        if chave not in self.CHAVES:
+            raise KeyError(chave)
+        return getattr(self, chave)
+
+    def __contains__(self, chave):
+        return chave in self.CHAVES and getattr(self, chave) is not None
+
+    def get(self, chave, padrao=None):
+        """Equivalente a dict.get"""
+        valor = self[chave] if chave in self.CHAVES else None
+        return padrao if valor is None else valor
+
+    def para_dict(self, investimento, stakes=None, retorno_garantido=None):
+        """
+        Converte para o formato de dict usado pela interface
+
+        O dict é montado a cada chamada e não fica guardado: as oportunidades são
+        compartilhadas entre sessões com investimentos diferentes (ver arbitrage_memo).
+
+        Args:
+            investimento: Valor total a ser investido
+            stakes: Stakes já escalados desta oportunidade (linha de escalar_stakes, opcional)
+            retorno_garantido: Retorno já escalado desta oportunidade (opcional)
+
+        Returns:
+            dict: Oportunidade no formato de dict, com stakes e retornos para o investimento
+        """
+        dados = {chave: getattr(self, chave) for chave in self.CHAVES if chave in self}
+        dados["detalhes_apostas"] = self.detalhes_apostas(investimento, stakes)
+        dados["investimento_total_sugerido"] = float(investimento)
+        if retorno_garantido is None:
+            retorno_garantido = investimento * self.retorno_por_unidade
+        dados["retorno_garantido"] = float(retorno_garantido)
+        return dados
+
+    def __repr__(self):
+        return f"Oportunidade({self.descricao_evento!r}, {self.tipo_mercado}, {self.lucro_percentual_garantido:.2f}%)"
+
+
+def matriz_fracoes(oportunidades):
+    """
+    Empacota as frações de stake de várias oportunidades em arrays
+
+    Deve ser montada uma vez por versão dos dados; escalar_stakes reaproveita o resultado.
+
+    Args:
+        oportunidades: Lista de Oportunidade
+
+    Returns:
+        tuple: (fracoes, retorno_por_unidade)
+            fracoes: array (oportunidades × apostas) com NaN nas apostas inexistentes
+            retorno_por_unidade: array com o retorno por unidade investida
+    """
+    largura = max((len(op.fracoes_stake) for op in oportunidades), default=0)
+    fracoes = np.full((len(oportunidades), largura), np.nan)
+    for i, op in enumerate(oportunidades):
+        fracoes[i, :len(op.fracoes_stake)] = op.fracoes_stake
+    retorno_por_unidade = np.fromiter((op.retorno_por_unidade for op in oportunidades), dtype=float, count=len(oportunidades))
+    return fracoes, retorno_por_unidade
+
+
+def tabela_oportunidades(oportunidades):
+    """
+    Colunas usadas para filtrar e escalar uma lista de oportunidades, montadas uma vez
+
+    A tela filtra por lucro/esporte/liga com uma máscara sobre estas colunas e
+    indexa a matriz de frações por ela, sem percorrer as oportunidades a cada rerun.
+
+    Args:
+        oportunidades: Lista de Oportunidade
+
+    Returns:
+        dict: Arrays alinhados com a lista de oportunidades
+            matriz: resultado de matriz_fracoes
+            lucro: lucro percentual garantido
+            esporte, liga: arrays de objetos com os textos
+    """
+    n = len(oportunidades)
+    return {
+        "matriz": matriz_fracoes(oportunidades),
+        "lucro": np.fromiter((op.lucro_percentual_garantido for op in oportunidades), dtype=float, count=n),
+        "esporte": np.array([op.esporte for op in oportunidades], dtype=object),
+        "liga": np.array([op.liga for op in oportunidades], dtype=object)
+    }
+
+
+def escalar_stakes(matriz, investimento):
+    """
+    Calcula stakes e retornos de todas as oportunidades para um investimento
+
+    Args:
+        matriz: Resultado de matriz_fracoes
+        investimento: Valor total a ser investido em cada oportunidade
+
+    Returns:
+        tuple: (stakes, retorno_garantido) como arrays
+    """
+    fracoes, retorno_por_unidade = matriz
+    return fracoes * investimento, retorno_por_unidade * investimento
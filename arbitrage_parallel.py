@@ -0,0 +1,154 @@
+"""
+Processamento paralelo das surebets em shards por esporte/liga
+
+Divide os documentos em shards estáveis (hash de esporte|liga) e processa
+cada um em um processo separado com a mesma ingestão colunar do modo serial.
+As oportunidades são juntadas na ordem original dos documentos, então o
+resultado é idêntico ao do processamento em um único processo.
+"""
+import os
+import threading
+import zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from arbitrage_ingest import montar_frame_surebets, avaliar_frame_surebets, frame_para_oportunidades
+
+# Abaixo deste número de documentos o custo de enviar os dados aos processos não compensa
+DEFAULT_MIN_DOCUMENTOS_PARALELO = 5000
+
+# Campos usados para agrupar documentos no mesmo shard
+CAMPOS_SHARD = ('esporte', 'liga')
+
+# Um pool por quantidade de processos (no máximo um por núcleo)
+_executores = {}
+_executor_lock = threading.Lock()
+
+
+def numero_de_nucleos():
+    """Quantidade de núcleos disponíveis para o processo"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _obter_executor(max_workers):
+    """
+    Pool de processos compartilhado entre as atualizações
+
+    Existe um pool por quantidade de processos: sessões com configurações
+    diferentes usam pools diferentes e nenhuma encerra o pool da outra.
+    Usa "spawn" porque o Streamlit roda o script em threads.
+    """
+    with _executor_lock:
+        executor = _executores.get(max_workers)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _executores[max_workers] = executor
+        return executor
+
+
+def _descartar_executor(max_workers, executor):
+    """Tira do cache um pool quebrado (processo morto) para que o próximo uso crie outro"""
+    with _executor_lock:
+        if _executores.get(max_workers) is executor:
+            del _executores[max_workers]
+    executor.shutdown(wait=False)
+
+
+def encerrar_executor():
+    """Encerra os pools de processos compartilhados (se existirem)"""
+    with _executor_lock:
+        executores = list(_executores.values())
+        _executores.clear()
+    for executor in executores:
+        executor.shutdown(wait=True)
+
+
+def dividir_em_shards(documentos, n_shards):
+    """
+    Distribui os documentos em shards por hash estável de esporte|liga
+
+    O hash usa crc32 (e não hash() do Python, que muda entre processos), então
+    a mesma liga cai sempre no mesmo shard.
+
+    Args:
+        documentos: Lista de documentos de surebet
+        n_shards: Quantidade de shards
+
+    Returns:
+        list: Para cada shard, uma tupla (posições originais, documentos)
+    """
+    chaves = ["|".join(str(doc.get(campo, '')) for campo in CAMPOS_SHARD) for doc in documentos]
+    codigos, unicas = pd.factorize(pd.Series(chaves, dtype=object))
+    shard_por_chave = [zlib.crc32(chave.encode("utf-8")) % n_shards for chave in unicas]
+
+    shards = [([], []) for _ in range(n_shards)]
+    for posicao, (codigo, doc) in enumerate(zip(codigos.tolist(), documentos)):
+        posicoes, docs = shards[shard_por_chave[codigo]]
+        posicoes.append(posicao)
+        docs.append(doc)
+    return [shard for shard in shards if shard[1]]
+
+
+def processar_shard(posicoes, documentos):
+    """
+    Processa um shard (executado nos processos do pool)
+
+    Returns:
+        tuple: (posições originais das oportunidades, oportunidades, registros_com_erro)
+    """
+    frame = montar_frame_surebets(documentos)
+    resultado, registros_com_erro = avaliar_frame_surebets(frame)
+    oportunidades = frame_para_oportunidades(frame, resultado)
+    return [posicoes[i] for i in resultado["indices"].tolist()], oportunidades, registros_com_erro
+
+
+def processar_em_paralelo(documentos, n_shards=None, max_workers=None,
+                          min_documentos=DEFAULT_MIN_DOCUMENTOS_PARALELO):
+    """
+    Processa os documentos de surebet dividindo o trabalho entre processos
+
+    Com um shard só (ou poucos documentos) roda no processo atual.
+
+    Args:
+        documentos: Lista de documentos de surebet
+        n_shards: Quantidade de shards (padrão: número de núcleos)
+        max_workers: Quantidade de processos do pool (padrão: min(n_shards, núcleos))
+        min_documentos: Mínimo de documentos para usar o pool
+
+    Returns:
+        tuple: (oportunidades, registros_com_erro) na mesma ordem do processamento serial
+    """
+    documentos = documentos if isinstance(documentos, list) else list(documentos)
+    n_shards = n_shards or numero_de_nucleos()
+    if n_shards <= 1 or len(documentos) < min_documentos:
+        _, oportunidades, registros_com_erro = processar_shard(range(len(documentos)), documentos)
+        return oportunidades, registros_com_erro
+
+    shards = dividir_em_shards(documentos, n_shards)
+    max_workers = max_workers or min(n_shards, numero_de_nucleos())
+    executor = _obter_executor(max_workers)
+    try:
+        resultados = _executar_shards(executor, shards)
+    except BrokenProcessPool:
+        # Um processo do pool morreu (ex: falta de memória): recria o pool e tenta mais uma vez
+        _descartar_executor(max_workers, executor)
+        resultados = _executar_shards(_obter_executor(max_workers), shards)
+
+    # Junta pela posição original do documento para ficar igual ao modo serial
+    por_posicao = []
+    registros_com_erro = 0
+    for posicoes, oportunidades, erros in resultados:
+        por_posicao.extend(zip(posicoes, oportunidades))
+        registros_com_erro += erros
+    por_posicao.sort(key=lambda item: item[0])
+    return [oportunidade for _, oportunidade in por_posicao], registros_com_erro
+
+
+def _executar_shards(executor, shards):
+    """Envia os shards ao pool e espera todos os resultados de processar_shard"""
+    futuros = [executor.submit(processar_shard, posicoes, docs) for posicoes, docs in shards]
+    return [futuro.result() for futuro in futuros]
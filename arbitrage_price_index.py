@@ -0,0 +1,200 @@
+"""
+Índice dos K melhores preços por (evento, resultado)
+
+Construído durante a ingestão do feed, permite recalcular a arbitragem de um
+evento sem as casas em que o usuário não pode apostar ("excluir casas" /
+"apenas minhas contas") sem varrer novamente as odds brutas.
+"""
+import time
+import pandas as pd
+from arbitrage_engine import montar_oportunidade
+from arbitrage_incremental import atualizacoes_de_documentos, atualizacoes_de_frame, posicao_resultado
+
+# Quantidade padrão de preços mantidos por resultado
+DEFAULT_TOP_K = 5
+
+
+class IndicePrecosTopK:
+    """
+    Mantém, para cada (evento, resultado), até K pares (odd, casa) em ordem decrescente
+
+    Cada casa aparece no máximo uma vez por resultado (com a sua melhor odd).
+    Os resultados são guardados pela posição no mercado, como no motor
+    incremental: nomes repetidos na `linha` (ex: 'Sim/Sim') não se misturam.
+    """
+
+    def __init__(self, k=DEFAULT_TOP_K):
+        """
+        Inicializa o índice
+
+        Args:
+            k: Quantidade máxima de preços mantidos por resultado
+        """
+        self.k = k
+        self._precos = {}      # (evento, posição do resultado) -> [(odd, casa), ...] decrescente
+        self._resultados = {}  # evento -> lista ordenada de resultados
+        self._metadados = {}   # evento -> dict com descrição, esporte, liga...
+        self.casas = set()
+
+    def definir_evento(self, id_evento, resultados=None, **metadados):
+        """
+        Registra os metadados e a lista de resultados de um evento
+
+        Args:
+            id_evento: Identificador do evento
+            resultados: Lista ordenada com os resultados do mercado (opcional)
+            **metadados: Campos copiados para a oportunidade (descricao_evento, esporte, liga...)
+        """
+        # Em eventos agrupados de vários documentos, mantém os metadados do primeiro
+        if id_evento not in self._metadados:
+            self._metadados[id_evento] = dict(metadados, id_evento=id_evento)
+        if resultados is not None and len(resultados) >= len(self._resultados.get(id_evento, [])):
+            self._resultados[id_evento] = list(resultados)
+        else:
+            self._resultados.setdefault(id_evento, [])
+
+    def adicionar(self, id_evento, casa, resultado, odd):
+        """
+        Insere um preço no índice, descartando o que ficar fora dos K melhores
+
+        Args:
+            id_evento: Identificador do evento
+            casa: Nome da casa de apostas
+            resultado: Nome do resultado ou a sua posição no mercado (int)
+            odd: Odd decimal
+        """
+        if odd is None or odd <= 1:
+            return
+        if id_evento not in self._resultados:
+            self.definir_evento(id_evento)
+        resultado = posicao_resultado(self._resultados[id_evento], resultado)
+        self.casas.add(casa)
+
+        precos = self._precos.setdefault((id_evento, resultado), [])
+        for i, (odd_atual, casa_atual) in enumerate(precos):
+            if casa_atual == casa:
+                if odd <= odd_atual:
+                    return
+                del precos[i]
+                break
+        if len(precos) >= self.k and odd <= precos[-1][0]:
+            return
+        # Listas de até K itens: inserção linear é mais barata que bisect com chave
+        posicao = len(precos)
+        while posicao > 0 and precos[posicao - 1][0] < odd:
+            posicao -= 1
+        precos.insert(posicao, (odd, casa))
+        del precos[self.k:]
+
+    def adicionar_atualizacoes(self, atualizacoes):
+        """Insere um lote de tuplas (evento, casa, resultado, odd)"""
+        for id_evento, casa, resultado, odd in atualizacoes:
+            self.adicionar(id_evento, casa, resultado, odd)
+
+    def melhor_preco(self, id_evento, resultado, casas_excluidas=(), casas_permitidas=None):
+        """
+        Obtém a melhor odd de um resultado respeitando o filtro de casas
+
+        Args:
+            id_evento: Identificador do evento
+            resultado: Posição do resultado no mercado
+            casas_excluidas: Casas que não podem ser usadas
+            casas_permitidas: Se informado, apenas estas casas podem ser usadas
+
+        Returns:
+            tuple: (odd, casa) ou None se nenhum dos K preços indexados passar no filtro
+        """
+        for odd, casa in self._precos.get((id_evento, resultado), ()):
+            if casa in casas_excluidas:
+                continue
+            if casas_permitidas is not None and casa not in casas_permitidas:
+                continue
+            return odd, casa
+        return None
+
+    def avaliar_evento(self, id_evento, casas_excluidas=(), casas_permitidas=None, agora=None):
+        """
+        Recalcula a arbitragem de um evento com o filtro de casas
+
+        Returns:
+            Oportunidade: Oportunidade encontrada ou None se não houver arbitragem
+        """
+        resultados = self._resultados.get(id_evento, [])
+        if len(resultados) < 2:
+            return None
+        melhores = []
+        for posicao in range(len(resultados)):
+            preco = self.melhor_preco(id_evento, posicao, casas_excluidas, casas_permitidas)
+            if preco is None:
+                return None
+            melhores.append(preco)
+
+        odds = [odd for odd, _ in melhores]
+        soma = sum(1.0 / odd for odd in odds)
+        if soma >= 1:
+            return None
+        return montar_oportunidade(
+            self._metadados[id_evento], resultados, [casa for _, casa in melhores],
+            odds, [1.0 / (odd * soma) for odd in odds], soma, agora if agora is not None else time.time()
+        )
+
+    def oportunidades(self, casas_excluidas=(), casas_permitidas=None):
+        """
+        Recalcula a arbitragem de todos os eventos indexados com o filtro de casas
+
+        Args:
+            casas_excluidas: Casas que não podem ser usadas
+            casas_permitidas: Se informado, apenas estas casas podem ser usadas
+
+        Returns:
+            list: Lista de Oportunidade
+        """
+        casas_excluidas = frozenset(casas_excluidas)
+        if casas_permitidas is not None:
+            casas_permitidas = frozenset(casas_permitidas)
+        agora = time.time()
+        oportunidades = []
+        for id_evento in self._resultados:
+            oportunidade = self.avaliar_evento(id_evento, casas_excluidas, casas_permitidas, agora)
+            if oportunidade is not None:
+                oportunidades.append(oportunidade)
+        return oportunidades
+
+    def __len__(self):
+        return len(self._resultados)
+
+
+# Campos que identificam o mesmo evento/mercado em documentos diferentes
+CAMPOS_CHAVE_EVENTO = ('esporte', 'liga', 'evento', 'times', 'data_hora', 'linha')
+
+
+def chave_evento_surebet(item):
+    """
+    Chave que agrupa documentos de surebet do mesmo evento e mercado
+
+    Documentos diferentes do mesmo jogo/linha trazem preços de outras casas
+    para os mesmos resultados, que viram alternativas no índice.
+    """
+    return "|".join(str(item.get(campo, '')) for campo in CAMPOS_CHAVE_EVENTO)
+
+
+def indexar_documentos(documentos, k=DEFAULT_TOP_K, indice=None):
+    """
+    Constrói o índice top-K a partir de documentos de surebet do MongoDB
+
+    Args:
+        documentos: Iterável de documentos de surebet (odd_1/casa_1...) ou DataFrame de surebets
+        k: Quantidade máxima de preços mantidos por resultado
+        indice: Índice existente a ser completado com os documentos (ex: leitura em lotes)
+
+    Returns:
+        IndicePrecosTopK: Índice pronto para consultas com filtro de casas
+    """
+    if indice is None:
+        indice = IndicePrecosTopK(k)
+    if isinstance(documentos, pd.DataFrame):
+        atualizacoes = atualizacoes_de_frame(documentos, motor=indice, campos_chave=CAMPOS_CHAVE_EVENTO)
+    else:
+        atualizacoes = atualizacoes_de_documentos(documentos, motor=indice, chave_evento=chave_evento_surebet)
+    indice.adicionar_atualizacoes(atualizacoes)
+    return indice
@@ -0,0 +1,193 @@
+"""
+Arredondamento em lote dos stakes sugeridos
+
+As casas de apostas só aceitam valores múltiplos da unidade monetária (ou de
+um incremento próprio) e dentro de limites mínimo/máximo. Este módulo
+arredonda os stakes de todas as oportunidades de uma vez com NumPy e
+verifica se a arbitragem continua garantida depois do arredondamento.
+
+Quando um limite da casa impede o stake proporcional, a oportunidade inteira
+é escalada (o investimento diminui até caber no máximo mais apertado, ou
+aumenta até alcançar o mínimo) antes de arredondar: limitar só uma aposta
+desequilibra as demais e desfaz a arbitragem.
+"""
+import numpy as np
+import pandas as pd
+from arbitrage_opportunity import matriz_fracoes
+
+# Regra aplicada às casas sem configuração própria
+REGRA_STAKE_PADRAO = {"incremento": 1.0, "minimo": 1.0, "maximo": None}
+
+# Passadas de ajuste fino depois do arredondamento ao incremento mais próximo
+DEFAULT_MAX_AJUSTES = 3
+
+
+def _regras_por_aposta(oportunidades, largura, regras_casas, regra_padrao):
+    """
+    Monta arrays (oportunidades × apostas) com incremento, mínimo e máximo de cada aposta
+
+    As regras são resolvidas uma vez por casa distinta e espalhadas por índice.
+    """
+    casas = [casa for op in oportunidades for casa in op.casas]
+    codigos, unicas = pd.factorize(pd.Series(casas, dtype=object), use_na_sentinel=False)
+    regras = [dict(regra_padrao, **regras_casas.get(casa, {})) for casa in unicas]
+    por_casa = np.array(
+        [(r["incremento"], r["minimo"] or 0.0, np.inf if r["maximo"] is None else r["maximo"]) for r in regras],
+        dtype=float
+    ).reshape(-1, 3)
+
+    tamanhos = np.fromiter((len(op.casas) for op in oportunidades), dtype=np.intp, count=len(oportunidades))
+    linhas = np.repeat(np.arange(len(oportunidades)), tamanhos)
+    colunas = np.arange(len(casas)) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+
+    incremento = np.full((len(oportunidades), largura), np.nan)
+    minimo = np.zeros((len(oportunidades), largura))
+    maximo = np.full((len(oportunidades), largura), np.inf)
+    incremento[linhas, colunas] = por_casa[codigos, 0]
+    minimo[linhas, colunas] = por_casa[codigos, 1]
+    maximo[linhas, colunas] = por_casa[codigos, 2]
+    return incremento, minimo, maximo
+
+
+def regras_de_tabela(tabela):
+    """
+    Converte a tabela de regras por casa editada na interface em regras_casas
+
+    Args:
+        tabela: DataFrame com as colunas casa, incremento, minimo e maximo
+            (células vazias usam a regra padrão)
+
+    Returns:
+        dict: casa -> {"incremento", "minimo", "maximo"} só com os campos preenchidos
+    """
+    regras = {}
+    for linha in tabela.to_dict("records"):
+        casa = linha.get("casa")
+        if not isinstance(casa, str) or not casa:
+            continue
+        regras[casa] = {
+            campo: float(linha[campo]) for campo in ("incremento", "minimo", "maximo")
+            if pd.notna(linha.get(campo)) and not (campo == "incremento" and linha[campo] <= 0)
+        }
+    return regras
+
+
+def _escala_investimento(fracoes, investimento, minimo, maximo):
+    """
+    Investimento de cada oportunidade que mantém todas as apostas dentro dos limites
+
+    O máximo mais apertado (máximo / fração) reduz o investimento e o mínimo
+    mais exigente o aumenta; se os dois não cabem juntos, vale o máximo.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        teto = np.nanmin(np.where(np.isnan(fracoes), np.inf, maximo / fracoes), axis=1)
+        piso = np.nanmax(np.where(np.isnan(fracoes), 0.0, minimo / fracoes), axis=1)
+    return np.minimum(np.maximum(investimento, piso), teto)
+
+
+def _lucro(stakes, odds):
+    """Retorno no pior caso, investimento total e lucro de cada oportunidade"""
+    retorno = np.nanmin(stakes * odds, axis=1)
+    investimento = np.nansum(stakes, axis=1)
+    return retorno, investimento, retorno - investimento
+
+
+def arredondar_stakes(oportunidades, investimento, regras_casas=None, regra_padrao=None,
+                      max_ajustes=DEFAULT_MAX_AJUSTES, matriz=None):
+    """
+    Arredonda os stakes de todas as oportunidades respeitando as regras de cada casa
+
+    Se o stake proporcional de alguma aposta passa do máximo (ou fica abaixo do
+    mínimo) da casa, a oportunidade inteira é escalada para caber nos limites, e
+    o investimento total arredondado pode diferir do informado. Cada stake é então
+    levado ao múltiplo mais próximo do incremento da casa e limitado ao
+    mínimo/máximo. Depois, algumas passadas vetorizadas tentam somar um
+    incremento à aposta de menor retorno ou tirar um da de maior retorno, mantendo
+    só as mudanças que aumentam o lucro no pior caso.
+
+    Args:
+        oportunidades: Lista de Oportunidade
+        investimento: Valor total a ser investido em cada oportunidade
+        regras_casas: Dict casa -> {"incremento", "minimo", "maximo"} (campos omitidos usam o padrão)
+        regra_padrao: Regra das casas sem configuração (padrão: REGRA_STAKE_PADRAO)
+        max_ajustes: Quantidade de passadas de ajuste fino
+        matriz: Resultado de matriz_fracoes já calculado para as oportunidades (opcional)
+
+    Returns:
+        dict: Arrays alinhados com a lista de oportunidades
+            stakes: array (oportunidades × apostas) com os stakes arredondados (NaN nas apostas inexistentes)
+            investimento_total: soma dos stakes arredondados
+            retorno_garantido: menor retorno entre as apostas (pior caso)
+            lucro: retorno_garantido - investimento_total
+            lucro_percentual: lucro em % do investimento arredondado
+            surebet: True se o lucro continua positivo depois do arredondamento
+    """
+    regras_casas = regras_casas or {}
+    regra_padrao = dict(REGRA_STAKE_PADRAO, **(regra_padrao or {}))
+    if not oportunidades:
+        vazio = np.array([])
+        return {
+            "stakes": np.empty((0, 0)),
+            "investimento_total": vazio,
+            "retorno_garantido": vazio,
+            "lucro": vazio,
+            "lucro_percentual": vazio,
+            "surebet": np.array([], dtype=bool)
+        }
+
+    fracoes, _ = matriz if matriz is not None else matriz_fracoes(oportunidades)
+    largura = fracoes.shape[1]
+    odds = np.full(fracoes.shape, np.nan)
+    for i, op in enumerate(oportunidades):
+        odds[i, :len(op.odds)] = op.odds
+    incremento, minimo, maximo = _regras_por_aposta(oportunidades, largura, regras_casas, regra_padrao)
+
+    # Limites também precisam ser múltiplos do incremento
+    minimo_valido = np.ceil(minimo / incremento) * incremento
+    maximo_valido = np.floor(maximo / incremento) * incremento
+    escala = _escala_investimento(fracoes, investimento, minimo_valido, maximo_valido)
+    stakes = np.clip(np.round(fracoes * escala[:, None] / incremento) * incremento, minimo_valido, maximo_valido)
+
+    retorno, total, lucro = _lucro(stakes, odds)
+    linhas = np.arange(len(oportunidades))
+    with np.errstate(invalid="ignore"):
+        for _ in range(max_ajustes):
+            retornos = np.where(np.isnan(stakes), np.nan, stakes * odds)
+            houve_melhora = np.zeros(len(oportunidades), dtype=bool)
+
+            # Reforça a aposta que limita o retorno garantido
+            pior = np.nanargmin(retornos, axis=1)
+            candidato = stakes.copy()
+            candidato[linhas, pior] += incremento[linhas, pior]
+            ok = candidato[linhas, pior] <= maximo_valido[linhas, pior]
+            retorno_c, total_c, lucro_c = _lucro(candidato, odds)
+            aceitar = ok & (lucro_c > lucro + 1e-9)
+            stakes[aceitar] = candidato[aceitar]
+            retorno[aceitar], total[aceitar], lucro[aceitar] = retorno_c[aceitar], total_c[aceitar], lucro_c[aceitar]
+            houve_melhora |= aceitar
+
+            # Tira dinheiro da aposta com retorno acima do necessário
+            retornos = np.where(np.isnan(stakes), np.nan, stakes * odds)
+            melhor = np.nanargmax(retornos, axis=1)
+            candidato = stakes.copy()
+            candidato[linhas, melhor] -= incremento[linhas, melhor]
+            ok = candidato[linhas, melhor] >= minimo_valido[linhas, melhor]
+            retorno_c, total_c, lucro_c = _lucro(candidato, odds)
+            aceitar = ok & (lucro_c > lucro + 1e-9)
+            stakes[aceitar] = candidato[aceitar]
+            retorno[aceitar], total[aceitar], lucro[aceitar] = retorno_c[aceitar], total_c[aceitar], lucro_c[aceitar]
+            houve_melhora |= aceitar
+
+            if not houve_melhora.any():
+                break
+
+        lucro_percentual = np.where(total > 0, lucro / total * 100, np.nan)
+
+    return {
+        "stakes": stakes,
+        "investimento_total": total,
+        "retorno_garantido": retorno,
+        "lucro": lucro,
+        "lucro_percentual": lucro_percentual,
+        "surebet": lucro > 0
+    }
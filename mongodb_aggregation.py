@@ -0,0 +1,78 @@
+"""
+Estatísticas de lucro do painel "Estatísticas de Lucro por Esporte"
+
+Média, máximo e quantidade por esporte e um histograma do lucro com faixas de
+mesma largura entre o menor e o maior lucro, calculados a partir dos
+documentos do snapshot exibido (ver SnapshotDados.estatisticas), então o
+painel mostra exatamente os dados da tabela, inclusive com cache ou backup.
+"""
+import numpy as np
+import pandas as pd
+
+# Faixas do histograma de lucro percentual
+DEFAULT_FAIXAS_HISTOGRAMA = 10
+
+_COLUNAS_POR_ESPORTE = ['Esporte', 'Lucro Médio (%)', 'Lucro Máximo (%)', 'Quantidade de Oportunidades']
+
+
+def limites_faixas(minimo, maximo, n_faixas=DEFAULT_FAIXAS_HISTOGRAMA):
+    """
+    Limites das faixas de mesma largura do histograma
+
+    As faixas são fechadas à esquerda ([início, fim)), então o último limite
+    fica logo acima do máximo para que ele entre na última faixa.
+
+    Args:
+        minimo: Menor lucro
+        maximo: Maior lucro
+        n_faixas: Quantidade de faixas
+
+    Returns:
+        list: Limites em ordem crescente (n_faixas + 1 valores, ou 2 se todos os lucros são iguais)
+    """
+    # float mesmo com lucros inteiros: senão o nextafter abaixo seria truncado de volta ao máximo
+    limites = np.linspace(minimo, maximo, n_faixas + 1) if maximo > minimo else np.array([minimo, maximo], dtype=float)
+    limites[-1] = np.nextafter(float(maximo), np.inf)
+    # Intervalos muito estreitos podem repetir limites
+    return np.unique(limites).tolist()
+
+
+def _serie_distribuicao(limites, contagens):
+    """Series do histograma indexada pelo início de cada faixa, com zero nas faixas vazias"""
+    indice = pd.Index(limites[:-1], dtype=float, name='Lucro (%)')
+    return pd.Series([contagens.get(inicio, 0) for inicio in limites[:-1]], index=indice, dtype='int64')
+
+
+def estatisticas_de_frame(frame, n_faixas=DEFAULT_FAIXAS_HISTOGRAMA):
+    """
+    Estatísticas de lucro por esporte e histograma a partir de documentos já em memória
+
+    Usado pelo painel com os documentos do snapshot (inclusive cache e backup
+    local, com o servidor possivelmente fora do ar).
+
+    Args:
+        frame: DataFrame de documentos de surebet
+        n_faixas: Quantidade de faixas do histograma
+
+    Returns:
+        dict: Estatísticas prontas para exibição
+            por_esporte: DataFrame com Esporte, Lucro Médio (%), Lucro Máximo (%) e Quantidade de Oportunidades
+            distribuicao: Series com a quantidade de documentos por faixa (índice: início da faixa em %)
+    """
+    if frame.empty or 'lucro_percentual' not in frame.columns:
+        return {"por_esporte": pd.DataFrame(columns=_COLUNAS_POR_ESPORTE), "distribuicao": _serie_distribuicao([], {})}
+
+    lucro = frame['lucro_percentual']
+    if not pd.api.types.is_numeric_dtype(lucro):
+        lucro = pd.to_numeric(lucro.astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    lucros = pd.DataFrame({'esporte': frame['esporte'] if 'esporte' in frame.columns else None, 'lucro': lucro}).dropna(subset=['lucro'])
+
+    por_esporte = lucros.dropna(subset=['esporte']).groupby('esporte')['lucro'].agg(['mean', 'max', 'count']).reset_index()
+    por_esporte.columns = _COLUNAS_POR_ESPORTE
+    if lucros.empty:
+        return {"por_esporte": por_esporte, "distribuicao": _serie_distribuicao([], {})}
+
+    limites = limites_faixas(lucros['lucro'].min(), lucros['lucro'].max(), n_faixas)
+    faixas = np.searchsorted(limites, lucros['lucro'].to_numpy(dtype=float), side='right') - 1
+    contagens = dict(zip(limites, np.bincount(faixas, minlength=len(limites) - 1).tolist()))
+    return {"por_esporte": por_esporte, "distribuicao": _serie_distribuicao(limites, contagens)}
@@ -1,48 +1,372 @@
 """
 Cache e gestão de dados para aplicações MongoDB
+
+Os dados ficam num único cache do processo (CacheCompartilhado), usado por
+todas as sessões do Streamlit: uma busca feita por um usuário serve aos
+demais. Cada entrada é identificada por (URI, database, coleção, consulta).
+MongoDBCache é a visão de uma sessão sobre uma dessas entradas, com a sua
+própria validade.
+
+Cada entrada é gravada num arquivo binário próprio (pickle protocolo 5 por
+padrão, ou msgpack se instalado, com zlib opcional), que preserva ObjectId e
+datetime. Na inicialização só os cabeçalhos são lidos; os documentos são
+carregados (via mmap) na primeira vez que a entrada é pedida.
 """
 import time
 import json
+import logging
 import os
+import mmap
+import pickle
+import struct
+import zlib
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
 import pandas as pd
 import streamlit as st
+from bson import ObjectId
+
+# msgpack é opcional: sem ele, o cache usa pickle
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Entradas mais antigas que isto saem do cache compartilhado (s), mesmo sem uso
+DEFAULT_TTL_CACHE_COMPARTILHADO = 6 * 3600
+# Limites de tamanho: quantidade de consultas e total de documentos guardados
+DEFAULT_MAX_ENTRADAS_CACHE = 32
+DEFAULT_MAX_DOCUMENTOS_CACHE = 200000
+# Entrada usada por visões sem chave definida
+CHAVE_PADRAO = "padrao"
+# Tempo máximo (s) que uma sessão espera pela busca de outra sessão para a mesma chave
+DEFAULT_TIMEOUT_COALESCENCIA = 30
+# Stale-while-revalidate: idade máxima (s) de dados expirados servidos enquanto a busca roda em segundo plano
+DEFAULT_IDADE_MAXIMA_OBSOLETA = 3600
+# Diretório dos arquivos do cache, formato e compressão
+DEFAULT_DIRETORIO_CACHE = "mongodb_cache"
+DEFAULT_SERIALIZADOR_CACHE = "pickle"
+DEFAULT_COMPRESSAO_CACHE = False
+# CSV original de surebets, lido quando ainda não existe um backup gravado de uma busca ao MongoDB
+CSV_ORIGINAL = "surebets_oddspedia.csv"
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalho de cada arquivo: marca, timestamp, quantidade de documentos, compressão e serializador
+_CABECALHO = struct.Struct("<4sdIB8s")
+_MARCA = b"OHC1"
+_EXTENSAO = ".cache"
+
+
+def _pickle_serializar(dados):
+    return pickle.dumps(dados, protocol=5)
+
+
+# Nome -> (serializar(dados) -> bytes, desserializar(buffer) -> dados)
+# pickle só deve ler arquivos gravados pelo próprio app (o diretório do cache é local)
+SERIALIZADORES = {"pickle": (_pickle_serializar, pickle.loads)}
+
+if msgpack is not None:
+    # Tipos do BSON que o msgpack não conhece viram extensões
+    _EXT_OBJECT_ID = 1
+    _EXT_DATETIME = 2
+
+    def _msgpack_padrao(valor):
+        if isinstance(valor, ObjectId):
+            return msgpack.ExtType(_EXT_OBJECT_ID, valor.binary)
+        if isinstance(valor, datetime):
+            # isoformat preserva datetimes com e sem fuso
+            return msgpack.ExtType(_EXT_DATETIME, valor.isoformat().encode("ascii"))
+        raise TypeError(f"Tipo não suportado no cache msgpack: {type(valor).__name__}")
+
+    def _msgpack_extensao(codigo, dados):
+        if codigo == _EXT_OBJECT_ID:
+            return ObjectId(bytes(dados))
+        if codigo == _EXT_DATETIME:
+            return datetime.fromisoformat(bytes(dados).decode("ascii"))
+        return msgpack.ExtType(codigo, dados)
+
+    SERIALIZADORES["msgpack"] = (
+        lambda dados: msgpack.packb(dados, default=_msgpack_padrao, use_bin_type=True),
+        lambda corpo: msgpack.unpackb(corpo, ext_hook=_msgpack_extensao, raw=False)
+    )
+
+
+def chave_cache(uri, database, collection, consulta=None):
+    """
+    Chave de uma entrada do cache compartilhado
+
+    A URI entra só no hash: as credenciais não são gravadas nos arquivos do cache.
+
+    Args:
+        uri: URI de conexão do MongoDB
+        database: Nome do banco
+        collection: Nome da coleção
+        consulta: Consulta (dict de montar_consulta_surebets ou sua assinatura)
+
+    Returns:
+        str: Hash hexadecimal que identifica a entrada
+    """
+    texto = json.dumps([uri, database, collection, consulta], sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+class CacheCompartilhado:
+    """
+    Cache do processo com expiração (TTL) e limite de tamanho (LRU)
+
+    Thread-safe. As listas de documentos guardadas são compartilhadas entre as
+    sessões e não devem ser alteradas por quem as lê. Cada entrada é persistida
+    em `diretorio/<chave>.cache` para sobreviver a reinícios do servidor.
+    """
+
+    def __init__(self, diretorio=DEFAULT_DIRETORIO_CACHE, ttl_segundos=DEFAULT_TTL_CACHE_COMPARTILHADO,
+                 max_entradas=DEFAULT_MAX_ENTRADAS_CACHE, max_documentos=DEFAULT_MAX_DOCUMENTOS_CACHE,
+                 serializador=DEFAULT_SERIALIZADOR_CACHE, comprimir=DEFAULT_COMPRESSAO_CACHE):
+        """
+        Args:
+            diretorio: Diretório dos arquivos do cache (None para só memória)
+            ttl_segundos: Idade a partir da qual uma entrada é descartada
+            max_entradas: Quantidade máxima de entradas
+            max_documentos: Soma máxima de documentos de todas as entradas
+            serializador: Formato dos arquivos (chave de SERIALIZADORES)
+            comprimir: Comprimir os arquivos com zlib
+        """
+        if serializador not in SERIALIZADORES:
+            raise ValueError(f"Serializador indisponível: {serializador} (disponíveis: {', '.join(SERIALIZADORES)})")
+        self.diretorio = diretorio
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.max_documentos = max_documentos
+        self.serializador = serializador
+        self.comprimir = comprimir
+        self._lock = threading.RLock()
+        self._lock_arquivo = threading.Lock()  # uma escrita de arquivo por vez, fora do lock das leituras
+        # chave -> {"timestamp", "documentos", "data"}, da menos para a mais usada;
+        # "data" é None enquanto a entrada só existe no arquivo
+        self._entradas = OrderedDict()
+        self._documentos = 0
+        self._indexar_arquivos()
+
+    def _arquivo(self, chave):
+        return os.path.join(self.diretorio, chave + _EXTENSAO)
+
+    def _indexar_arquivos(self):
+        """Lê só os cabeçalhos dos arquivos existentes (os documentos ficam para o primeiro uso)"""
+        if not self.diretorio or not os.path.isdir(self.diretorio):
+            return
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(_EXTENSAO):
+                continue
+            try:
+                with open(os.path.join(self.diretorio, nome), 'rb') as f:
+                    marca, timestamp, documentos, _, serializador = _CABECALHO.unpack(f.read(_CABECALHO.size))
+            except (OSError, struct.error):
+                continue
+            if marca == _MARCA and serializador.rstrip(b"\0").decode("ascii", "replace") in SERIALIZADORES:
+                arquivos.append((timestamp, nome[:-len(_EXTENSAO)], documentos))
+        # Do mais antigo para o mais novo: a ordem do LRU começa pela idade
+        for timestamp, chave, documentos in sorted(arquivos):
+            self._guardar(chave, {"timestamp": timestamp, "documentos": documentos, "data": None})
+        self._limpar(time.time())
+
+    def _ler_arquivo(self, chave):
+        """Carrega os documentos de uma entrada do arquivo (None se não for possível)"""
+        try:
+            with open(self._arquivo(chave), 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                # As views do mmap são liberadas (with) antes de o mapa ser fechado
+                with memoryview(mapa) as conteudo, conteudo[_CABECALHO.size:] as corpo:
+                    _, _, _, comprimido, serializador = _CABECALHO.unpack_from(conteudo)
+                    desserializar = SERIALIZADORES[serializador.rstrip(b"\0").decode("ascii")][1]
+                    return desserializar(zlib.decompress(corpo) if comprimido else corpo)
+        except Exception:
+            return None
+
+    def _gravar_arquivo(self, chave, timestamp, dados):
+        """
+        Grava uma entrada (arquivo temporário + rename: quem lê nunca vê um arquivo pela metade)
+
+        As leituras não esperam a gravação. Se a entrada for substituída
+        antes de a gravação começar, a versão antiga não é gravada.
+        """
+        if not self.diretorio:
+            return True
+        with self._lock_arquivo:
+            with self._lock:
+                atual = self._entradas.get(chave)
+                if atual is None or atual["timestamp"] != timestamp:
+                    return False
+            try:
+                corpo = SERIALIZADORES[self.serializador][0](dados)
+                if self.comprimir:
+                    corpo = zlib.compress(corpo, 1)
+                cabecalho = _CABECALHO.pack(_MARCA, timestamp, len(dados), int(self.comprimir),
+                                            self.serializador.encode("ascii"))
+                os.makedirs(self.diretorio, exist_ok=True)
+                temporario = self._arquivo(chave) + ".tmp"
+                with open(temporario, 'wb') as f:
+                    f.write(cabecalho)
+                    f.write(corpo)
+                os.replace(temporario, self._arquivo(chave))
+            except Exception:
+                return False
+            # Entrada removida durante a gravação: o arquivo não pode voltar a existir
+            with self._lock:
+                if chave not in self._entradas:
+                    self._apagar_arquivo(chave)
+                    return False
+            return True
+
+    def _apagar_arquivo(self, chave):
+        if self.diretorio:
+            try:
+                os.remove(self._arquivo(chave))
+            except OSError:
+                pass
+
+    def _guardar(self, chave, entrada):
+        anterior = self._entradas.pop(chave, None)
+        if anterior is not None:
+            self._documentos -= anterior["documentos"]
+        self._entradas[chave] = entrada
+        self._documentos += entrada["documentos"]
+
+    def _remover(self, chave):
+        entrada = self._entradas.pop(chave, None)
+        if entrada is not None:
+            self._documentos -= entrada["documentos"]
+            self._apagar_arquivo(chave)
+
+    def _limpar(self, agora):
+        """Descarta entradas expiradas e, se preciso, as menos usadas até caber nos limites"""
+        for chave in [chave for chave, entrada in self._entradas.items()
+                      if agora - entrada["timestamp"] > self.ttl_segundos]:
+            self._remover(chave)
+        # A entrada mais recente fica mesmo que sozinha passe do limite de documentos
+        while len(self._entradas) > 1 and (len(self._entradas) > self.max_entradas or self._documentos > self.max_documentos):
+            self._remover(next(iter(self._entradas)))
+
+    def info(self, chave):
+        """
+        Timestamp e quantidade de documentos de uma entrada, sem carregar os documentos
+
+        Returns:
+            dict: {"timestamp", "documentos"} ou None se não houver entrada
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or time.time() - entrada["timestamp"] > self.ttl_segundos:
+                return None
+            return {"timestamp": entrada["timestamp"], "documentos": entrada["documentos"]}
+
+    def obter(self, chave):
+        """
+        Obtém uma entrada, carregando os documentos do arquivo no primeiro acesso
+
+        Args:
+            chave: Chave da entrada (chave_cache)
+
+        Returns:
+            dict: {"timestamp", "documentos", "data"} ou None se não houver entrada (ou ela expirou)
+        """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            if time.time() - entrada["timestamp"] > self.ttl_segundos:
+                self._remover(chave)
+                return None
+            self._entradas.move_to_end(chave)
+            if entrada["data"] is not None:
+                return entrada
+        # Leitura do arquivo fora do lock; se outra thread trocou a entrada nesse meio tempo, vale a nova
+        dados = self._ler_arquivo(chave)
+        with self._lock:
+            atual = self._entradas.get(chave)
+            if atual is not entrada:
+                return atual if atual is None or atual["data"] is not None else None
+            if dados is None:
+                self._remover(chave)
+                return None
+            entrada["data"] = dados
+            return entrada
+
+    def definir(self, chave, dados):
+        """
+        Guarda os dados de uma entrada com o horário atual
+
+        Returns:
+            bool: True se a entrada também foi gravada no arquivo
+        """
+        with self._lock:
+            agora = time.time()
+            self._guardar(chave, {"timestamp": agora, "documentos": len(dados), "data": dados})
+            self._limpar(agora)
+        return self._gravar_arquivo(chave, agora, dados)
+
+    def invalidar(self, chave=None):
+        """Remove uma entrada (ou todas, sem chave)"""
+        with self._lock:
+            for chave_removida in (list(self._entradas) if chave is None else [chave]):
+                self._remover(chave_removida)
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+# Um cache por diretório no processo
+_caches_compartilhados = {}
+_lock_caches = threading.Lock()
+
+
+def obter_cache_compartilhado(diretorio=DEFAULT_DIRETORIO_CACHE):
+    """
+    Obtém o cache do processo associado ao diretório, criando-o na primeira chamada
+
+    Args:
+        diretorio: Diretório dos arquivos do cache
+
+    Returns:
+        CacheCompartilhado: Cache compartilhado por todas as sessões
+    """
+    with _lock_caches:
+        cache = _caches_compartilhados.get(diretorio)
+        if cache is None:
+            cache = CacheCompartilhado(diretorio)
+            _caches_compartilhados[diretorio] = cache
+        return cache
+
 
 class MongoDBCache:
     """
-    Implementa um sistema de cache para dados do MongoDB
-    para melhorar a performance e lidar com falhas de conexão
+    Visão de uma sessão sobre uma entrada do cache compartilhado
+
+    Os dados ficam no CacheCompartilhado do processo; a visão guarda só a
+    chave da consulta atual e a validade escolhida pela sessão.
     """
     
-    def __init__(self, cache_file="mongodb_cache.json", max_age_seconds=3600):
+    def __init__(self, cache_dir=DEFAULT_DIRETORIO_CACHE, max_age_seconds=3600, chave=CHAVE_PADRAO):
         """
-        Inicializa o cache
+        Inicializa a visão do cache
         
         Args:
-            cache_file: Nome do arquivo para armazenar o cache
+            cache_dir: Diretório do cache compartilhado
             max_age_seconds: Idade máxima em segundos para considerar o cache válido
+            chave: Entrada do cache compartilhado (chave_cache da consulta atual)
         """
-        self.cache_file = cache_file
+        self.cache_dir = cache_dir
         self.max_age_seconds = max_age_seconds
-        self.cache = self._carregar_cache()
-        
-    def _carregar_cache(self):
-        """Carrega o cache do arquivo"""
-        try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {"timestamp": 0, "data": []}
-        except Exception:
-            return {"timestamp": 0, "data": []}
-    
-    def _salvar_cache(self):
-        """Salva o cache para o arquivo"""
-        try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f)
-            return True
-        except Exception:
-            return False
+        self.chave = chave
+        self.compartilhado = obter_cache_compartilhado(cache_dir)
+
+    @property
+    def cache(self):
+        """Entrada atual ({"timestamp", "data"}), vazia se não houver"""
+        return self.compartilhado.obter(self.chave) or {"timestamp": 0, "data": []}
     
     def set_cache(self, data):
         """
@@ -54,11 +378,7 @@ class MongoDBCache:
         Returns:
             bool: True se o cache foi atualizado com sucesso
         """
-        self.cache = {
-            "timestamp": time.time(),
-            "data": data
-        }
-        return self._salvar_cache()
+        return self.compartilhado.definir(self.chave, data)
     
     def get_cache(self):
         """
@@ -67,24 +387,34 @@ class MongoDBCache:
         Returns:
             list: Dados do cache ou None se o cache for inválido
         """
-        if time.time() - self.cache["timestamp"] > self.max_age_seconds:
+        if time.time() - self.get_timestamp() > self.max_age_seconds:
             return None  # Cache expirado
         return self.cache["data"]
     
     def is_valid(self):
         """
-        Verifica se o cache é válido
+        Verifica se o cache é válido (sem carregar os documentos)
         
         Returns:
             bool: True se o cache for válido
         """
-        return (time.time() - self.cache["timestamp"] <= self.max_age_seconds and
-                len(self.cache["data"]) > 0)
+        info = self.compartilhado.info(self.chave)
+        return (info is not None and time.time() - info["timestamp"] <= self.max_age_seconds and
+                info["documentos"] > 0)
     
     def invalidate(self):
-        """Invalida o cache atual"""
-        self.cache = {"timestamp": 0, "data": []}
-        self._salvar_cache()
+        """Invalida a entrada atual (para todas as sessões)"""
+        self.compartilhado.invalidar(self.chave)
+    
+    def get_timestamp(self):
+        """
+        Horário em que a entrada atual foi gravada (0 se não houver)
+        
+        Returns:
+            float: Timestamp da entrada
+        """
+        info = self.compartilhado.info(self.chave)
+        return info["timestamp"] if info is not None else 0
     
     def get_age_seconds(self):
         """
@@ -93,12 +423,18 @@ class MongoDBCache:
         Returns:
             float: Idade do cache em segundos
         """
-        return time.time() - self.cache["timestamp"]
+        return time.time() - self.get_timestamp()
+
+# Uma gravação do CSV de backup por vez no processo (a última a terminar é a que fica)
+_lock_backup = threading.Lock()
 
 def salvar_dados_csv_backup(dados, filename="mongodb_backup.csv"):
     """
     Salva dados em um CSV de backup
     
+    Grava num arquivo temporário e troca pelo backup com os.replace: quem lê o
+    backup (ex: o fallback de outra sessão) nunca vê um arquivo pela metade.
+    
     Args:
         dados: Lista de dicionários com dados
         filename: Nome do arquivo CSV
@@ -106,39 +442,188 @@ def salvar_dados_csv_backup(dados, filename="mongodb_backup.csv"):
     Returns:
         bool: True se o backup foi bem-sucedido
     """
+    temporario = None
     try:
         df = pd.DataFrame(dados)
-        df.to_csv(filename, index=False)
+        with _lock_backup:
+            descritor, temporario = tempfile.mkstemp(
+                prefix=os.path.basename(filename) + ".", suffix=".tmp",
+                dir=os.path.dirname(filename) or "."
+            )
+            with os.fdopen(descritor, 'w', encoding='utf-8', newline='') as f:
+                df.to_csv(f, index=False)
+            os.replace(temporario, filename)
         return True
     except Exception:
+        if temporario is not None and os.path.exists(temporario):
+            os.remove(temporario)
         return False
 
-def carregar_dados_csv_backup(filename="mongodb_backup.csv"):
+def carregar_dados_csv_backup(filename="mongodb_backup.csv", alternativo=CSV_ORIGINAL):
     """
     Carrega dados de um CSV de backup
     
     Args:
         filename: Nome do arquivo CSV
+        alternativo: CSV lido quando o backup não existe ou está vazio (None: nenhum)
     
     Returns:
         list: Lista de dicionários com dados ou lista vazia se falhar
     """
-    try:
-        if os.path.exists(filename):
-            df = pd.read_csv(filename)
-            return df.to_dict('records')
-        return []
-    except Exception:
-        return []
+    for arquivo in (filename, alternativo):
+        try:
+            if arquivo and os.path.exists(arquivo):
+                df = pd.read_csv(arquivo)
+                if not df.empty:
+                    return df.to_dict('records')
+        except Exception:
+            continue
+    return []
+
+class TempoEsgotadoBusca(TimeoutError):
+    """A busca em andamento de outra sessão não terminou dentro do timeout"""
+
 
-def obter_dados_com_cache(obter_func, cache_instance=None, force_refresh=False):
+class CoalescedorBuscas:
+    """
+    Uma busca por chave de cada vez (single-flight)
+
+    Quando o cache expira, várias sessões pedem os mesmos dados quase ao mesmo
+    tempo. A primeira executa a busca; as demais esperam o resultado dela (ou o
+    mesmo erro) em vez de consultar o MongoDB também.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}  # chave -> {"evento", "resultado", "erro"}
+        self._metricas = {"buscas": 0, "coalescidas": 0, "tempo_esgotado": 0, "falhas_segundo_plano": 0}
+
+    def executar(self, chave, funcao, timeout=DEFAULT_TIMEOUT_COALESCENCIA):
+        """
+        Executa `funcao` ou espera a execução já em andamento para a mesma chave
+
+        Args:
+            chave: Identifica buscas equivalentes (ex: chave_cache da consulta)
+            funcao: Função sem argumentos que faz a busca
+            timeout: Segundos que um chamador espera pela busca de outro
+
+        Returns:
+            O resultado de `funcao` (da sua execução ou da que estava em andamento)
+
+        Raises:
+            TempoEsgotadoBusca: Se a busca em andamento não terminou no timeout
+        """
+        with self._lock:
+            busca = self._em_andamento.get(chave)
+            lider = busca is None
+            if lider:
+                busca = {"evento": threading.Event(), "resultado": None, "erro": None}
+                self._em_andamento[chave] = busca
+                self._metricas["buscas"] += 1
+            else:
+                self._metricas["coalescidas"] += 1
+
+        if lider:
+            try:
+                busca["resultado"] = funcao()
+                return busca["resultado"]
+            except BaseException as e:
+                busca["erro"] = e
+                raise
+            finally:
+                with self._lock:
+                    del self._em_andamento[chave]
+                busca["evento"].set()
+
+        if not busca["evento"].wait(timeout):
+            with self._lock:
+                self._metricas["tempo_esgotado"] += 1
+            raise TempoEsgotadoBusca(f"Busca em andamento não terminou em {timeout}s")
+        if busca["erro"] is not None:
+            raise busca["erro"]
+        return busca["resultado"]
+
+    def em_andamento(self, chave):
+        """Indica se há uma busca em andamento para a chave"""
+        with self._lock:
+            return chave in self._em_andamento
+
+    def registrar_falha_segundo_plano(self):
+        """Conta uma renovação em segundo plano que terminou com erro"""
+        with self._lock:
+            self._metricas["falhas_segundo_plano"] += 1
+
+    def metricas(self):
+        """
+        Contadores desde o início do processo
+
+        Returns:
+            dict: buscas (executadas), coalescidas (chamadas que aproveitaram outra busca),
+                tempo_esgotado, falhas_segundo_plano (renovações em segundo plano com erro) e em_andamento
+        """
+        with self._lock:
+            return dict(self._metricas, em_andamento=len(self._em_andamento))
+
+
+# Coalescedor do processo, usado por obter_dados_com_cache
+BUSCAS_COALESCIDAS = CoalescedorBuscas()
+
+
+def revalidar_em_segundo_plano(chave, funcao):
+    """
+    Executa uma busca numa thread em segundo plano, no máximo uma por chave
+
+    Args:
+        chave: Chave da entrada sendo renovada
+        funcao: Função sem argumentos que busca e grava a entrada
+
+    Returns:
+        bool: True se a thread foi iniciada (False se a chave já está sendo buscada)
+    """
+    if BUSCAS_COALESCIDAS.em_andamento(chave):
+        return False
+
+    def executar():
+        try:
+            BUSCAS_COALESCIDAS.executar(chave, funcao)
+        except Exception:
+            # Os dados antigos continuam no cache; a próxima atualização tenta de novo
+            BUSCAS_COALESCIDAS.registrar_falha_segundo_plano()
+            logger.exception("Falha na renovação do cache em segundo plano (%s)", chave)
+
+    threading.Thread(target=executar, name="revalidar-cache-mongodb", daemon=True).start()
+    return True
+
+
+def obter_dados_com_cache(obter_func, cache_instance=None, force_refresh=False, coalescer=True,
+                          timeout_coalescencia=DEFAULT_TIMEOUT_COALESCENCIA, idade_maxima_obsoleta=None,
+                          obter_func_segundo_plano=None, persistir=True):
     """
     Obtém dados usando cache quando possível
     
+    Sessões que precisam da mesma entrada ao mesmo tempo fazem uma única
+    chamada a obter_func (as outras esperam o resultado dela).
+    
+    Com `idade_maxima_obsoleta` (stale-while-revalidate), um cache expirado
+    mas mais novo que esse limite é devolvido na hora e a entrada é renovada
+    numa thread em segundo plano; a próxima chamada já encontra os dados
+    novos. Acima do limite a busca volta a ser feita na hora.
+    
     Args:
         obter_func: Função para obter dados do MongoDB
         cache_instance: Instância de MongoDBCache
         force_refresh: Forçar atualização ignorando o cache
+        coalescer: Juntar buscas simultâneas da mesma chave (desligue se obter_func
+            depender do estado da sessão, como a busca incremental)
+        timeout_coalescencia: Segundos de espera pela busca de outra sessão;
+            depois disso são usados o cache ou o backup
+        idade_maxima_obsoleta: Idade máxima (s) dos dados servidos durante a
+            renovação em segundo plano (None desliga o modo)
+        obter_func_segundo_plano: Função usada na renovação em segundo plano
+            (padrão: obter_func); não deve usar a interface da sessão
+        persistir: Gravar o resultado no cache e no backup em CSV (desligue na busca
+            incremental: a sessão guarda os documentos no próprio conjunto e cada
+            variação reescreveria a entrada inteira)
     
     Returns:
         tuple: (dados, origem_dados, status)
@@ -149,19 +634,42 @@ def obter_dados_com_cache(obter_func, cache_instance=None, force_refresh=False):
     # Se não tiver instância de cache, criar uma temporária
     if cache_instance is None:
         cache_instance = MongoDBCache()
+    # A chave é fixada agora: a sessão pode trocar a consulta da visão antes de a busca terminar
+    chave = cache_instance.chave
+    compartilhado = cache_instance.compartilhado
+    max_idade = cache_instance.max_age_seconds
+    
+    def buscar(funcao, forcar):
+        # Outra sessão pode ter renovado a entrada entre o teste abaixo e esta busca
+        entrada = compartilhado.obter(chave)
+        if not forcar and entrada and entrada["data"] and time.time() - entrada["timestamp"] <= max_idade:
+            return entrada["data"], "cache"
+        dados = funcao()
+        if persistir and dados and len(dados) > 0:
+            # Atualizar cache com os novos dados
+            compartilhado.definir(chave, dados)
+            # Criar backup em CSV
+            salvar_dados_csv_backup(dados)
+        return dados, "mongodb"
+    
+    # Cache expirado há pouco: serve o que existe e renova sem a sessão esperar
+    if not force_refresh and idade_maxima_obsoleta is not None and not cache_instance.is_valid():
+        entrada = compartilhado.obter(chave)
+        if entrada and entrada["data"] and time.time() - entrada["timestamp"] <= idade_maxima_obsoleta:
+            revalidar_em_segundo_plano(chave, lambda: buscar(obter_func_segundo_plano or obter_func, False))
+            return entrada["data"], "cache", True
     
     # Se for forçada atualização ou cache inválido, buscar do MongoDB
     if force_refresh or not cache_instance.is_valid():
         try:
-            # Tentar obter dados do MongoDB
-            dados_mongodb = obter_func()
+            # Tentar obter dados do MongoDB (uma busca por chave entre todas as sessões)
+            if coalescer:
+                dados_mongodb, origem = BUSCAS_COALESCIDAS.executar(chave, lambda: buscar(obter_func, force_refresh), timeout_coalescencia)
+            else:
+                dados_mongodb, origem = buscar(obter_func, force_refresh)
             
             if dados_mongodb and len(dados_mongodb) > 0:
-                # Atualizar cache com os novos dados
-                cache_instance.set_cache(dados_mongodb)
-                # Criar backup em CSV
-                salvar_dados_csv_backup(dados_mongodb)
-                return dados_mongodb, "mongodb", True
+                return dados_mongodb, origem, True
             else:
                 # Se não tiver dados no MongoDB, tentar usar cache ou backup
                 dados_cache = cache_instance.get_cache()
@@ -0,0 +1,383 @@
+"""
+Atualização em tempo real das oportunidades via change streams do MongoDB
+
+Uma thread em segundo plano escuta `collection.watch()` e aplica inserções,
+atualizações e remoções a um conjunto de oportunidades compartilhado pelo
+processo. Quando o servidor não é um replica set (change streams não
+disponíveis), a mesma thread cai para polling com a busca incremental.
+
+Para testar localmente com um replica set de um nó:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval "rs.initiate()"
+    python mongodb_change_stream.py "mongodb://localhost:27017/?replicaSet=rs0"
+
+e insira/edite/remova documentos na coleção em outro terminal.
+"""
+import sys
+import threading
+import time
+import weakref
+from pymongo.errors import OperationFailure, PyMongoError
+from arbitrage_incremental import MotorIncrementalArbitragem, aplicar_documentos
+from mongodb_incremental import ConjuntoIncrementalSurebets
+
+# Intervalo do polling usado quando não há change streams (segundos)
+DEFAULT_INTERVALO_POLLING = 5
+
+# Máximo de eventos do change stream processados de uma vez
+DEFAULT_TAMANHO_LOTE_EVENTOS = 500
+
+# Tempo que o servidor segura um getMore sem eventos (ms): limita a latência de parar a thread
+DEFAULT_ESPERA_EVENTOS_MS = 250
+
+# Espera antes de reabrir o change stream depois de um erro de rede (segundos)
+DEFAULT_ESPERA_RECONEXAO = 2
+
+# Operações cujo documento é conferido de novo com o filtro do conjunto
+_OPERACOES_ALTERACAO = ["update", "replace", "delete"]
+
+
+def _prefixar_filtro(filtro, prefixo="fullDocument."):
+    """
+    Reescreve um filtro de find para os campos do documento dentro de um evento do change stream
+
+    Ex: {"esporte": {"$in": [...]}, "$or": [{"lucro_percentual": ...}]} vira
+    {"fullDocument.esporte": {"$in": [...]}, "$or": [{"fullDocument.lucro_percentual": ...}]}
+    """
+    prefixado = {}
+    for campo, condicao in filtro.items():
+        if campo in ("$and", "$or", "$nor"):
+            prefixado[campo] = [_prefixar_filtro(item, prefixo) for item in condicao]
+        else:
+            prefixado[prefixo + campo] = condicao
+    return prefixado
+
+
+class OportunidadesAoVivo:
+    """
+    Oportunidades por documento, compartilhadas entre a thread do ouvinte e as sessões
+
+    As oportunidades vêm de um MotorIncrementalArbitragem (um evento por
+    documento): cada lote recalcula só os documentos tocados. Cada aplicação de
+    mudanças incrementa `versao` e acorda quem espera em aguardar_mudanca.
+    """
+
+    def __init__(self):
+        self._motor = MotorIncrementalArbitragem()
+        self._documentos = {}
+        self._condicao = threading.Condition()
+        self.versao = 0
+
+    def aplicar(self, documentos=(), removidos=(), substituir=False):
+        """
+        Aplica um lote de documentos novos/alterados e de remoções
+
+        Args:
+            documentos: Documentos inseridos ou alterados (versão completa)
+            removidos: _id dos documentos removidos
+            substituir: Descarta todas as oportunidades antes (carga completa)
+        """
+        documentos = list(documentos)
+        if substituir:
+            # Carga completa num motor novo, fora do lock: as sessões continuam lendo a versão anterior
+            motor = MotorIncrementalArbitragem()
+            aplicar_documentos(motor, documentos)
+        with self._condicao:
+            if substituir:
+                self._motor = motor
+                self._documentos = {}
+            else:
+                aplicar_documentos(self._motor, documentos, removidos)
+            for chave in removidos:
+                self._documentos.pop(str(chave), None)
+            for documento in documentos:
+                self._documentos[str(documento.get('_id', ''))] = documento
+            self.versao += 1
+            self._condicao.notify_all()
+
+    def oportunidades(self):
+        """Lista com as oportunidades atuais"""
+        with self._condicao:
+            return self._motor.oportunidades
+
+    def instantaneo(self):
+        """
+        Versão, oportunidades e documentos atuais lidos de uma vez (consistentes entre si)
+
+        Returns:
+            tuple: (versao, oportunidades, documentos)
+        """
+        with self._condicao:
+            return self.versao, self._motor.oportunidades, list(self._documentos.values())
+
+    def aguardar_mudanca(self, versao, timeout):
+        """
+        Espera até a versão ser diferente da informada ou o timeout acabar
+
+        Returns:
+            int: Versão atual
+        """
+        with self._condicao:
+            self._condicao.wait_for(lambda: self.versao != versao, timeout)
+            return self.versao
+
+    def __len__(self):
+        with self._condicao:
+            return len(self._motor)
+
+
+def suporta_change_streams(cliente):
+    """True se o servidor é um replica set ou um mongos (onde watch() funciona)"""
+    hello = cliente.admin.command('hello')
+    return bool(hello.get('setName')) or hello.get('msg') == 'isdbgrid'
+
+
+# Marca de documento alterado, conferido com o filtro depois do lote
+_ALTERADO = object()
+
+
+class OuvinteMudancas:
+    """
+    Thread que mantém um OportunidadesAoVivo atualizado a partir de uma coleção
+
+    O modo efetivo fica em `modo`: "change_stream" ou "polling".
+    """
+
+    def __init__(self, collection, filtro=None, projecao=None,
+                 intervalo_polling=DEFAULT_INTERVALO_POLLING,
+                 tamanho_lote=DEFAULT_TAMANHO_LOTE_EVENTOS):
+        """
+        Args:
+            collection: Coleção do pymongo
+            filtro: Filtro da carga inicial e do polling (ex: montar_consulta_surebets)
+            projecao: Projeção da carga inicial e do polling
+            intervalo_polling: Intervalo do polling quando não há change streams (segundos)
+            tamanho_lote: Máximo de eventos processados de uma vez
+        """
+        self.collection = collection
+        self.filtro = filtro or {}
+        self.projecao = projecao
+        self.intervalo_polling = intervalo_polling
+        self.tamanho_lote = tamanho_lote
+        self.conjunto = OportunidadesAoVivo()
+        self.modo = None
+        self.erro = None
+        self._token_retomada = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    @property
+    def ativo(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self):
+        """Inicia a thread em segundo plano (se ainda não estiver rodando)"""
+        if self.ativo:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="ouvinte-mudancas", daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout=5):
+        """Pede para a thread parar e espera até `timeout` segundos"""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _executar(self):
+        try:
+            usar_change_stream = suporta_change_streams(self.collection.database.client)
+        except PyMongoError as e:
+            self.erro = str(e)
+            usar_change_stream = False
+
+        while usar_change_stream and not self._parar.is_set():
+            try:
+                self._ouvir_change_stream()
+            except OperationFailure as e:
+                self.erro = str(e)
+                if self._token_retomada is not None:
+                    # Token fora do oplog (ex: ChangeStreamHistoryLost): recomeça com carga completa
+                    self._token_retomada = None
+                else:
+                    # Ex: "$changeStream stage is only supported on replica sets"
+                    usar_change_stream = False
+            except PyMongoError as e:
+                # Erro de rede: reabre a partir do último token recebido
+                self.erro = str(e)
+                self._parar.wait(DEFAULT_ESPERA_RECONEXAO)
+
+        if not self._parar.is_set():
+            self._polling()
+
+    def _pipeline_change_stream(self):
+        """
+        Pipeline do watch(): inserções já filtradas e projetadas no servidor
+
+        Atualizações e substituições passam sempre, porque podem tirar um
+        documento do filtro; elas são conferidas em _documentos_alterados.
+        """
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$in": _OPERACOES_ALTERACAO}},
+            dict(_prefixar_filtro(self.filtro), operationType="insert")
+        ]}}]
+        if self.projecao:
+            projecao = {"operationType": 1, "documentKey": 1, "fullDocument._id": 1}
+            projecao.update({"fullDocument." + campo: valor for campo, valor in self.projecao.items()})
+            pipeline.append({"$project": projecao})
+        return pipeline
+
+    def _documentos_alterados(self, chaves):
+        """
+        Versão atual dos documentos alterados que ainda atendem ao filtro, com a projeção do conjunto
+
+        Returns:
+            dict: _id -> documento (quem não voltou saiu do filtro ou foi removido)
+        """
+        por_chave = {"_id": {"$in": chaves}}
+        consulta = {"$and": [self.filtro, por_chave]} if self.filtro else por_chave
+        return {documento["_id"]: documento for documento in self.collection.find(consulta, self.projecao)}
+
+    def _ouvir_change_stream(self):
+        """Carga inicial seguida dos eventos do change stream"""
+        with self.collection.watch(
+            self._pipeline_change_stream(),
+            resume_after=self._token_retomada,
+            max_await_time_ms=DEFAULT_ESPERA_EVENTOS_MS
+        ) as stream:
+            if self._token_retomada is None:
+                # O stream já está aberto: nada inserido durante a carga se perde
+                documentos = list(self.collection.find(self.filtro, self.projecao))
+                self.conjunto.aplicar(documentos, substituir=True)
+                self._token_retomada = stream.resume_token
+            self.modo = "change_stream"
+            self.erro = None
+
+            while not self._parar.is_set() and stream.alive:
+                # _id -> documento novo, None (removido) ou _ALTERADO; vale o último evento de cada _id
+                mudancas = {}
+                evento = stream.try_next()
+                while evento is not None:
+                    chave = evento["documentKey"]["_id"]
+                    mudancas.pop(chave, None)
+                    if evento["operationType"] == "delete":
+                        mudancas[chave] = None
+                    elif evento["operationType"] == "insert":
+                        mudancas[chave] = evento["fullDocument"]
+                    else:
+                        mudancas[chave] = _ALTERADO
+                    if len(mudancas) >= self.tamanho_lote:
+                        break
+                    evento = stream.try_next()
+                if mudancas:
+                    alterados = [chave for chave, documento in mudancas.items() if documento is _ALTERADO]
+                    if alterados:
+                        # Uma alteração que tira o documento do filtro conta como remoção
+                        atuais = self._documentos_alterados(alterados)
+                        for chave in alterados:
+                            mudancas[chave] = atuais.get(chave)
+                    self.conjunto.aplicar(
+                        [documento for documento in mudancas.values() if documento is not None],
+                        [chave for chave, documento in mudancas.items() if documento is None]
+                    )
+                self._token_retomada = stream.resume_token
+
+    def _polling(self):
+        """Busca incremental periódica (não detecta remoções feitas no servidor)"""
+        self.modo = "polling"
+        incremental = ConjuntoIncrementalSurebets(max_idade_segundos=None)
+        while not self._parar.is_set():
+            try:
+                incremental.atualizar(self.collection, self.filtro, self.projecao)
+                variacao = incremental.ultima_variacao
+                if variacao["completa"] or variacao["novos"] or variacao["removidos"]:
+                    documentos = incremental.documentos if variacao["completa"] else variacao["novos"]
+                    self.conjunto.aplicar(documentos, variacao["removidos"], substituir=variacao["completa"])
+                self.erro = None
+            except PyMongoError as e:
+                self.erro = str(e)
+            self._parar.wait(self.intervalo_polling)
+
+
+# chave -> [ouvinte, referências]
+_ouvintes = {}
+_lock = threading.Lock()
+
+
+def chave_ouvinte(collection, filtro=None, projecao=None, intervalo_polling=DEFAULT_INTERVALO_POLLING):
+    """Chave que identifica o ouvinte de uma coleção/filtro/projeção"""
+    return (id(collection.database.client), collection.full_name, repr(filtro), repr(projecao), intervalo_polling)
+
+
+class ReferenciaOuvinte:
+    """
+    Uso de um ouvinte compartilhado por quem o adquiriu (ex: uma sessão)
+
+    O ouvinte só para quando a última referência é liberada, com liberar() ou
+    quando a referência é coletada pelo coletor de lixo (sessão encerrada).
+    """
+
+    def __init__(self, chave, ouvinte):
+        self.chave = chave
+        self.ouvinte = ouvinte
+        self._finalizador = weakref.finalize(self, _liberar, chave)
+
+    def liberar(self):
+        """Devolve a referência (chamadas repetidas não fazem nada)"""
+        self._finalizador()
+
+
+def adquirir_ouvinte(collection, filtro=None, projecao=None, intervalo_polling=DEFAULT_INTERVALO_POLLING):
+    """
+    Obtém o ouvinte do processo para a coleção/filtro, iniciando-o se preciso
+
+    Existe um ouvinte por coleção/filtro/projeção, compartilhado por todos que
+    pedem a mesma chave; sessões com filtros diferentes não param o ouvinte
+    umas das outras. Cada chamada conta uma referência: guarde a referência
+    devolvida e libere-a quando o ouvinte não for mais necessário.
+
+    Returns:
+        ReferenciaOuvinte: Referência ao ouvinte em execução
+    """
+    chave = chave_ouvinte(collection, filtro, projecao, intervalo_polling)
+    with _lock:
+        registro = _ouvintes.get(chave)
+        if registro is None:
+            registro = _ouvintes[chave] = [OuvinteMudancas(collection, filtro, projecao, intervalo_polling), 0]
+        registro[1] += 1
+        registro[0].iniciar()  # Reinicia se a thread tiver terminado
+        return ReferenciaOuvinte(chave, registro[0])
+
+
+def _liberar(chave):
+    """Desconta uma referência e para o ouvinte quando não sobra nenhuma"""
+    with _lock:
+        registro = _ouvintes.get(chave)
+        if registro is None:
+            return
+        registro[1] -= 1
+        if registro[1] > 0:
+            return
+        del _ouvintes[chave]
+    # Sem esperar a thread: o getMore em andamento termina em até DEFAULT_ESPERA_EVENTOS_MS
+    registro[0].parar(timeout=0)
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+    from mongodb_default_config import DEFAULT_MONGODB_DATABASE, DEFAULT_MONGODB_COLLECTION
+
+    uri = sys.argv[1] if len(sys.argv) > 1 else "mongodb://localhost:27017/?replicaSet=rs0"
+    cliente = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    referencia = adquirir_ouvinte(cliente[DEFAULT_MONGODB_DATABASE][DEFAULT_MONGODB_COLLECTION])
+    ouvinte = referencia.ouvinte
+    print(f"Ouvindo {DEFAULT_MONGODB_DATABASE}.{DEFAULT_MONGODB_COLLECTION} (Ctrl+C para sair)")
+    versao = 0
+    try:
+        while True:
+            versao = ouvinte.conjunto.aguardar_mudanca(versao, timeout=5)
+            print(f"[{time.strftime('%H:%M:%S')}] modo={ouvinte.modo} versão={versao} "
+                  f"oportunidades={len(ouvinte.conjunto)} erro={ouvinte.erro}")
+    except KeyboardInterrupt:
+        referencia.liberar()
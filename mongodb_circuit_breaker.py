@@ -0,0 +1,158 @@
+"""
+Disjuntor (circuit breaker) das conexões com o MongoDB
+
+Cada tentativa de conexão com o servidor fora do ar custa um
+serverSelectionTimeoutMS inteiro na thread que renderiza a página. Depois de
+algumas falhas seguidas o disjuntor abre: as sessões recebem "sem conexão" na
+hora (e usam cache/backup) enquanto uma thread em segundo plano testa a volta do
+servidor com espera exponencial e jitter. Quando o teste passa, o disjuntor
+fecha e as consultas voltam ao normal.
+
+Estados:
+    fechado: consultas liberadas
+    aberto: consultas bloqueadas até o próximo teste
+    meio_aberto: teste de recuperação em andamento (consultas ainda bloqueadas)
+"""
+import random
+import threading
+import time
+from mongodb_default_config import DEFAULT_MONGODB_MAX_RETRIES
+
+ESTADO_FECHADO = "fechado"
+ESTADO_ABERTO = "aberto"
+ESTADO_MEIO_ABERTO = "meio_aberto"
+
+# Falhas seguidas até abrir o disjuntor (as antigas "tentativas" de conexão)
+DEFAULT_LIMIAR_FALHAS = DEFAULT_MONGODB_MAX_RETRIES
+# Espera antes do primeiro teste e limite da espera exponencial (segundos)
+DEFAULT_ESPERA_INICIAL = 2.0
+DEFAULT_ESPERA_MAXIMA = 120.0
+
+
+class DisjuntorMongo:
+    """
+    Disjuntor compartilhado por todas as sessões do processo
+
+    Quem consulta o MongoDB chama `permitir()` antes e `registrar_sucesso()` /
+    `registrar_falha()` depois. A recuperação é testada por `sonda`, uma função
+    sem argumentos que levanta exceção se o servidor continuar inacessível.
+    """
+
+    def __init__(self, limiar_falhas=DEFAULT_LIMIAR_FALHAS, espera_inicial=DEFAULT_ESPERA_INICIAL,
+                 espera_maxima=DEFAULT_ESPERA_MAXIMA):
+        """
+        Args:
+            limiar_falhas: Falhas seguidas que abrem o disjuntor
+            espera_inicial: Espera (s) antes do primeiro teste de recuperação
+            espera_maxima: Limite (s) da espera, que dobra a cada teste que falha
+        """
+        self.limiar_falhas = limiar_falhas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self._lock = threading.Lock()
+        self._estado = ESTADO_FECHADO
+        self._falhas = 0           # falhas seguidas (consultas e testes)
+        self._aberturas = 0        # testes que falharam desde a abertura (expoente da espera)
+        self._proximo_teste = None
+        self._ultimo_erro = None
+        self._sonda = None
+        self._parar = threading.Event()  # sinaliza o fim da thread de teste atual
+
+    def _espera(self):
+        """Espera exponencial com jitter: entre metade e o total do intervalo"""
+        espera = min(self.espera_maxima, self.espera_inicial * (2 ** self._aberturas))
+        return random.uniform(espera / 2, espera)
+
+    def permitir(self):
+        """
+        Indica se uma consulta pode ir ao servidor agora
+
+        Returns:
+            bool: True com o disjuntor fechado
+        """
+        return self._estado == ESTADO_FECHADO
+
+    def registrar_sucesso(self):
+        """Registra uma consulta bem-sucedida e fecha o disjuntor"""
+        with self._lock:
+            self._estado = ESTADO_FECHADO
+            self._falhas = 0
+            self._aberturas = 0
+            self._proximo_teste = None
+            self._parar.set()
+
+    def registrar_falha(self, erro, sonda=None):
+        """
+        Registra uma falha de conexão; no limiar, abre o disjuntor e inicia os testes
+
+        Args:
+            erro: Exceção ou mensagem da falha
+            sonda: Função que testa o servidor em segundo plano (ex: ping)
+        """
+        with self._lock:
+            self._falhas += 1
+            self._ultimo_erro = str(erro)
+            if sonda is not None:
+                self._sonda = sonda
+            if self._estado != ESTADO_FECHADO or self._falhas < self.limiar_falhas:
+                return
+            self._estado = ESTADO_ABERTO
+            self._aberturas = 0
+            self._proximo_teste = time.time() + self._espera()
+            if self._sonda is not None:
+                # Uma thread por abertura; a anterior (se houver) já recebeu o sinal de parar
+                self._parar = threading.Event()
+                threading.Thread(target=self._testar_recuperacao, args=(self._parar,),
+                                 name="disjuntor-mongodb", daemon=True).start()
+
+    def _testar_recuperacao(self, parar):
+        """Laço da thread de teste: espera, testa e fecha ou reabre com espera maior"""
+        while True:
+            with self._lock:
+                espera = max(0.0, self._proximo_teste - time.time()) if not parar.is_set() else 0.0
+            if parar.wait(espera):
+                return
+            with self._lock:
+                if parar.is_set():
+                    return
+                self._estado = ESTADO_MEIO_ABERTO
+                sonda = self._sonda
+            try:
+                sonda()
+            except Exception as e:
+                with self._lock:
+                    if parar.is_set():
+                        return
+                    self._falhas += 1
+                    self._ultimo_erro = str(e)
+                    self._aberturas += 1
+                    self._estado = ESTADO_ABERTO
+                    self._proximo_teste = time.time() + self._espera()
+            else:
+                self.registrar_sucesso()
+                return
+
+    def reiniciar(self):
+        """Fecha o disjuntor e para os testes (ex: a URI ou as configurações mudaram)"""
+        self.registrar_sucesso()
+        with self._lock:
+            self._ultimo_erro = None
+
+    def estado(self):
+        """
+        Estado atual do disjuntor
+
+        Returns:
+            dict: estado, falhas, proximo_teste (timestamp ou None) e ultimo_erro
+        """
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "falhas": self._falhas,
+                "proximo_teste": self._proximo_teste,
+                "ultimo_erro": self._ultimo_erro
+            }
+
+
+# Instância do processo, compartilhada por todas as sessões
+DISJUNTOR_MONGO = DisjuntorMongo()
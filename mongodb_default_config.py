@@ -13,3 +13,5 @@ DEFAULT_MONGODB_COLLECTION = "dados_recentes"
 DEFAULT_MONGODB_CONNECT_TIMEOUT = 10000
 DEFAULT_MONGODB_SERVER_SELECTION_TIMEOUT = 10000
 DEFAULT_MONGODB_MAX_RETRIES = 3
+# Conexões máximas do pool do cliente compartilhado (mongodb_pool)
+DEFAULT_MONGODB_MAX_POOL_SIZE = 20
@@ -0,0 +1,124 @@
+"""
+Monitor de saúde do MongoDB a partir dos eventos do próprio pymongo
+
+O MongoClient já verifica os servidores em segundo plano (heartbeats) para
+escolher onde executar as operações. Este módulo escuta esses eventos no
+cliente compartilhado (mongodb_pool) e publica o status, o tempo de resposta e
+o último erro num objeto do processo; o indicador da interface só lê esse
+objeto, sem abrir conexões nem esperar pelo servidor durante a renderização.
+"""
+import threading
+import time
+from pymongo import monitoring
+from pymongo.server_type import SERVER_TYPE
+
+# Status publicados pelo monitor
+STATUS_DESCONHECIDO = "desconhecido"  # cliente ainda não criado/fechado
+STATUS_VERIFICANDO = "verificando"    # cliente criado, aguardando o primeiro heartbeat
+STATUS_CONECTADO = "conectado"
+STATUS_DESCONECTADO = "desconectado"
+
+
+class MonitorSaudeMongo(monitoring.ServerHeartbeatListener, monitoring.TopologyListener):
+    """
+    Listener de heartbeats e da topologia que mantém o estado da conexão
+
+    Uma única instância é registrada (event_listeners) no cliente compartilhado.
+    Os eventos chegam das threads de monitoramento do pymongo; a leitura pela
+    interface é feita com `estado()`, que devolve uma cópia. Só a topologia
+    aberta por último é acompanhada: eventos de um cliente antigo (ex: sendo
+    fechado depois de trocar a URI) são ignorados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = STATUS_DESCONHECIDO
+        self._rtt_ms = None
+        self._ultimo_erro = None
+        self._ultimo_erro_em = None
+        self._atualizado_em = None
+        self._servidores = {}  # "host:porta" -> True/False (último heartbeat bem-sucedido)
+        self._topologia = None  # topology_id do cliente acompanhado
+
+    # --- Topologia: o status geral vem da descrição que o próprio pymongo usa ---
+
+    def opened(self, event):
+        with self._lock:
+            self._topologia = event.topology_id
+            self._status = STATUS_VERIFICANDO
+            self._servidores = {}
+            self._atualizado_em = time.time()
+
+    def description_changed(self, event):
+        servidores = event.new_description.server_descriptions().values()
+        if any(servidor.server_type != SERVER_TYPE.Unknown for servidor in servidores):
+            status = STATUS_CONECTADO if event.new_description.has_readable_server() else STATUS_DESCONECTADO
+        elif any(servidor.error is not None for servidor in servidores):
+            status = STATUS_DESCONECTADO
+        else:
+            # Servidores ainda não verificados (topologia recém-aberta)
+            return
+        with self._lock:
+            if event.topology_id == self._topologia:
+                self._status = status
+                self._atualizado_em = time.time()
+
+    def closed(self, event):
+        with self._lock:
+            if event.topology_id != self._topologia:
+                return
+            self._topologia = None
+            self._status = STATUS_DESCONHECIDO
+            self._rtt_ms = None
+            self._atualizado_em = time.time()
+
+    # --- Heartbeats: tempo de resposta e erros de cada servidor ---
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        endereco = "%s:%s" % event.connection_id
+        with self._lock:
+            self._servidores[endereco] = True
+            # Heartbeats "awaited" (protocolo de streaming) esperam mudanças no servidor:
+            # a duração deles não é o tempo de resposta
+            if not event.awaited:
+                self._rtt_ms = event.duration * 1000
+            self._atualizado_em = time.time()
+
+    def failed(self, event):
+        endereco = "%s:%s" % event.connection_id
+        with self._lock:
+            self._servidores[endereco] = False
+            self._ultimo_erro = str(event.reply)
+            self._ultimo_erro_em = time.time()
+            if not any(self._servidores.values()):
+                self._status = STATUS_DESCONECTADO
+            self._atualizado_em = time.time()
+
+    def estado(self):
+        """
+        Estado atual da conexão (sem I/O)
+
+        Returns:
+            dict: status, rtt_ms, ultimo_erro, ultimo_erro_em, atualizado_em e servidores
+        """
+        with self._lock:
+            return {
+                "status": self._status,
+                "rtt_ms": self._rtt_ms,
+                "ultimo_erro": self._ultimo_erro,
+                "ultimo_erro_em": self._ultimo_erro_em,
+                "atualizado_em": self._atualizado_em,
+                "servidores": dict(self._servidores)
+            }
+
+
+# Instância do processo, compartilhada por todas as sessões
+MONITOR_SAUDE = MonitorSaudeMongo()
+
+
+def obter_estado_saude():
+    """Estado publicado pelo monitor do processo (ver MonitorSaudeMongo.estado)"""
+    return MONITOR_SAUDE.estado()
@@ -0,0 +1,130 @@
+"""
+Busca incremental de surebets por marca d'água
+
+Guarda em memória os documentos já recebidos e a maior `_id` (ou
+`data_extracao`) vista; as próximas buscas pedem ao MongoDB só os documentos
+acima dessa marca. Documentos antigos expiram pela idade, então o custo de
+cada atualização acompanha o que mudou, não o tamanho da coleção.
+"""
+import time
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+# Idade máxima (segundos) de um documento mantido em memória
+DEFAULT_MAX_IDADE_DOCUMENTOS = 2 * 60 * 60
+
+
+def _momento_documento(documento, campo_marca):
+    """Momento de criação do documento em segundos (None se não der para saber)"""
+    valor = documento.get(campo_marca)
+    if isinstance(valor, ObjectId):
+        return valor.generation_time.timestamp()
+    if isinstance(valor, datetime):
+        return valor.timestamp()
+    identificador = documento.get('_id')
+    if isinstance(identificador, ObjectId):
+        return identificador.generation_time.timestamp()
+    return None
+
+
+class ConjuntoIncrementalSurebets:
+    """
+    Conjunto de documentos de surebet mantido por buscas incrementais
+
+    A marca d'água padrão é a `_id` (ObjectId cresce com o tempo de inserção).
+    Com campo_marca='data_extracao' documentos atualizados no lugar também são
+    recebidos de novo, desde que o scraper atualize esse campo.
+    """
+
+    def __init__(self, campo_marca='_id', max_idade_segundos=DEFAULT_MAX_IDADE_DOCUMENTOS):
+        """
+        Args:
+            campo_marca: Campo usado como marca d'água ('_id' ou 'data_extracao')
+            max_idade_segundos: Documentos mais antigos que isso são descartados (None: nunca)
+        """
+        self.campo_marca = campo_marca
+        self.max_idade_segundos = max_idade_segundos
+        self.assinatura = None
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Descarta os documentos e a marca d'água: a próxima busca será completa"""
+        self._documentos = {}
+        self.marca_dagua = None
+        self.ultima_variacao = {"completa": True, "novos": [], "removidos": []}
+
+    @property
+    def documentos(self):
+        """Lista com os documentos atuais, na ordem de chegada"""
+        return list(self._documentos.values())
+
+    def atualizar(self, collection, filtro=None, projecao=None, assinatura=None, limite=None):
+        """
+        Busca os documentos acima da marca d'água e junta ao conjunto
+
+        Args:
+            collection: Coleção do pymongo
+            filtro: Filtro da consulta (ex: montar_consulta_surebets)
+            projecao: Projeção da consulta (o campo da marca é sempre incluído)
+            assinatura: Identifica coleção/filtros; se mudar, o conjunto é reiniciado
+            limite: Máximo de documentos por busca: a carga inicial traz os mais novos e as
+                próximas buscas continuam da marca d'água
+
+        Returns:
+            list: Documentos atuais do conjunto
+        """
+        if assinatura != self.assinatura:
+            self.reiniciar()
+            self.assinatura = assinatura
+
+        completa = self.marca_dagua is None
+        consulta = dict(filtro or {})
+        if not completa:
+            acima_da_marca = {self.campo_marca: {"$gt": self.marca_dagua}}
+            consulta = {"$and": [consulta, acima_da_marca]} if consulta else acima_da_marca
+        if projecao is not None:
+            projecao = dict(projecao, **{self.campo_marca: 1})
+
+        if completa and limite:
+            # Carga inicial limitada: os documentos mais novos, guardados em ordem de chegada
+            cursor = collection.find(consulta, projecao).sort(self.campo_marca, DESCENDING).limit(limite)
+            cursor = reversed(list(cursor))
+        else:
+            cursor = collection.find(consulta, projecao).sort(self.campo_marca, ASCENDING)
+            if limite:
+                cursor = cursor.limit(limite)
+
+        novos = []
+        for documento in cursor:
+            # Documento já conhecido (reenviado pela marca em data_extracao) é substituído
+            self._documentos.pop(documento.get('_id'), None)
+            self._documentos[documento.get('_id')] = documento
+            novos.append(documento)
+            marca = documento.get(self.campo_marca)
+            if marca is not None:
+                self.marca_dagua = marca
+
+        self.ultima_variacao = {"completa": completa, "novos": novos, "removidos": self._expirar()}
+        return self.documentos
+
+    def _expirar(self):
+        """Remove os documentos mais antigos que max_idade_segundos e devolve as suas _id"""
+        if not self.max_idade_segundos:
+            return []
+        limite = time.time() - self.max_idade_segundos
+        removidos = []
+        # Os documentos estão em ordem de chegada: a varredura para no primeiro que ainda vale
+        for chave, documento in self._documentos.items():
+            momento = _momento_documento(documento, self.campo_marca)
+            if momento is None:
+                continue
+            if momento >= limite:
+                break
+            removidos.append(chave)
+        for chave in removidos:
+            del self._documentos[chave]
+        return removidos
+
+    def __len__(self):
+        return len(self._documentos)
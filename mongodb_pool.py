@@ -0,0 +1,85 @@
+"""
+Cliente MongoDB compartilhado pelo processo do Streamlit
+
+O MongoClient já mantém um pool de conexões thread-safe; criar um cliente
+por consulta paga de novo a resolução SRV, o handshake TCP/TLS e a
+autenticação. Este módulo cria um cliente por URI/opções sob demanda e o
+reaproveita em todas as sessões e reruns. Os clientes só são fechados no fim
+do processo ou quando descartados explicitamente: uma sessão que muda a URI
+não fecha o cliente que outras sessões e threads em segundo plano ainda usam.
+"""
+import atexit
+import threading
+from pymongo import MongoClient
+from mongodb_default_config import DEFAULT_MONGODB_MAX_POOL_SIZE
+
+# chave (URI, opções) -> MongoClient
+_clientes = {}
+_lock = threading.Lock()
+
+
+def _chave_cliente(uri, opcoes):
+    """Chave que identifica as configurações de um cliente"""
+    return (uri, tuple(sorted((nome, repr(valor)) for nome, valor in opcoes.items())))
+
+
+def obter_cliente(uri, max_pool_size=DEFAULT_MONGODB_MAX_POOL_SIZE, **opcoes):
+    """
+    Obtém o cliente compartilhado para a URI e as opções informadas
+
+    O cliente é criado na primeira chamada com cada URI/opções; as próximas
+    chamadas com as mesmas configurações devolvem o mesmo objeto. Não feche o
+    cliente devolvido: ele é compartilhado (ver descartar_cliente).
+
+    Args:
+        uri: URI de conexão do MongoDB
+        max_pool_size: Quantidade máxima de conexões do pool
+        **opcoes: Demais opções do MongoClient (timeouts, retryWrites...)
+
+    Returns:
+        MongoClient: Cliente compartilhado
+    """
+    opcoes = dict(opcoes, maxPoolSize=max_pool_size)
+    chave = _chave_cliente(uri, opcoes)
+    # Caminho comum sem lock: o cliente já existe com as mesmas configurações
+    cliente = _clientes.get(chave)
+    if cliente is not None:
+        return cliente
+
+    with _lock:
+        cliente = _clientes.get(chave)
+        if cliente is None:
+            # MongoClient não conecta no construtor: a conexão abre na primeira operação
+            cliente = _clientes[chave] = MongoClient(uri, **opcoes)
+        return cliente
+
+
+def descartar_cliente(uri, max_pool_size=DEFAULT_MONGODB_MAX_POOL_SIZE, **opcoes):
+    """
+    Fecha e remove do pool o cliente da URI/opções (ex: credenciais revogadas)
+
+    Quem ainda estiver usando esse cliente recebe InvalidOperation; a próxima
+    chamada a obter_cliente cria um cliente novo.
+
+    Returns:
+        bool: True se havia um cliente com essas configurações
+    """
+    chave = _chave_cliente(uri, dict(opcoes, maxPoolSize=max_pool_size))
+    with _lock:
+        cliente = _clientes.pop(chave, None)
+    if cliente is None:
+        return False
+    cliente.close()
+    return True
+
+
+def fechar_clientes():
+    """Fecha todos os clientes compartilhados (fim do processo)"""
+    with _lock:
+        clientes = list(_clientes.values())
+        _clientes.clear()
+    for cliente in clientes:
+        cliente.close()
+
+
+atexit.register(fechar_clientes)
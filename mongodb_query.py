@@ -0,0 +1,121 @@
+"""
+Montagem das consultas de surebets no MongoDB
+
+Empurra para o servidor a projeção dos campos usados no processamento e os
+filtros de lucro mínimo, esporte, liga e data de extração, em vez de trazer
+todos os campos de todos os documentos e filtrar em Python.
+"""
+import json
+import pandas as pd
+from pymongo import ASCENDING, DESCENDING
+from arbitrage_ingest import COLUNAS_METADADOS
+
+# Quantidade máxima de pares odd_N/casa_N trazidos de cada documento
+MAX_RESULTADOS_CONSULTA = 10
+
+# Campos lidos pela ingestão colunar e pelo índice de preços
+CAMPOS_PROCESSADOR = COLUNAS_METADADOS + [
+    f'{campo}_{k}' for k in range(1, MAX_RESULTADOS_CONSULTA + 1) for campo in ('odd', 'casa')
+]
+
+# Campos só exibidos na tabela de dados brutos (também vão para o backup em CSV)
+CAMPOS_EXIBICAO = ['lucro_garantido']
+
+# Ordem das leituras limitadas (MongoDB Atlas): os documentos mais novos primeiro, para
+# que a leitura completa, a leitura em lotes e a busca em segundo plano peguem os mesmos documentos
+ORDENACAO_LEITURA_LIMITADA = [("_id", DESCENDING)]
+
+# Índices que atendem os filtros gerados por montar_consulta_surebets
+INDICES_RECOMENDADOS = [
+    {"name": "lucro_percentual_desc", "keys": [("lucro_percentual", DESCENDING)]},
+    {"name": "esporte_liga_lucro", "keys": [("esporte", ASCENDING), ("liga", ASCENDING), ("lucro_percentual", DESCENDING)]},
+    {"name": "data_extracao_desc", "keys": [("data_extracao", DESCENDING)]}
+]
+
+
+def montar_consulta_surebets(limiar_lucro=None, esportes=None, ligas=None,
+                             data_extracao_desde=None, data_extracao_ate=None):
+    """
+    Monta o filtro e a projeção da consulta de surebets
+
+    Documentos com `lucro_percentual` em texto (ex: '3,1') continuam vindo do
+    servidor, porque a comparação numérica do MongoDB não os alcança; o
+    limiar é aplicado a eles depois do processamento, como antes.
+
+    Args:
+        limiar_lucro: Lucro percentual mínimo (opcional)
+        esportes: Lista de esportes aceitos (opcional)
+        ligas: Lista de ligas aceitas (opcional)
+        data_extracao_desde: Menor data_extracao aceita, no mesmo tipo gravado na coleção (opcional)
+        data_extracao_ate: Maior data_extracao aceita (opcional)
+
+    Returns:
+        dict: {"filtro": filtro do find, "projecao": projeção do find}
+    """
+    filtro = {}
+    if limiar_lucro is not None:
+        filtro["$or"] = [
+            {"lucro_percentual": {"$gte": limiar_lucro}},
+            {"lucro_percentual": {"$type": "string"}}
+        ]
+    if esportes:
+        filtro["esporte"] = {"$in": list(esportes)}
+    if ligas:
+        filtro["liga"] = {"$in": list(ligas)}
+    if data_extracao_desde is not None or data_extracao_ate is not None:
+        intervalo = {}
+        if data_extracao_desde is not None:
+            intervalo["$gte"] = data_extracao_desde
+        if data_extracao_ate is not None:
+            intervalo["$lte"] = data_extracao_ate
+        filtro["data_extracao"] = intervalo
+    return {"filtro": filtro, "projecao": {campo: 1 for campo in CAMPOS_PROCESSADOR + CAMPOS_EXIBICAO}}
+
+
+def filtrar_lucro_minimo(frame, limiar_lucro):
+    """
+    Aplica a um frame de surebets o mesmo critério de lucro do filtro do servidor
+
+    Usado quando o limiar ficou mais restrito que o da consulta que trouxe os
+    dados: os documentos já em memória contêm o resultado. Lucros em texto
+    continuam, como no servidor (o limiar vale para eles depois do processamento).
+
+    Args:
+        frame: DataFrame de surebets
+        limiar_lucro: Lucro percentual mínimo (None: sem filtro)
+
+    Returns:
+        DataFrame: Linhas que a consulta com esse limiar traria
+    """
+    if limiar_lucro is None or 'lucro_percentual' not in frame.columns:
+        return frame
+    bruto = frame['lucro_percentual']
+    if pd.api.types.is_numeric_dtype(bruto):
+        return frame[bruto >= limiar_lucro]
+    texto = bruto.map(lambda valor: isinstance(valor, str)).astype(bool)
+    numerico = pd.to_numeric(bruto.where(~texto), errors='coerce')
+    return frame[texto | (numerico >= limiar_lucro)]
+
+
+def assinatura_consulta(consulta):
+    """
+    Texto estável que identifica uma consulta
+
+    Usado para saber se os parâmetros mudaram e os dados precisam ser buscados de novo.
+    """
+    return json.dumps(consulta, sort_keys=True, default=str)
+
+
+def criar_indices_recomendados(collection):
+    """
+    Cria na coleção os índices usados pelos filtros de montar_consulta_surebets
+
+    create_index não faz nada se o índice já existir.
+
+    Args:
+        collection: Coleção do pymongo
+
+    Returns:
+        list: Nomes dos índices
+    """
+    return [collection.create_index(indice["keys"], name=indice["name"]) for indice in INDICES_RECOMENDADOS]
@@ -0,0 +1,167 @@
+"""
+Snapshot imutável e versionado dos dados de uma atualização
+
+Cada atualização (MongoDB, cache, backup, leitura em lotes ou tempo real)
+produz um único SnapshotDados. As oportunidades, a tabela de dados brutos, as
+estatísticas e o histograma leem todos do mesmo snapshot, então um rerun
+causado por um widget não volta ao MongoDB e as partes da tela nunca mostram
+versões diferentes dos dados.
+"""
+import itertools
+import re
+import threading
+import time
+import pandas as pd
+from arbitrage_price_index import indexar_documentos
+from arbitrage_opportunity import tabela_oportunidades
+
+# Versões crescentes no processo: duas atualizações nunca geram a mesma versão
+_versoes = itertools.count(1)
+
+
+class SnapshotDados:
+    """
+    Dados de uma atualização, somente leitura
+
+    Os campos não podem ser reatribuídos depois da criação. O índice de preços
+    (só montado quando há filtro de casas), as casas presentes, o DataFrame da tabela, a tabela de stakes das oportunidades (também por
+    filtro de casas) e as estatísticas (por limiar de lucro) são calculados no
+    primeiro acesso e guardados no próprio snapshot.
+    """
+
+    __slots__ = ('versao', 'criado_em', 'origem', 'consulta', 'oportunidades', 'documentos',
+                 'arquivo_documentos', '_indice_precos', '_casas', '_frame', '_tabela', '_filtros_casas',
+                 '_estatisticas', '_lock')
+
+    def __init__(self, oportunidades, documentos=None, origem="mongodb", consulta=None,
+                 indice_precos=None, arquivo_documentos=None):
+        """
+        Args:
+            oportunidades: Oportunidades encontradas nos dados
+            documentos: Documentos de surebet (lista de dicts ou DataFrame) ou None se não ficaram em memória
+            origem: De onde vieram os dados ("mongodb", "cache", "backup", "tempo real (...)")
+            consulta: Consulta usada na busca (montar_consulta_surebets), se houver
+            indice_precos: Índice top-K já montado (opcional, senão é montado a partir dos documentos)
+            arquivo_documentos: CSV com os documentos, lido na primeira vez que a tabela é pedida
+                (ex: backup gravado pela leitura em lotes, que não guarda os documentos em memória)
+        """
+        if documentos is not None and not isinstance(documentos, pd.DataFrame):
+            documentos = tuple(documentos)
+        valores = {
+            'versao': next(_versoes),
+            'criado_em': time.time(),
+            'origem': origem,
+            'consulta': consulta,
+            'oportunidades': tuple(oportunidades),
+            'documentos': documentos,
+            'arquivo_documentos': arquivo_documentos,
+            '_indice_precos': indice_precos,
+            '_casas': None,
+            '_frame': None,
+            '_tabela': None,
+            '_filtros_casas': {},
+            '_estatisticas': {},
+            '_lock': threading.Lock()
+        }
+        for nome, valor in valores.items():
+            object.__setattr__(self, nome, valor)
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("SnapshotDados é somente leitura; crie um novo snapshot")
+
+    def _memorizar(self, nome, calcular):
+        """Calcula um campo derivado uma única vez, mesmo com sessões lendo ao mesmo tempo"""
+        valor = getattr(self, nome)
+        if valor is None:
+            with self._lock:
+                valor = getattr(self, nome)
+                if valor is None:
+                    valor = calcular()
+                    object.__setattr__(self, nome, valor)
+        return valor
+
+    @property
+    def indice_precos(self):
+        """Índice top-K para o filtro de casas, montado do frame pelo caminho colunar (None sem documentos)"""
+        if self._indice_precos is None and self.frame.empty:
+            return None
+        return self._memorizar('_indice_precos', lambda: indexar_documentos(self.frame))
+
+    @property
+    def casas(self):
+        """Casas de apostas dos documentos (opções do filtro de casas), sem montar o índice de preços"""
+        # Fora do lock de _memorizar: o frame também é memorizado com ele
+        frame = self.frame if self._casas is None else None
+
+        def montar():
+            if self._indice_precos is not None:
+                return frozenset(self._indice_precos.casas)
+            colunas = [col for col in frame.columns if re.fullmatch(r'casa_\d+', str(col))]
+            if colunas:
+                valores = pd.unique(frame[colunas].to_numpy(dtype=object).ravel())
+            else:
+                valores = {casa for op in self.oportunidades for casa in op.casas}
+            return frozenset(valor for valor in valores if isinstance(valor, str) and valor)
+        return self._memorizar('_casas', montar)
+
+    @property
+    def frame(self):
+        """DataFrame com os documentos (vazio se não houver documentos)"""
+        def montar():
+            if isinstance(self.documentos, pd.DataFrame):
+                return self.documentos
+            if self.documentos is not None:
+                return pd.DataFrame(list(self.documentos))
+            try:
+                return pd.read_csv(self.arquivo_documentos) if self.arquivo_documentos else pd.DataFrame()
+            except (OSError, pd.errors.ParserError, pd.errors.EmptyDataError):
+                return pd.DataFrame()
+        return self._memorizar('_frame', montar)
+
+    @property
+    def tabela(self):
+        """tabela_oportunidades das oportunidades do snapshot (frações de stake, lucro, esporte e liga)"""
+        return self._memorizar('_tabela', lambda: tabela_oportunidades(self.oportunidades))
+
+    def oportunidades_com_casas(self, casas_excluidas=(), casas_permitidas=None):
+        """
+        Oportunidades recalculadas pelo índice de preços com um filtro de casas, uma vez por filtro
+
+        Args:
+            casas_excluidas: Casas que não podem ser usadas
+            casas_permitidas: Se informado, apenas estas casas podem ser usadas
+
+        Returns:
+            tuple: (oportunidades, tabela_oportunidades delas); sem índice de preços, as do snapshot
+        """
+        chave = (frozenset(casas_excluidas), None if casas_permitidas is None else frozenset(casas_permitidas))
+        if chave not in self._filtros_casas:
+            indice = self.indice_precos
+            if indice is None:
+                return self.oportunidades, self.tabela
+            oportunidades = tuple(indice.oportunidades(casas_excluidas, casas_permitidas))
+            valor = (oportunidades, tabela_oportunidades(oportunidades))
+            with self._lock:
+                self._filtros_casas.setdefault(chave, valor)
+        return self._filtros_casas[chave]
+
+    def estatisticas(self, calcular, limiar_lucro=None):
+        """
+        Estatísticas de lucro deste snapshot, calculadas uma vez por limiar
+
+        Args:
+            calcular: Função (snapshot, limiar_lucro) -> estatísticas, a partir dos dados do próprio snapshot
+            limiar_lucro: Lucro mínimo da tabela exibida (o limiar muda sem gerar um novo snapshot)
+
+        Returns:
+            dict: O que `calcular` devolveu na primeira chamada com esse limiar
+        """
+        if limiar_lucro not in self._estatisticas:
+            # Calculado fora do lock: `calcular` pode precisar do frame, que usa o mesmo lock
+            valor = calcular(self, limiar_lucro)
+            with self._lock:
+                self._estatisticas.setdefault(limiar_lucro, valor)
+        return self._estatisticas[limiar_lucro]
+
+    def __len__(self):
+        return len(self.oportunidades)
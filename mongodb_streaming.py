@@ -0,0 +1,118 @@
+"""
+Leitura em lotes do cursor do MongoDB
+
+Em vez de materializar todo o resultado com list(collection.find()) antes de
+começar a processar, o cursor é lido em lotes de tamanho fixo; cada lote é
+avaliado e gravado no CSV de backup assim que chega. A memória fica limitada
+ao lote atual e as primeiras oportunidades aparecem antes do fim da leitura.
+"""
+import os
+import tempfile
+import pandas as pd
+from arbitrage_ingest import montar_frame_surebets, avaliar_frame_surebets, frame_para_oportunidades
+
+# Documentos por lote (também usado como batch_size do cursor)
+DEFAULT_TAMANHO_LOTE_CURSOR = 500
+
+
+class BackupCSVIncremental:
+    """
+    Grava o CSV de backup lote a lote
+
+    Escreve em um arquivo temporário próprio (leituras de sessões diferentes
+    não dividem o mesmo arquivo) e só substitui o backup anterior quando a
+    leitura termina sem erro, então uma leitura interrompida não deixa um
+    backup pela metade.
+    """
+
+    def __init__(self, filename="mongodb_backup.csv", colunas=None):
+        """
+        Args:
+            filename: Nome do arquivo CSV
+            colunas: Colunas do CSV (padrão: as do primeiro lote; campos novos em lotes seguintes são ignorados)
+        """
+        self.filename = filename
+        self.colunas = list(colunas) if colunas is not None else None
+        self.registros = 0
+        self._temporario = None
+        self._arquivo = None
+
+    def __enter__(self):
+        descritor, self._temporario = tempfile.mkstemp(
+            prefix=os.path.basename(self.filename) + ".", suffix=".tmp",
+            dir=os.path.dirname(self.filename) or "."
+        )
+        self._arquivo = os.fdopen(descritor, 'w', encoding='utf-8', newline='')
+        return self
+
+    def escrever(self, documentos):
+        """Acrescenta um lote de documentos (lista ou DataFrame) ao CSV"""
+        if len(documentos) == 0:
+            return
+        df = pd.DataFrame(documentos, columns=self.colunas)
+        if self.colunas is None:
+            self.colunas = list(df.columns)
+        df.to_csv(self._arquivo, header=self.registros == 0, index=False)
+        self.registros += len(df)
+
+    def __exit__(self, tipo_erro, erro, traceback):
+        self._arquivo.close()
+        if tipo_erro is None and self.registros > 0:
+            os.replace(self._temporario, self.filename)
+            return False
+        try:
+            os.remove(self._temporario)
+        except OSError:
+            pass  # Não esconder o erro original da leitura
+        return False
+
+
+def ler_cursor_em_lotes(cursor, tamanho_lote=DEFAULT_TAMANHO_LOTE_CURSOR):
+    """
+    Lê um cursor em listas de até `tamanho_lote` documentos
+
+    Args:
+        cursor: Cursor do pymongo (ou qualquer iterável de documentos)
+        tamanho_lote: Documentos por lote
+
+    Yields:
+        list: Lote de documentos
+    """
+    if hasattr(cursor, 'batch_size'):
+        # Cada ida ao servidor traz exatamente um lote
+        cursor = cursor.batch_size(tamanho_lote)
+    lote = []
+    for documento in cursor:
+        lote.append(documento)
+        if len(lote) >= tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def processar_cursor_em_lotes(cursor, tamanho_lote=DEFAULT_TAMANHO_LOTE_CURSOR, backup=None):
+    """
+    Lê, grava no backup e avalia o cursor lote a lote
+
+    Args:
+        cursor: Cursor do pymongo com os documentos de surebet
+        tamanho_lote: Documentos por lote
+        backup: BackupCSVIncremental já aberto (opcional)
+
+    Yields:
+        dict: Resultado de cada lote
+            documentos: Documentos do lote
+            oportunidades: Oportunidades encontradas no lote
+            registros_com_erro: Registros do lote ignorados por erro de formato
+    """
+    for documentos in ler_cursor_em_lotes(cursor, tamanho_lote):
+        if backup is not None:
+            backup.escrever(documentos)
+        frame = montar_frame_surebets(documentos)
+        resultado, registros_com_erro = avaliar_frame_surebets(frame)
+        yield {
+            "documentos": documentos,
+            "oportunidades": frame_para_oportunidades(frame, resultado),
+            "registros_com_erro": registros_com_erro
+        }
@@ -0,0 +1,229 @@
+"""
+Adaptadores de fontes de odds
+
+Cada fonte (simulador da API, documentos de surebet do MongoDB, CSV do
+Oddspedia) é convertida para o mesmo formato interno: uma linha por preço
+cotado, com as colunas de COLUNAS_LINHA_ODDS. O CoordenadorFontes busca
+várias fontes ao mesmo tempo, cada uma com o seu timeout, e junta as linhas
+para o motor de arbitragem processar tudo de uma vez (montar_mercados_de_linhas).
+
+Na tela, a opção "Combinar fontes" passa os documentos já buscados do
+MongoDB e as fontes extras escolhidas por aqui (encontrar_oportunidades_fontes).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import pandas as pd
+import odds_api_simulator as api
+from arbitrage_incremental import atualizacoes_de_documentos
+
+# Formato interno: uma linha por (evento, resultado, casa); `posicao` é a posição do
+# resultado no mercado quando a fonte a conhece (None: o resultado é identificado pelo nome)
+COLUNAS_LINHA_ODDS = [
+    'fonte', 'id_evento', 'descricao_evento', 'esporte', 'liga',
+    'data_hora_evento', 'data_extracao', 'resultado', 'posicao', 'casa', 'odd'
+]
+
+# Timeout padrão de cada fonte (segundos)
+DEFAULT_TIMEOUT_FONTE = 10
+
+
+class FonteOdds:
+    """
+    Interface das fontes de odds
+
+    Subclasses implementam buscar() (dados no formato original) e
+    normalizar(dados) (lista de linhas no formato interno).
+    """
+
+    nome = "fonte"
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT_FONTE):
+        """
+        Args:
+            timeout: Tempo máximo de espera pela fonte, em segundos
+        """
+        self.timeout = timeout
+
+    def buscar(self):
+        raise NotImplementedError
+
+    def normalizar(self, dados):
+        raise NotImplementedError
+
+    def obter(self):
+        """Busca e normaliza os dados da fonte"""
+        return self.normalizar(self.buscar())
+
+
+def _linha(fonte, metadados, resultado, casa, odd, posicao=None):
+    """Monta uma linha no formato interno"""
+    return {
+        'fonte': fonte,
+        'id_evento': metadados.get('id_evento', ''),
+        'descricao_evento': metadados.get('descricao_evento', ''),
+        'esporte': metadados.get('esporte', ''),
+        'liga': metadados.get('liga', ''),
+        'data_hora_evento': metadados.get('data_hora_evento'),
+        'data_extracao': metadados.get('data_extracao'),
+        'resultado': resultado,
+        'posicao': posicao,
+        'casa': casa,
+        'odd': odd
+    }
+
+
+class FonteSimulador(FonteOdds):
+    """Feed do odds_api_simulator (formato `odds_por_casa`)"""
+
+    nome = "simulador"
+
+    def __init__(self, evento_id=None, timeout=DEFAULT_TIMEOUT_FONTE):
+        super().__init__(timeout)
+        self.evento_id = evento_id
+
+    def buscar(self):
+        dados = api.fetch_live_odds_simulated(self.evento_id)
+        # O simulador devolve um dict de erro quando o evento não existe
+        return dados if isinstance(dados, list) else []
+
+    def normalizar(self, dados):
+        linhas = []
+        for evento in dados:
+            metadados = {
+                'id_evento': evento['id_evento'],
+                'descricao_evento': evento['descricao_evento'],
+                'esporte': evento['esporte'],
+                'liga': evento['liga'],
+                'data_extracao': evento.get('timestamp_consulta')
+            }
+            for casa_odds in evento.get('odds_por_casa') or []:
+                for resultado, odd in casa_odds['odds'].items():
+                    linhas.append(_linha(self.nome, metadados, resultado, casa_odds['nome_casa'], odd))
+        return linhas
+
+
+class _ColetorMetadados:
+    """Recebe os metadados de evento de atualizacoes_de_documentos"""
+
+    def __init__(self):
+        self.metadados = {}
+
+    def definir_evento(self, id_evento, resultados=None, **metadados):
+        self.metadados.setdefault(id_evento, dict(metadados, id_evento=id_evento, resultados=list(resultados or [])))
+
+
+def normalizar_documentos_surebet(documentos, fonte):
+    """
+    Converte documentos de surebet (odd_1/casa_1...) para o formato interno
+
+    Usa a mesma leitura de odds/resultados do motor incremental; documentos
+    com odds inválidas são ignorados. Cada linha leva a posição do resultado
+    no documento, então nomes repetidos na `linha` (ex: 'Sim/Sim') continuam
+    sendo resultados diferentes.
+
+    Args:
+        documentos: Iterável de documentos de surebet
+        fonte: Nome da fonte gravado em cada linha
+
+    Returns:
+        list: Linhas no formato interno
+    """
+    coletor = _ColetorMetadados()
+    atualizacoes = atualizacoes_de_documentos(documentos, motor=coletor)
+    return [
+        _linha(fonte, coletor.metadados[id_evento], coletor.metadados[id_evento]['resultados'][posicao], casa, odd, posicao)
+        for id_evento, casa, posicao, odd in atualizacoes
+    ]
+
+
+class FonteSurebetsMongoDB(FonteOdds):
+    """Documentos de surebet da coleção do MongoDB"""
+
+    nome = "mongodb"
+
+    def __init__(self, obter_documentos, timeout=DEFAULT_TIMEOUT_FONTE):
+        """
+        Args:
+            obter_documentos: Função sem argumentos que devolve os documentos (ex: obter_dados_mongodb)
+            timeout: Tempo máximo de espera pela fonte, em segundos
+        """
+        super().__init__(timeout)
+        self.obter_documentos = obter_documentos
+
+    def buscar(self):
+        return self.obter_documentos() or []
+
+    def normalizar(self, dados):
+        return normalizar_documentos_surebet(dados, self.nome)
+
+
+class FonteCSV(FonteOdds):
+    """CSV de surebets no formato do Oddspedia (surebets_oddspedia.csv)"""
+
+    nome = "csv"
+
+    def __init__(self, caminho, timeout=DEFAULT_TIMEOUT_FONTE):
+        super().__init__(timeout)
+        self.caminho = caminho
+
+    def buscar(self):
+        frame = pd.read_csv(self.caminho)
+        # Sem _id no CSV: o número da linha identifica o evento
+        frame['_id'] = [f"{self.caminho}:{i}" for i in range(len(frame))]
+        # Campos vazios do CSV viram None, como campos ausentes em um documento
+        return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+    def normalizar(self, dados):
+        return normalizar_documentos_surebet(dados, self.nome)
+
+
+class CoordenadorFontes:
+    """
+    Busca várias fontes em paralelo (threads) com timeout por fonte
+
+    Fontes que falham ou estouram o timeout são ignoradas e reportadas no status;
+    a thread de uma fonte atrasada continua rodando, mas o resultado é descartado.
+    """
+
+    def __init__(self, fontes, max_workers=None):
+        """
+        Args:
+            fontes: Lista de FonteOdds
+            max_workers: Quantidade de threads (padrão: uma por fonte)
+        """
+        self.fontes = list(fontes)
+        self.max_workers = max_workers or max(1, len(self.fontes))
+
+    def buscar_todas(self):
+        """
+        Busca e normaliza todas as fontes
+
+        Returns:
+            tuple: (linhas, status)
+                linhas: Linhas de todas as fontes que responderam, na ordem das fontes
+                status: Dict nome da fonte -> {"ok", "linhas", "tempo", "erro"}
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fonte-odds")
+        inicio = time.time()
+        futuros = [(fonte, executor.submit(fonte.obter)) for fonte in self.fontes]
+        linhas = []
+        status = {}
+        try:
+            for fonte, futuro in futuros:
+                # O prazo de cada fonte conta a partir do início da busca
+                restante = max(0.0, fonte.timeout - (time.time() - inicio))
+                wait([futuro], timeout=restante)
+                if not futuro.done():
+                    futuro.cancel()
+                    status[fonte.nome] = {"ok": False, "linhas": 0, "tempo": time.time() - inicio, "erro": "timeout"}
+                    continue
+                try:
+                    linhas_fonte = futuro.result()
+                except Exception as e:
+                    status[fonte.nome] = {"ok": False, "linhas": 0, "tempo": time.time() - inicio, "erro": str(e)}
+                    continue
+                linhas.extend(linhas_fonte)
+                status[fonte.nome] = {"ok": True, "linhas": len(linhas_fonte), "tempo": time.time() - inicio, "erro": None}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return linhas, status
@@ -14,6 +14,7 @@ import math
 import time
 import json
 import os
+import heapq
 from datetime import datetime
 import odds_api_simulator as api # Mantém o simulador de dados (mantido para compatibilidade)
 from PIL import Image # Para carregar o logo
@@ -23,7 +24,41 @@ from pymongo import MongoClient
 # Importar utilitários de MongoDB
 from mongodb_utils import testar_conexao_mongodb, verificar_banco_colecao, exibir_status_conexao, exibir_status_banco_colecao
 # Importar cache para MongoDB
-from mongodb_cache import MongoDBCache, obter_dados_com_cache
+from mongodb_cache import MongoDBCache, obter_dados_com_cache, chave_cache, BUSCAS_COALESCIDAS
+# Cliente MongoDB compartilhado por todo o processo
+from mongodb_pool import obter_cliente
+# Status da conexão publicado pelos heartbeats do cliente compartilhado
+from mongodb_health import MONITOR_SAUDE, obter_estado_saude, STATUS_CONECTADO, STATUS_DESCONECTADO
+# Disjuntor compartilhado: sem esperas na renderização enquanto o MongoDB está fora do ar
+from mongodb_circuit_breaker import DISJUNTOR_MONGO, ESTADO_FECHADO, ESTADO_ABERTO
+# Filtros e projeção das consultas executados no servidor
+from mongodb_query import montar_consulta_surebets, assinatura_consulta, criar_indices_recomendados, filtrar_lucro_minimo, ORDENACAO_LEITURA_LIMITADA
+# Busca incremental por marca d'água (_id / data_extracao)
+from mongodb_incremental import ConjuntoIncrementalSurebets
+# Recálculo incremental só dos documentos novos, reenviados ou expirados
+from arbitrage_incremental import MotorIncrementalArbitragem, aplicar_documentos
+# Atualização em tempo real via change streams (com polling como alternativa)
+from mongodb_change_stream import adquirir_ouvinte, chave_ouvinte
+# Leitura do cursor em lotes com backup incremental
+from mongodb_streaming import BackupCSVIncremental, processar_cursor_em_lotes
+# Estatísticas de lucro por esporte e histograma
+from mongodb_aggregation import estatisticas_de_frame
+# Snapshot único dos dados de cada atualização
+from mongodb_snapshot import SnapshotDados
+# Motor vetorizado de arbitragem
+from arbitrage_engine import montar_mercados_ragged, montar_mercados_de_linhas, melhores_precos_ragged, avaliar_mercados_ragged, ragged_para_oportunidades
+# Adaptadores das fontes de odds (simulador, MongoDB, CSV) para o formato interno
+from odds_sources import CoordenadorFontes, FonteSimulador, FonteSurebetsMongoDB, FonteCSV, DEFAULT_TIMEOUT_FONTE
+# Ingestão colunar dos documentos de surebet
+from arbitrage_ingest import montar_frame_surebets, avaliar_frame_surebets, frame_para_oportunidades
+# Arredondamento dos stakes para valores aceitos pelas casas
+from arbitrage_stakes import arredondar_stakes, regras_de_tabela
+# Stakes de todas as oportunidades exibidas escalados de uma vez
+from arbitrage_opportunity import escalar_stakes
+# Processamento em paralelo por esporte/liga
+from arbitrage_parallel import processar_em_paralelo, numero_de_nucleos
+# Oportunidades já processadas por versão dos dados brutos
+from arbitrage_memo import MEMO_OPORTUNIDADES
 # Importar módulo de credenciais seguras
 from mongodb_credentials import mask_mongodb_uri, get_mongodb_atlas_uri, set_mongodb_atlas_uri
 from mongodb_display import display_mongodb_status
@@ -36,7 +71,8 @@ from mongodb_default_config import (
     DEFAULT_MONGODB_COLLECTION,
     DEFAULT_MONGODB_CONNECT_TIMEOUT,
     DEFAULT_MONGODB_SERVER_SELECTION_TIMEOUT,
-    DEFAULT_MONGODB_MAX_RETRIES
+    DEFAULT_MONGODB_MAX_RETRIES,
+    DEFAULT_MONGODB_MAX_POOL_SIZE
 )
 
 
@@ -109,175 +145,154 @@ MONGODB_COLLECTION = DEFAULT_MONGODB_COLLECTION
 MONGODB_CONNECT_TIMEOUT = DEFAULT_MONGODB_CONNECT_TIMEOUT
 MONGODB_SERVER_SELECTION_TIMEOUT = DEFAULT_MONGODB_SERVER_SELECTION_TIMEOUT
 MONGODB_MAX_RETRIES = DEFAULT_MONGODB_MAX_RETRIES
+MONGODB_MAX_POOL_SIZE = DEFAULT_MONGODB_MAX_POOL_SIZE
 
-# Funções do arbitrage_calculator.py integradas aqui para o protótipo
-def calcular_probabilidade_implicita(odds):
-    if odds <= 0:
-        return float('inf')
-    return 1 / odds
-
-def verificar_arbitragem_2_vias(odds_r1_casaA, nome_casaA, nome_r1, odds_r2_casaB, nome_casaB, nome_r2, investimento_total=100):
-    prob_impl_r1 = calcular_probabilidade_implicita(odds_r1_casaA)
-    prob_impl_r2 = calcular_probabilidade_implicita(odds_r2_casaB)
-    soma_probabilidades = prob_impl_r1 + prob_impl_r2
-
-    if soma_probabilidades < 1:
-        lucro_percentual = (1 - soma_probabilidades) * 100
-        retorno_garantido = investimento_total / soma_probabilidades
-        stake1 = retorno_garantido / odds_r1_casaA
-        stake2 = retorno_garantido / odds_r2_casaB
-        investimento_real_total = stake1 + stake2
-
-        return {
-            "tipo_mercado": "2-vias",
-            "oportunidade": True,
-            "soma_probabilidades_implicitas": soma_probabilidades,
-            "lucro_percentual_garantido": lucro_percentual,
-            "detalhes_apostas": [
-                {"casa": nome_casaA, "resultado": nome_r1, "odd": odds_r1_casaA, "stake_sugerido": stake1, "retorno_individual": stake1 * odds_r1_casaA},
-                {"casa": nome_casaB, "resultado": nome_r2, "odd": odds_r2_casaB, "stake_sugerido": stake2, "retorno_individual": stake2 * odds_r2_casaB}
-            ],
-            "investimento_total_sugerido": investimento_real_total,
-            "retorno_garantido": retorno_garantido
-        }
-    return None
-
-def verificar_arbitragem_3_vias(odds_r1_casaA, nome_casaA, nome_r1, odds_r2_casaB, nome_casaB, nome_r2, odds_r3_casaC, nome_casaC, nome_r3, investimento_total=100):
-    prob_impl_r1 = calcular_probabilidade_implicita(odds_r1_casaA)
-    prob_impl_r2 = calcular_probabilidade_implicita(odds_r2_casaB)
-    prob_impl_r3 = calcular_probabilidade_implicita(odds_r3_casaC)
-    soma_probabilidades = prob_impl_r1 + prob_impl_r2 + prob_impl_r3
-
-    if soma_probabilidades < 1:
-        lucro_percentual = (1 - soma_probabilidades) * 100
-        retorno_garantido = investimento_total / soma_probabilidades
-        stake1 = retorno_garantido / odds_r1_casaA
-        stake2 = retorno_garantido / odds_r2_casaB
-        stake3 = retorno_garantido / odds_r3_casaC
-        investimento_real_total = stake1 + stake2 + stake3
-
-        return {
-            "tipo_mercado": "3-vias",
-            "oportunidade": True,
-            "soma_probabilidades_implicitas": soma_probabilidades,
-            "lucro_percentual_garantido": lucro_percentual,
-            "detalhes_apostas": [
-                {"casa": nome_casaA, "resultado": nome_r1, "odd": odds_r1_casaA, "stake_sugerido": stake1, "retorno_individual": stake1 * odds_r1_casaA},
-                {"casa": nome_casaB, "resultado": nome_r2, "odd": odds_r2_casaB, "stake_sugerido": stake2, "retorno_individual": stake2 * odds_r2_casaB},
-                {"casa": nome_casaC, "resultado": nome_r3, "odd": odds_r3_casaC, "stake_sugerido": stake3, "retorno_individual": stake3 * odds_r3_casaC}
-            ],
-            "investimento_total_sugerido": investimento_real_total,
-            "retorno_garantido": retorno_garantido
-        }
-    return None
-
-def encontrar_oportunidades_arbitragem_reais(dados_odds_api, investimento_desejado):
-    oportunidades = []
-    for evento_data in dados_odds_api:
-        id_evento = evento_data["id_evento"]
-        descricao_evento = evento_data["descricao_evento"]
-        esporte = evento_data["esporte"]
-        liga = evento_data["liga"]
-        if not evento_data["odds_por_casa"]: continue
-        primeiro_conjunto_odds = evento_data["odds_por_casa"][0]["odds"]
-        resultados_possiveis = list(primeiro_conjunto_odds.keys())
-        tipo_mercado = "3-vias" if len(resultados_possiveis) == 3 else "2-vias"
-        melhores_odds = {}
-        casas_melhores_odds = {}
-        for resultado in resultados_possiveis:
-            melhor_odd = 0
-            casa_melhor_odd = None
-            for casa_odds in evento_data["odds_por_casa"]:
-                if resultado in casa_odds["odds"] and casa_odds["odds"][resultado] > melhor_odd:
-                    melhor_odd = casa_odds["odds"][resultado]
-                    casa_melhor_odd = casa_odds["nome_casa"]
-            if melhor_odd > 0:
-                melhores_odds[resultado] = melhor_odd
-                casas_melhores_odds[resultado] = casa_melhor_odd
-        if len(melhores_odds) != len(resultados_possiveis): continue
-        if tipo_mercado == "2-vias" and len(resultados_possiveis) == 2:
-            r1, r2 = resultados_possiveis
-            oportunidade = verificar_arbitragem_2_vias(
-                melhores_odds[r1], casas_melhores_odds[r1], r1,
-                melhores_odds[r2], casas_melhores_odds[r2], r2,
-                investimento_total=investimento_desejado)
-            if oportunidade:
-                oportunidade.update({"id_evento": id_evento, "descricao_evento": descricao_evento, "esporte": esporte, "liga": liga, "timestamp": time.time()})
-                oportunidades.append(oportunidade)
-        elif tipo_mercado == "3-vias" and len(resultados_possiveis) == 3:
-            r1, r2, r3 = resultados_possiveis
-            oportunidade = verificar_arbitragem_3_vias(
-                melhores_odds[r1], casas_melhores_odds[r1], r1,
-                melhores_odds[r2], casas_melhores_odds[r2], r2,
-                melhores_odds[r3], casas_melhores_odds[r3], r3,
-                investimento_total=investimento_desejado)
-            if oportunidade:
-                oportunidade.update({"id_evento": id_evento, "descricao_evento": descricao_evento, "esporte": esporte, "liga": liga, "timestamp": time.time()})
-                oportunidades.append(oportunidade)
-    return oportunidades
+def encontrar_oportunidades_arbitragem_reais(dados_odds_api):
+    """Detecta arbitragem em todos os mercados do feed (2, 3 ou N resultados) em uma única chamada vetorizada"""
+    mercados = montar_mercados_ragged(dados_odds_api)
+    melhores_odds, codigo_casa = melhores_precos_ragged(mercados)
+    resultado = avaliar_mercados_ragged(melhores_odds, mercados["offsets"])
+    return ragged_para_oportunidades(mercados, melhores_odds, codigo_casa, resultado)
+
+def encontrar_oportunidades_fontes(fontes):
+    """
+    Busca várias fontes de odds em paralelo e detecta arbitragem em todas de uma vez
+
+    Args:
+        fontes: Lista de FonteOdds (FonteSimulador, FonteSurebetsMongoDB, FonteCSV...)
+
+    Returns:
+        tuple: (oportunidades, status) - status traz, por fonte, se respondeu a tempo
+    """
+    linhas, status = CoordenadorFontes(fontes).buscar_todas()
+    mercados = montar_mercados_de_linhas(linhas)
+    melhores_odds, codigo_casa = melhores_precos_ragged(mercados)
+    resultado = avaliar_mercados_ragged(melhores_odds, mercados["offsets"])
+    return ragged_para_oportunidades(mercados, melhores_odds, codigo_casa, resultado), status
+
+# Fontes extras que podem ser combinadas com os documentos do MongoDB
+FONTES_EXTRAS = {
+    "Simulador da API": lambda timeout: FonteSimulador(timeout=timeout),
+    "CSV Oddspedia": lambda timeout: FonteCSV("surebets_oddspedia.csv", timeout=timeout)
+}
 
 # --- MongoDB Integration ---
+def opcoes_cliente_mongodb(uri):
+    """Opções do MongoClient para a URI (Atlas recebe opções de retry e write concern)"""
+    client_options = {
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT,
+        # Heartbeats alimentam o indicador de status sem consultas extras
+        "event_listeners": [MONITOR_SAUDE]
+    }
+    if "mongodb+srv://" in uri:
+        client_options.update({
+            "retryWrites": True,
+            "w": "majority",
+            "retryReads": True
+        })
+    return client_options
+
+def sondar_mongodb():
+    """Ping usado pelo disjuntor para testar a volta do servidor (roda em segundo plano, sem st.*)"""
+    current_uri = get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI
+    obter_cliente(current_uri, max_pool_size=MONGODB_MAX_POOL_SIZE, **opcoes_cliente_mongodb(current_uri)).admin.command('ping')
+
 def conectar_mongodb():
-    """Estabelece conexão com o MongoDB e retorna o cliente de conexão com retry logic"""
-    retry_count = 0
+    """
+    Obtém o cliente MongoDB compartilhado e verifica a conexão
+
+    O cliente vem do pool do processo (mongodb_pool) e não deve ser fechado.
+    Falhas de conexão vão para o disjuntor compartilhado: depois de
+    MONGODB_MAX_RETRIES falhas seguidas ele abre, esta função passa a devolver
+    None na hora (quem chama usa cache/backup) e a volta do servidor é testada
+    em segundo plano com espera exponencial.
+    """
+    if not DISJUNTOR_MONGO.permitir():
+        return None
+
     # Obter a URI atual de forma segura
     current_uri = get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI
     
     # Detectar se é uma conexão Atlas
     is_atlas = "mongodb+srv://" in current_uri
     
-    while retry_count < MONGODB_MAX_RETRIES:
-        try:
-            # Configurar opções de cliente
-            client_options = {
-                "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT,
-                "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT
-            }
-            
-            # Adicionar opções específicas para MongoDB Atlas
-            if is_atlas:
-                client_options.update({
-                    "retryWrites": True,
-                    "w": "majority",
-                    "retryReads": True
-                })
-            
-            # Configurar a conexão com as opções
-            client = MongoClient(current_uri, **client_options)
+    try:
+        # Cliente compartilhado: só é recriado se a URI ou as opções mudarem
+        client = obter_cliente(current_uri, max_pool_size=MONGODB_MAX_POOL_SIZE, **opcoes_cliente_mongodb(current_uri))
+        
+        # Verificar a conexão com um ping (reaproveita uma conexão do pool)
+        client.admin.command('ping')
+        DISJUNTOR_MONGO.registrar_sucesso()
+        return client
+        
+    except pymongo.errors.ConnectionFailure as e:
+        DISJUNTOR_MONGO.registrar_falha(e, sonda=sondar_mongodb)
+        st.error(f"Erro ao conectar ao MongoDB: {e}")
+        if is_atlas:
+            st.info("Verifique se suas credenciais do MongoDB Atlas estão corretas e se sua rede permite conexões.")
+        else:
+            st.info("Verifique se o servidor MongoDB está rodando e acessível no endereço configurado.")
+        return None
             
-            # Verificar a conexão tentando obter informações do servidor
-            # Isso falha rapidamente se o servidor não estiver acessível
-            client.server_info()
-            return client
+    except pymongo.errors.OperationFailure as e:
+        st.error(f"Falha de autenticação: {e}")
+        st.info("Verifique usuário e senha do MongoDB.")
+        return None
             
-        except pymongo.errors.ServerSelectionTimeoutError as e:
-            retry_count += 1
-            if retry_count >= MONGODB_MAX_RETRIES:
-                st.error(f"Erro ao conectar ao MongoDB após {MONGODB_MAX_RETRIES} tentativas: {e}")
-                if is_atlas:
-                    st.info("Verifique se suas credenciais do MongoDB Atlas estão corretas e se sua rede permite conexões.")
-                else:
-                    st.info("Verifique se o servidor MongoDB está rodando e acessível no endereço configurado.")
-                return None
-            else:
-                st.warning(f"Tentativa {retry_count} de conectar ao MongoDB falhou. Tentando novamente...")
-                time.sleep(1)  # Esperar 1 segundo antes de tentar novamente
-                
-        except pymongo.errors.OperationFailure as e:
-            st.error(f"Falha de autenticação: {e}")
-            st.info("Verifique usuário e senha do MongoDB.")
-            return None
-                
-        except Exception as e:
-            st.error(f"Erro desconhecido ao conectar ao MongoDB: {e}")
-            st.info("Verifique sua configuração de MongoDB e suas credenciais.")
-            return None
-    
-    return None
+    except Exception as e:
+        st.error(f"Erro desconhecido ao conectar ao MongoDB: {e}")
+        st.info("Verifique sua configuração de MongoDB e suas credenciais.")
+        return None
 
-def obter_dados_mongodb():
-    """Obtém dados da coleção definida nas configurações com melhor tratamento de erros"""
+def buscar_surebets_mongodb(consulta, current_uri, database, collection_name):
+    """
+    Busca os documentos da consulta sem usar a interface
+
+    Usada na renovação do cache em segundo plano, fora do contexto da sessão
+    (sem st.* nem st.session_state: a URI, o banco e a coleção são lidos na
+    thread do script e passados aqui). Falhas de conexão vão para o disjuntor
+    e são propagadas.
+
+    Args:
+        consulta: Resultado de montar_consulta_surebets
+        current_uri: URI de conexão da sessão
+        database: Nome do banco
+        collection_name: Nome da coleção
+
+    Returns:
+        list: Documentos encontrados (vazia com o disjuntor aberto)
+    """
+    if not DISJUNTOR_MONGO.permitir():
+        return []
+    client = obter_cliente(current_uri, max_pool_size=MONGODB_MAX_POOL_SIZE, **opcoes_cliente_mongodb(current_uri))
+    cursor = client[database][collection_name].find(consulta["filtro"], consulta["projecao"])
+    if "mongodb+srv://" in current_uri:
+        cursor = cursor.sort(ORDENACAO_LEITURA_LIMITADA).limit(1000)  # Mesmo limite da leitura completa no Atlas
+    try:
+        return list(cursor)
+    except pymongo.errors.ConnectionFailure as e:
+        DISJUNTOR_MONGO.registrar_falha(e, sonda=sondar_mongodb)
+        raise
+
+def obter_dados_mongodb(consulta=None, conjunto=None):
+    """
+    Obtém dados da coleção definida nas configurações com melhor tratamento de erros
+
+    Só devolve documentos lidos do servidor: em caso de falha a lista vem vazia e
+    obter_dados_com_cache usa o cache ou o backup local (origem "cache"/"backup"),
+    sem gravar esses dados de volta no cache compartilhado como se fossem do MongoDB.
+
+    Args:
+        consulta: Resultado de montar_consulta_surebets com filtro e projeção (opcional: todos os documentos)
+        conjunto: ConjuntoIncrementalSurebets para buscar só os documentos novos (opcional)
+    """
+    filtro = consulta["filtro"] if consulta else {}
+    projecao = consulta["projecao"] if consulta else None
     client = conectar_mongodb()
+    if client is None and not DISJUNTOR_MONGO.permitir():
+        # Disjuntor aberto: sem dados do servidor, obter_dados_com_cache usa o cache ou o backup
+        return []
     if client:
         try:
             db = client[MONGODB_DATABASE]
@@ -290,14 +305,20 @@ def obter_dados_mongodb():
             is_atlas = "mongodb+srv://" in current_uri
             
             # Executar a consulta com opções específicas para Atlas ou local
-            if is_atlas:
+            if conjunto is not None:
+                # Só os documentos acima da marca d'água; o conjunto junta com os anteriores
+                dados = conjunto.atualizar(
+                    collection, filtro, projecao,
+                    assinatura=(MONGODB_DATABASE, MONGODB_COLLECTION, assinatura_consulta(consulta)),
+                    limite=1000 if is_atlas else None
+                )
+            elif is_atlas:
                 # Para Atlas, podemos usar opções mais específicas
-                dados = list(collection.find().limit(1000))  # Limitar quantidade para performance
+                dados = list(collection.find(filtro, projecao).sort(ORDENACAO_LEITURA_LIMITADA).limit(1000))  # Limitar quantidade para performance
             else:
                 # Para MongoDB local
-                dados = list(collection.find())
-                
-            client.close()
+                dados = list(collection.find(filtro, projecao))
+            
             
             # Verificar se encontrou dados
             if not dados:
@@ -306,8 +327,9 @@ def obter_dados_mongodb():
                 else:
                     st.warning(f"A coleção '{MONGODB_COLLECTION}' no banco '{MONGODB_DATABASE}' está vazia.")
             
-            # Se temos dados, fazer um backup em CSV
-            if dados:
+            # Backup em CSV da carga completa da busca incremental; nas outras buscas
+            # obter_dados_com_cache já grava o backup junto com o cache
+            if dados and conjunto is not None and conjunto.ultima_variacao["completa"]:
                 try:
                     from mongodb_cache import salvar_dados_csv_backup
                     salvar_dados_csv_backup(dados, "mongodb_backup.csv")
@@ -316,139 +338,125 @@ def obter_dados_mongodb():
             
             return dados
             
+        except pymongo.errors.ConnectionFailure as e:
+            DISJUNTOR_MONGO.registrar_falha(e, sonda=sondar_mongodb)
+            st.error(f"Conexão com o MongoDB perdida durante a consulta: {e}")
         except pymongo.errors.OperationFailure as e:
             st.error(f"Erro de operação no MongoDB: {e}")
             st.info("Verifique se você tem permissões para acessar este banco de dados e coleção.")
-            client.close()
         except Exception as e:
             st.error(f"Erro ao obter dados do MongoDB: {e}")
-            client.close()
-    
-    # Fallback: Tentar usar o CSV local
-    try:
-        st.warning("Tentando usar dados locais de CSV como fallback...")
-        # Tentar primeiro o backup gerado pelo MongoDB
-        csv_file = "mongodb_backup.csv"
-        if not os.path.exists(csv_file):
-            csv_file = "surebets_oddspedia.csv"  # Fallback para o CSV original
-            
-        df = pd.read_csv(csv_file)
-        if not df.empty:
-            # Converter DataFrame para formato similar ao MongoDB
-            dados_fallback = df.to_dict('records')
-            st.success(f"Usando {len(dados_fallback)} registros de dados locais de {csv_file}.")
-            return dados_fallback
-    except Exception as e:
-        st.error(f"Também não foi possível carregar dados de fallback: {e}")
     
+    # Sem dados do servidor: obter_dados_com_cache usa o cache ou o backup local
     return []
 
-def processar_oportunidades_mongodb(dados_mongodb, investimento_desejado=100):
-    """Processa os dados do MongoDB e retorna oportunidades formatadas com melhor tratamento de erros"""
-    oportunidades = []
-    registros_com_erro = 0
-    
-    for item in dados_mongodb:
-        try:
-            # Verifica se há odds válidas para pelo menos 2 resultados
-            if not item.get('odd_1') or not item.get('odd_2'):
-                continue
-                
-            tipo_mercado = "3-vias" if item.get('odd_3') else "2-vias"
-            lucro_percentual = item.get('lucro_percentual', 0)
-            
-            # Converter odds de string para float com tratamento de erros
-            try:
-                # Normalizar diferentes formatos (vírgula/ponto como separador decimal)
-                odds_r1 = float(str(item.get('odd_1', '0')).replace(',', '.'))
-                odds_r2 = float(str(item.get('odd_2', '0')).replace(',', '.'))
-                odds_r3 = float(str(item.get('odd_3', '0')).replace(',', '.')) if item.get('odd_3') else 0
-            except (ValueError, TypeError):
-                registros_com_erro += 1
-                continue
-                
-            # Pular registros com odds inválidas
-            if odds_r1 <= 1 or odds_r2 <= 1 or (tipo_mercado == "3-vias" and odds_r3 <= 1):
-                continue
-                
-            # Calcular probabilidades implícitas
-            prob_impl_r1 = calcular_probabilidade_implicita(odds_r1)
-            prob_impl_r2 = calcular_probabilidade_implicita(odds_r2)
-            prob_impl_r3 = calcular_probabilidade_implicita(odds_r3) if tipo_mercado == "3-vias" else 0
-            
-            soma_probabilidades = prob_impl_r1 + prob_impl_r2
-            if tipo_mercado == "3-vias":
-                soma_probabilidades += prob_impl_r3
-                
-            if soma_probabilidades < 1:
-                retorno_garantido = investimento_desejado / soma_probabilidades
-                stake1 = retorno_garantido / odds_r1
-                stake2 = retorno_garantido / odds_r2
-                
-                if tipo_mercado == "2-vias":
-                    investimento_real_total = stake1 + stake2
-                    nomes_resultados = item.get('linha', 'Casa/Fora').split('/')
-                    if len(nomes_resultados) < 2:
-                        nomes_resultados = ['Casa', 'Fora']  # Padrão se não tiver informação
-                        
-                    oportunidade = {
-                        "tipo_mercado": tipo_mercado,
-                        "oportunidade": True,
-                        "soma_probabilidades_implicitas": soma_probabilidades,
-                        "lucro_percentual_garantido": float(lucro_percentual) if isinstance(lucro_percentual, (int, float, str)) else 0,
-                        "detalhes_apostas": [
-                            {"casa": item.get('casa_1', ''), "resultado": nomes_resultados[0], "odd": odds_r1, 
-                             "stake_sugerido": stake1, "retorno_individual": stake1 * odds_r1},
-                            {"casa": item.get('casa_2', ''), "resultado": nomes_resultados[1], "odd": odds_r2, 
-                             "stake_sugerido": stake2, "retorno_individual": stake2 * odds_r2}
-                        ],
-                        "investimento_total_sugerido": investimento_real_total,
-                        "retorno_garantido": retorno_garantido,
-                        "id_evento": str(item.get('_id', '')),
-                        "descricao_evento": item.get('evento', item.get('times', '')),
-                        "esporte": item.get('esporte', ''),
-                        "liga": item.get('liga', ''),
-                        "timestamp": time.time(),
-                        "data_hora_evento": item.get('data_hora', ''),
-                        "data_extracao": item.get('data_extracao', datetime.now())
-                    }
-                    oportunidades.append(oportunidade)
-                
-                elif tipo_mercado == "3-vias":
-                    stake3 = retorno_garantido / odds_r3
-                    investimento_real_total = stake1 + stake2 + stake3
-                    nomes_resultados = item.get('linha', 'Casa/Empate/Fora').split('/')
-                    if len(nomes_resultados) < 3:
-                        nomes_resultados = ['Casa', 'Empate', 'Fora']  # Padrão se não tiver informação
-                    
-                    oportunidade = {
-                        "tipo_mercado": tipo_mercado,
-                        "oportunidade": True,
-                        "soma_probabilidades_implicitas": soma_probabilidades,
-                        "lucro_percentual_garantido": float(lucro_percentual) if isinstance(lucro_percentual, (int, float, str)) else 0,
-                        "detalhes_apostas": [
-                            {"casa": item.get('casa_1', ''), "resultado": nomes_resultados[0], "odd": odds_r1, 
-                             "stake_sugerido": stake1, "retorno_individual": stake1 * odds_r1},
-                            {"casa": item.get('casa_2', ''), "resultado": nomes_resultados[1], "odd": odds_r2, 
-                             "stake_sugerido": stake2, "retorno_individual": stake2 * odds_r2},
-                            {"casa": item.get('casa_3', ''), "resultado": nomes_resultados[2], "odd": odds_r3, 
-                             "stake_sugerido": stake3, "retorno_individual": stake3 * odds_r3}
-                        ],
-                        "investimento_total_sugerido": investimento_real_total,
-                        "retorno_garantido": retorno_garantido,
-                        "id_evento": str(item.get('_id', '')),
-                        "descricao_evento": item.get('evento', item.get('times', '')),
-                        "esporte": item.get('esporte', ''),
-                        "liga": item.get('liga', ''),
-                        "timestamp": time.time(),
-                        "data_hora_evento": item.get('data_hora', ''),
-                        "data_extracao": item.get('data_extracao', datetime.now())
-                    }
-                    oportunidades.append(oportunidade)
-        except Exception as e:
-            registros_com_erro += 1
-            # Não mostramos o erro na UI para não poluir, mas poderia ser registrado em um log
-            continue
+def calcular_estatisticas_snapshot(snapshot, limiar_lucro=None):
+    """
+    Estatísticas de lucro por esporte e histograma de um snapshot
+
+    Calculadas a partir dos próprios documentos do snapshot, com o mesmo
+    limiar da tabela: a consulta pode ter usado um limiar mais baixo, e os
+    dados da busca incremental e do tempo real não correspondem a uma nova
+    leitura da coleção. Nada é consultado no servidor depois da atualização.
+
+    Args:
+        snapshot: SnapshotDados da atualização atual
+        limiar_lucro: Lucro percentual mínimo da tabela (opcional)
+
+    Returns:
+        dict: Resultado de estatisticas_de_frame
+    """
+    return estatisticas_de_frame(filtrar_lucro_minimo(snapshot.frame, limiar_lucro))
+
+def carregar_oportunidades_em_lotes(consulta, progresso=None):
+    """
+    Lê a coleção em lotes, avaliando e gravando o backup de cada lote assim que ele chega
+
+    Os documentos de um lote são descartados depois de processados, então a
+    memória não acumula documentos brutos, DataFrame e oportunidades ao mesmo tempo.
+
+    Args:
+        consulta: Resultado de montar_consulta_surebets com filtro e projeção
+        progresso: st.empty() onde o andamento e as melhores oportunidades parciais são mostrados (opcional)
+
+    Returns:
+        dict: oportunidades, esportes, ligas, documentos e registros_com_erro,
+            ou None se não foi possível ler do MongoDB
+    """
+    client = conectar_mongodb()
+    if not client:
+        return None
+    current_uri = get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI
+    cursor = client[MONGODB_DATABASE][MONGODB_COLLECTION].find(consulta["filtro"], consulta["projecao"])
+    if "mongodb+srv://" in current_uri:
+        cursor = cursor.sort(ORDENACAO_LEITURA_LIMITADA).limit(1000)  # Mesmo limite da leitura completa no Atlas
+
+    carregado = {
+        "oportunidades": [], "esportes": set(), "ligas": set(),
+        "documentos": 0, "registros_com_erro": 0
+    }
+    melhores = []
+    try:
+        with BackupCSVIncremental("mongodb_backup.csv", colunas=consulta["projecao"].keys()) as backup:
+            for lote in processar_cursor_em_lotes(cursor, backup=backup):
+                documentos = lote["documentos"]
+                carregado["oportunidades"].extend(lote["oportunidades"])
+                carregado["esportes"].update(doc.get('esporte') for doc in documentos if doc.get('esporte'))
+                carregado["ligas"].update(doc.get('liga') for doc in documentos if doc.get('liga'))
+                carregado["documentos"] += len(documentos)
+                carregado["registros_com_erro"] += lote["registros_com_erro"]
+
+                if progresso is not None:
+                    melhores = heapq.nlargest(5, melhores + lote["oportunidades"], key=lambda op: op.lucro_percentual_garantido)
+                    with progresso.container():
+                        st.caption(f"{carregado['documentos']} documentos lidos, {len(carregado['oportunidades'])} oportunidades até agora...")
+                        if melhores:
+                            st.table(pd.DataFrame({
+                                "Evento": [op.descricao_evento for op in melhores],
+                                "Esporte": [op.esporte for op in melhores],
+                                "Lucro (%)": [f"{op.lucro_percentual_garantido:.2f}" for op in melhores]
+                            }))
+    except pymongo.errors.PyMongoError as e:
+        if isinstance(e, pymongo.errors.ConnectionFailure):
+            DISJUNTOR_MONGO.registrar_falha(e, sonda=sondar_mongodb)
+        st.error(f"Erro ao ler dados do MongoDB em lotes: {e}")
+        return None
+    except OSError as e:
+        # Falha ao gravar o backup (disco cheio, permissão): a leitura completa assume
+        st.error(f"Erro ao gravar o backup da leitura em lotes: {e}")
+        return None
+    finally:
+        if progresso is not None:
+            progresso.empty()
+
+    if carregado["documentos"] == 0:
+        st.warning(f"A coleção '{MONGODB_COLLECTION}' no banco '{MONGODB_DATABASE}' está vazia.")
+        return None
+    if carregado["registros_com_erro"] > 0:
+        st.caption(f"Nota: {carregado['registros_com_erro']} registros foram ignorados devido a erros de formato.")
+    return carregado
+
+def processar_oportunidades_mongodb(dados_mongodb, n_shards=1, memo=None):
+    """
+    Processa os dados do MongoDB (ou do CSV de backup) de forma colunar e retorna oportunidades formatadas
+
+    Com n_shards > 1 os documentos são divididos por esporte/liga entre processos.
+    Com `memo` (MemoOportunidades), os mesmos dados (ex: a mesma entrada do
+    cache) não são processados de novo.
+    """
+    def calcular(documentos):
+        # Os stakes saem como frações: mudar o valor investido não exige reprocessar os dados
+        if n_shards > 1:
+            return processar_em_paralelo(documentos, n_shards=n_shards)
+        frame = montar_frame_surebets(documentos)
+        resultado, erros = avaliar_frame_surebets(frame)
+        return frame_para_oportunidades(frame, resultado), erros
+
+    if memo is not None:
+        # n_shards não entra na chave: o resultado em paralelo é idêntico ao serial
+        oportunidades, registros_com_erro = memo.obter(dados_mongodb, calcular)
+    else:
+        oportunidades, registros_com_erro = calcular(dados_mongodb)
     
     # Se houve erros, avisar discretamente
     if registros_com_erro > 0:
@@ -456,8 +464,43 @@ def processar_oportunidades_mongodb(dados_mongodb, investimento_desejado=100):
                 
     return oportunidades
 
-def mostrar_detalhes_oportunidade(oportunidade):
-    """Mostra detalhes de uma oportunidade específica"""
+def atualizar_oportunidades_incrementais(conjunto):
+    """
+    Atualiza as oportunidades aplicando só a última variação da busca incremental
+
+    O motor incremental da sessão guarda os preços de cada documento; só os
+    documentos novos, reenviados ou expirados são recalculados.
+
+    Args:
+        conjunto: ConjuntoIncrementalSurebets já atualizado
+
+    Returns:
+        list: Oportunidades de todos os documentos do conjunto
+    """
+    variacao = conjunto.ultima_variacao
+    if variacao["completa"] or 'motor_incremental' not in st.session_state:
+        st.session_state.motor_incremental = MotorIncrementalArbitragem()
+        novos = conjunto.documentos
+    else:
+        novos = variacao["novos"]
+    aplicar_documentos(st.session_state.motor_incremental, novos, variacao["removidos"])
+    return st.session_state.motor_incremental.oportunidades
+
+def mostrar_detalhes_oportunidade(oportunidade, investimento, arredondamento=None, escalado=None):
+    """
+    Mostra detalhes de uma oportunidade específica com os stakes para o investimento informado
+
+    Args:
+        oportunidade: Oportunidade (ou dict no mesmo formato)
+        investimento: Valor total a ser investido
+        arredondamento: Dict com stakes, investimento_total, retorno_garantido, lucro_percentual
+            e surebet da oportunidade depois do arredondamento (opcional)
+        escalado: Tupla (stakes, retorno_garantido) da oportunidade vinda de escalar_stakes (opcional)
+    """
+    # Oportunidades compactas viram dict só aqui, para as que são exibidas
+    if hasattr(oportunidade, 'para_dict'):
+        stakes, retorno_garantido = escalado if escalado is not None else (None, None)
+        oportunidade = oportunidade.para_dict(investimento, stakes, retorno_garantido)
     st.markdown(f"<h3 style='color:{COR_SECUNDARIA_VERDE};'>🎯 {oportunidade['descricao_evento']} ({oportunidade['esporte']} - {oportunidade['liga']})</h3>", unsafe_allow_html=True)
     
     # Informações de horário e data
@@ -479,8 +522,26 @@ def mostrar_detalhes_oportunidade(oportunidade):
     detalhes_df_display = detalhes_df[['casa', 'resultado', 'odd', 'stake_sugerido', 'retorno_individual']]
     detalhes_df_display['stake_sugerido'] = detalhes_df_display['stake_sugerido'].map(lambda x: f"R$ {x:.2f}")
     detalhes_df_display['retorno_individual'] = detalhes_df_display['retorno_individual'].map(lambda x: f"R$ {x:.2f}")
-    detalhes_df_display.rename(columns={'casa': 'Casa', 'resultado': 'Apostar em', 'odd': 'Odd', 'stake_sugerido': 'Stake', 'retorno_individual': 'Retorno'}, inplace=True)
+    if arredondamento is not None:
+        stakes_arredondados = list(arredondamento['stakes'][:len(detalhes_df)])
+        detalhes_df_display['stake_arredondado'] = [f"R$ {x:.2f}" for x in stakes_arredondados]
+        detalhes_df_display['retorno_arredondado'] = [f"R$ {x * odd:.2f}" for x, odd in zip(stakes_arredondados, detalhes_df['odd'])]
+    detalhes_df_display.rename(columns={
+        'casa': 'Casa', 'resultado': 'Apostar em', 'odd': 'Odd', 'stake_sugerido': 'Stake', 'retorno_individual': 'Retorno',
+        'stake_arredondado': 'Stake Arredondado', 'retorno_arredondado': 'Retorno Arredondado'
+    }, inplace=True)
     st.table(detalhes_df_display.set_index('Casa'))
+
+    if arredondamento is not None:
+        resumo = (f"Com stakes arredondados: investimento R$ {arredondamento['investimento_total']:.2f}, "
+                  f"retorno garantido R$ {arredondamento['retorno_garantido']:.2f} "
+                  f"({arredondamento['lucro_percentual']:.2f}%)")
+        if not math.isclose(arredondamento['investimento_total'], investimento, abs_tol=0.01):
+            resumo += " - investimento ajustado aos limites das casas"
+        if arredondamento['surebet']:
+            st.caption(resumo)
+        else:
+            st.warning(resumo + " - a arbitragem deixa de ser garantida após o arredondamento.")
     
     # Adicionar informações de tempo de extração
     if 'data_extracao' in oportunidade and oportunidade['data_extracao']:
@@ -488,20 +549,14 @@ def mostrar_detalhes_oportunidade(oportunidade):
     
     st.divider()
 
-# Tentar conectar ao MongoDB Atlas logo na inicialização
+# Criar o cliente compartilhado logo na inicialização: o MongoClient conecta em segundo
+# plano e o monitor de saúde recebe os heartbeats, sem bloquear a primeira renderização
 try:
-    client = conectar_mongodb()
-    if client:
-        st.session_state.mongodb_status = True
-        # Fechar a conexão após o teste inicial
-        client.close()
-    else:
-        st.session_state.mongodb_status = False
-except Exception as e:
-    st.session_state.mongodb_status = False
-    
-# Registrar o timestamp da verificação
-st.session_state.last_mongo_check = time.time()
+    current_uri = get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI
+    obter_cliente(current_uri, max_pool_size=MONGODB_MAX_POOL_SIZE, **opcoes_cliente_mongodb(current_uri))
+except pymongo.errors.ConfigurationError:
+    # URI inválida: conectar_mongodb mostra o erro na próxima busca
+    pass
 
 # Aplicar CSS customizado para cores e fontes (básico)
 # Idealmente, usaríamos um config.toml para temas mais completos, mas para uma demo rápida:
@@ -553,14 +608,82 @@ st.caption("Versão com Integração MongoDB - Dados de arbitragem em tempo real
 st.sidebar.markdown(f"<h2 style='color:{COR_TEXTO_BRANCO};'>⚙️ Configurações</h2>", unsafe_allow_html=True)
 investimento_usuario = st.sidebar.number_input("Valor Total para Investir (R$):", min_value=10.0, value=100.0, step=10.0)
 auto_refresh = st.sidebar.checkbox("Atualização Automática", value=True)
+tempo_real = st.sidebar.checkbox("Tempo Real (change streams)", value=False, help="Recebe as mudanças do MongoDB assim que acontecem; sem replica set, faz polling no intervalo abaixo")
 refresh_interval = st.sidebar.slider("Intervalo de Atualização (s):", min_value=5, max_value=60, value=15, step=5)
 limiar_lucro = st.sidebar.slider("Limiar Mínimo de Lucro (%):", min_value=0.1, max_value=10.0, value=0.5, step=0.1)
+# Filtro de casas de apostas (opções vêm das casas do snapshot atual; o índice de preços
+# só é montado quando alguma casa é selecionada)
+snapshot_atual = st.session_state.get('snapshot')
+opcoes_casas = sorted(snapshot_atual.casas) if snapshot_atual is not None else []
+modo_filtro_casas = st.sidebar.radio("Filtro de Casas:", ["Excluir selecionadas", "Apenas minhas contas"], horizontal=True)
+casas_selecionadas = st.sidebar.multiselect(
+    "Casas de Apostas:",
+    options=opcoes_casas
+)
+# Filtros aplicados na consulta ao MongoDB (opções vêm dos dados já carregados)
+esportes_selecionados = st.sidebar.multiselect("Esportes:", options=sorted(st.session_state.get('esportes_disponiveis', set())))
+ligas_selecionadas = st.sidebar.multiselect("Ligas:", options=sorted(st.session_state.get('ligas_disponiveis', set())))
+# Só um limiar menor que o da consulta atual (ou outros filtros) pede nova busca ao servidor;
+# um limiar maior é aplicado localmente aos dados já carregados (oportunidades e tabela)
+filtros_consulta = (tuple(esportes_selecionados), tuple(ligas_selecionadas))
+if filtros_consulta != st.session_state.get('filtros_consulta') or limiar_lucro < st.session_state.limiar_consulta:
+    st.session_state.filtros_consulta = filtros_consulta
+    st.session_state.limiar_consulta = limiar_lucro
+consulta_surebets = montar_consulta_surebets(
+    limiar_lucro=st.session_state.limiar_consulta,
+    esportes=esportes_selecionados,
+    ligas=ligas_selecionadas
+)
+if 'mongodb_cache' not in st.session_state:
+    # Visão da sessão sobre o cache compartilhado do processo (válida por 30 minutos)
+    st.session_state.mongodb_cache = MongoDBCache(max_age_seconds=1800)
+# A visão aponta para a entrada da consulta atual: sessões com os mesmos filtros dividem a busca
+st.session_state.mongodb_cache.chave = chave_cache(
+    get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI,
+    MONGODB_DATABASE, MONGODB_COLLECTION, assinatura_consulta(consulta_surebets)
+)
+# Arredondamento dos stakes: regra padrão e regras próprias de cada casa
+with st.sidebar.expander("Arredondamento de Stakes"):
+    arredondar_ativo = st.checkbox("Arredondar stakes", value=True)
+    incremento_stake = st.number_input("Múltiplo do stake (R$):", min_value=0.01, value=1.0, step=0.5)
+    stake_minimo = st.number_input("Stake mínimo (R$):", min_value=0.0, value=1.0, step=1.0)
+    stake_maximo = st.number_input("Stake máximo (R$, 0 = sem limite):", min_value=0.0, value=0.0, step=10.0,
+                                   help="Se uma aposta passar do máximo, a oportunidade inteira é reduzida para caber")
+    st.caption("Regras por casa (células vazias usam a regra padrão):")
+    tabela_regras_casas = st.data_editor(
+        pd.DataFrame({
+            "casa": pd.Series(dtype=object), "incremento": pd.Series(dtype=float),
+            "minimo": pd.Series(dtype=float), "maximo": pd.Series(dtype=float)
+        }),
+        num_rows="dynamic",
+        key="regras_casas_stake",
+        column_config={
+            "casa": st.column_config.SelectboxColumn("Casa", options=opcoes_casas),
+            "incremento": st.column_config.NumberColumn("Múltiplo (R$)", min_value=0.01),
+            "minimo": st.column_config.NumberColumn("Mínimo (R$)", min_value=0.0),
+            "maximo": st.column_config.NumberColumn("Máximo (R$)", min_value=0.01)
+        }
+    )
+    regra_padrao_stake = {"incremento": incremento_stake, "minimo": stake_minimo,
+                          "maximo": stake_maximo if stake_maximo > 0 else None}
+    regras_casas_stake = regras_de_tabela(tabela_regras_casas)
+# Combinação de fontes: documentos do MongoDB e fontes extras no mesmo passo do motor ragged
+with st.sidebar.expander("Fontes de Odds"):
+    combinar_fontes = st.checkbox("Combinar fontes", value=False,
+                                  help="Junta as odds dos documentos do MongoDB às fontes abaixo e recalcula a arbitragem com o melhor preço de cada resultado")
+    fontes_extras = st.multiselect("Fontes extras:", options=list(FONTES_EXTRAS), disabled=not combinar_fontes)
+    timeout_fontes = st.number_input("Timeout por fonte (s):", min_value=1, max_value=60, value=DEFAULT_TIMEOUT_FONTE, step=1,
+                                     disabled=not combinar_fontes)
+# Processamento paralelo para feeds grandes
+with st.sidebar.expander("Processamento Paralelo"):
+    paralelo_ativo = st.checkbox("Dividir por esporte/liga entre processos", value=False)
+    n_shards = st.number_input("Quantidade de shards:", min_value=2, max_value=64, value=max(2, numero_de_nucleos()), step=1)
 
 # Cache e controle de dados
 with st.sidebar.expander("Controle de Cache"):
     st.markdown("#### Cache de Dados MongoDB")
     
-    # Mostrar status atual do cache
+    # Mostrar status atual do cache (entrada da consulta atual)
     if 'mongodb_cache' in st.session_state:
         cache = st.session_state.mongodb_cache
         if cache.is_valid():
@@ -568,13 +691,19 @@ with st.sidebar.expander("Controle de Cache"):
             st.info(f"Idade do cache: {cache.get_age_seconds() / 60:.1f} minutos")
         else:
             st.warning("Cache expirado ou vazio")
+        # Buscas simultâneas da mesma consulta viram uma só (contadores do processo)
+        metricas_buscas = BUSCAS_COALESCIDAS.metricas()
+        st.caption(f"Buscas ao MongoDB: {metricas_buscas['buscas']} | Aproveitadas de outra sessão: {metricas_buscas['coalescidas']} | "
+                   f"Espera esgotada: {metricas_buscas['tempo_esgotado']} | Falhas em segundo plano: {metricas_buscas['falhas_segundo_plano']}")
+        # Processamentos evitados porque os dados brutos não mudaram
+        metricas_memo = MEMO_OPORTUNIDADES.metricas()
+        st.caption(f"Processamento reaproveitado: {metricas_memo['acertos']} | Processado de novo: {metricas_memo['falhas']}")
         
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Limpar Cache"):
                 cache.invalidate()
                 st.success("Cache invalidado!")
-                st.session_state.data_source = "sem dados"
                 st.experimental_rerun()
         
         with col2:
@@ -587,6 +716,18 @@ with st.sidebar.expander("Controle de Cache"):
                 step=5
             )
             cache.max_age_seconds = tempo_cache * 60  # Converter para segundos
+        
+        # Stale-while-revalidate: cache expirado é exibido na hora e renovado em segundo plano
+        revalidacao_segundo_plano = st.checkbox("Atualizar cache em segundo plano", value=True,
+                                                help="Mostra o cache expirado enquanto a busca roda; acima do limite abaixo a busca volta a ser feita na hora")
+        idade_maxima_obsoleta_min = st.number_input("Usar cache expirado por até (min)", min_value=1, max_value=360, value=60, step=5,
+                                                    disabled=not revalidacao_segundo_plano)
+    
+    # Busca incremental: cada atualização pede ao MongoDB só os documentos novos
+    busca_incremental = st.checkbox("Busca incremental (apenas documentos novos)", value=False)
+    # Leitura em lotes: processa cada lote do cursor assim que chega (sem passar pelo cache)
+    leitura_em_lotes = st.checkbox("Leitura em lotes (streaming)", value=False, disabled=busca_incremental)
+    idade_maxima_horas = st.number_input("Descartar documentos após (h):", min_value=1, max_value=48, value=2, step=1)
 
 # Configurações MongoDB (colapsado por padrão)
 with st.sidebar.expander("Configurações do MongoDB"):
@@ -693,6 +834,9 @@ with st.sidebar.expander("Configurações do MongoDB"):
             MONGODB_CONNECT_TIMEOUT = mongodb_timeout
             MONGODB_SERVER_SELECTION_TIMEOUT = mongodb_timeout
             MONGODB_MAX_RETRIES = mongodb_max_retries
+            # Novas configurações: o disjuntor volta a liberar consultas para testá-las
+            DISJUNTOR_MONGO.limiar_falhas = mongodb_max_retries
+            DISJUNTOR_MONGO.reiniciar()
             
             st.success("Configurações atualizadas com sucesso!")
             
@@ -754,6 +898,16 @@ with st.sidebar.expander("Configurações do MongoDB"):
                         )
                         exibir_status_banco_colecao(resultado_verificacao)
 
+    # Índices que atendem os filtros de lucro, esporte/liga e data das consultas
+    if st.button("Criar Índices Recomendados"):
+        client = conectar_mongodb()
+        if client:
+            try:
+                nomes_indices = criar_indices_recomendados(client[MONGODB_DATABASE][MONGODB_COLLECTION])
+                st.success(f"Índices disponíveis: {', '.join(nomes_indices)}")
+            except pymongo.errors.OperationFailure as e:
+                st.error(f"Não foi possível criar os índices: {e}")
+
 # Botão para atualização manual
 col1_main, col2_main, col3_main = st.columns([3, 1, 1])
 with col1_main:
@@ -761,72 +915,167 @@ with col1_main:
 with col2_main:
     manual_refresh = st.button("Atualizar Agora")
 with col3_main:
-    # Verificação rápida do status do MongoDB para o indicador
-    if 'mongodb_status' not in st.session_state:
-        st.session_state.mongodb_status = False
-    
-    # Executamos a verificação apenas periodicamente para não sobrecarregar
-    if time.time() - st.session_state.get('last_mongo_check', 0) > 60:  # verificar a cada 60 segundos
-        try:
-            # Obter a URI atual de forma segura
-            current_uri = get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI
-            
-            # Verificação rápida sem mostrar erros na UI
-            cliente = MongoClient(
-                current_uri,
-                connectTimeoutMS=2000,  # timeout mais curto para ser rápido
-                serverSelectionTimeoutMS=2000
-            )
-            cliente.server_info()
-            st.session_state.mongodb_status = True
-            cliente.close()
-        except:
-            st.session_state.mongodb_status = False
-        st.session_state.last_mongo_check = time.time()
-    
-    # Mostrar o indicador de status
+    # Indicador de status lido do monitor de heartbeats (sem consultar o servidor aqui)
+    saude = obter_estado_saude()
     is_atlas = "mongodb+srv://" in MONGODB_URI
     connection_type = "MongoDB Atlas" if is_atlas else "MongoDB Local"
     
-    if st.session_state.mongodb_status:
-        st.markdown(f"<h5 style='color:{COR_SECUNDARIA_VERDE};'>●</h5> {connection_type} Conectado", unsafe_allow_html=True)
-    else:
+    if saude["status"] == STATUS_CONECTADO:
+        latencia = f" ({saude['rtt_ms']:.0f} ms)" if saude["rtt_ms"] is not None else ""
+        st.markdown(f"<h5 style='color:{COR_SECUNDARIA_VERDE};'>●</h5> {connection_type} Conectado{latencia}", unsafe_allow_html=True)
+    elif saude["status"] == STATUS_DESCONECTADO:
         st.markdown(f"<h5 style='color:red;'>●</h5> {connection_type} Desconectado", unsafe_allow_html=True)
+        if saude["ultimo_erro"]:
+            st.caption(f"Último erro ({datetime.fromtimestamp(saude['ultimo_erro_em']).strftime('%H:%M:%S')}): {saude['ultimo_erro']}")
+    else:
+        st.markdown(f"<h5 style='color:orange;'>●</h5> {connection_type} Verificando...", unsafe_allow_html=True)
+    
+    # Com o disjuntor aberto, os dados vêm do cache/backup até o teste em segundo plano passar
+    disjuntor = DISJUNTOR_MONGO.estado()
+    if disjuntor["estado"] != ESTADO_FECHADO:
+        if disjuntor["proximo_teste"] is not None and disjuntor["estado"] == ESTADO_ABERTO:
+            st.caption(f"Usando cache/backup; nova tentativa em {max(0, disjuntor['proximo_teste'] - time.time()):.0f}s")
+        else:
+            st.caption("Usando cache/backup; testando a conexão...")
 
 if 'last_refresh' not in st.session_state:
     st.session_state.last_refresh = 0
 if 'odds_data' not in st.session_state:
     st.session_state.odds_data = None
-if 'oportunidades' not in st.session_state:
-    st.session_state.oportunidades = []
-if 'mongodb_cache' not in st.session_state:
-    # Inicializar cache do MongoDB (válido por 30 minutos)
-    st.session_state.mongodb_cache = MongoDBCache(max_age_seconds=1800)
-if 'mongodb_status' not in st.session_state:
-    st.session_state.mongodb_status = False
-if 'last_mongo_check' not in st.session_state:
-    st.session_state.last_mongo_check = 0
-if 'data_source' not in st.session_state:
-    st.session_state.data_source = "sem dados"
+if 'snapshot' not in st.session_state:
+    # Dados da última atualização (oportunidades, tabela, estatísticas); None até a primeira
+    st.session_state.snapshot = None
+if 'assinatura_consulta' not in st.session_state:
+    st.session_state.assinatura_consulta = None
+if 'esportes_disponiveis' not in st.session_state:
+    st.session_state.esportes_disponiveis = set()
+if 'ligas_disponiveis' not in st.session_state:
+    st.session_state.ligas_disponiveis = set()
+if 'conjunto_surebets' not in st.session_state:
+    st.session_state.conjunto_surebets = ConjuntoIncrementalSurebets()
+st.session_state.conjunto_surebets.max_idade_segundos = idade_maxima_horas * 3600
 
 current_time = time.time()
-should_refresh = manual_refresh or (auto_refresh and (current_time - st.session_state.last_refresh) > refresh_interval)
+# Filtros diferentes dos usados na última busca: os dados precisam vir de novo do servidor
+consulta_alterada = assinatura_consulta(consulta_surebets) != st.session_state.assinatura_consulta
+should_refresh = manual_refresh or consulta_alterada or (auto_refresh and (current_time - st.session_state.last_refresh) > refresh_interval)
+# Renovação em segundo plano terminou: o próximo rerun já mostra a versão nova do cache
+if (not should_refresh and revalidacao_segundo_plano and st.session_state.snapshot is not None
+        and st.session_state.snapshot.origem == "cache"
+        and st.session_state.mongodb_cache.get_timestamp() > st.session_state.get('timestamp_cache_exibido', 0)):
+    should_refresh = True
+
+# Tempo real: as oportunidades vêm do ouvinte em segundo plano, sem consultar a coleção a cada rerun
+ouvinte = None
+if tempo_real:
+    client = conectar_mongodb()
+    if client:
+        collection = client[MONGODB_DATABASE][MONGODB_COLLECTION]
+        chave = chave_ouvinte(collection, consulta_surebets["filtro"], consulta_surebets["projecao"], refresh_interval)
+        referencia = st.session_state.get('referencia_ouvinte')
+        if referencia is None or referencia.chave != chave:
+            # Filtros mudaram: devolve o ouvinte anterior (que segue ativo se outras sessões o usam)
+            if referencia is not None:
+                referencia.liberar()
+            referencia = st.session_state.referencia_ouvinte = adquirir_ouvinte(
+                collection,
+                consulta_surebets["filtro"],
+                consulta_surebets["projecao"],
+                intervalo_polling=refresh_interval
+            )
+        ouvinte = referencia.ouvinte
+        ouvinte.iniciar()  # Reinicia se a thread tiver terminado
+        # Novo snapshot só quando o ouvinte aplicou mudanças; reruns de widgets reaproveitam o atual
+        versao, oportunidades_ao_vivo, documentos_ao_vivo = ouvinte.conjunto.instantaneo()
+        if st.session_state.get('versao_tempo_real') != versao or st.session_state.snapshot is None:
+            st.session_state.snapshot = SnapshotDados(
+                oportunidades_ao_vivo, documentos_ao_vivo,
+                origem=f"tempo real ({ouvinte.modo or 'iniciando'})", consulta=consulta_surebets
+            )
+            st.session_state.versao_tempo_real = versao
+        st.session_state.last_refresh = current_time
+        should_refresh = False
+        st.session_state.tempo_real_ativo = True
+elif st.session_state.get('tempo_real_ativo'):
+    # Devolve a referência da sessão: o ouvinte só para quando ninguém mais o usa
+    referencia = st.session_state.pop('referencia_ouvinte', None)
+    if referencia is not None:
+        referencia.liberar()
+    st.session_state.tempo_real_ativo = False
+
+# Leitura em lotes: as oportunidades aparecem enquanto o cursor ainda está sendo lido
+if should_refresh and leitura_em_lotes and not busca_incremental:
+    with st.spinner("Lendo surebets do MongoDB em lotes..."):
+        carregado = carregar_oportunidades_em_lotes(consulta_surebets, st.empty())
+    if carregado is not None:
+        st.session_state.pop('motor_incremental', None)
+        # Os documentos não ficam em memória: a tabela (e o índice do filtro de casas) leem o backup gravado durante a leitura
+        st.session_state.snapshot = SnapshotDados(
+            carregado["oportunidades"], origem="mongodb", consulta=consulta_surebets,
+            arquivo_documentos="mongodb_backup.csv"
+        )
+        st.session_state.esportes_disponiveis.update(carregado["esportes"])
+        st.session_state.ligas_disponiveis.update(carregado["ligas"])
+        st.session_state.assinatura_consulta = assinatura_consulta(consulta_surebets)
+        st.session_state.last_refresh = current_time
+        st.success(f"Dados lidos em lotes ({carregado['documentos']} documentos)! {len(carregado['oportunidades'])} oportunidades encontradas.")
+        # Já atualizado: a leitura completa abaixo fica só como alternativa em caso de falha
+        should_refresh = False
 
 if should_refresh:
     with st.spinner("Carregando dados de surebets do MongoDB..."):
         try:
             # Obter dados do MongoDB com cache
+            conjunto = st.session_state.conjunto_surebets if busca_incremental else None
+            # Lidos aqui, na thread do script: a renovação em segundo plano não acessa a sessão
+            uri_sessao = get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI
+            database_sessao, collection_sessao = MONGODB_DATABASE, MONGODB_COLLECTION
             dados_mongodb, origem_dados, status = obter_dados_com_cache(
-                obter_dados_mongodb,  # Função original para obter dados
+                lambda: obter_dados_mongodb(consulta_surebets, conjunto),
                 cache_instance=st.session_state.mongodb_cache,
-                force_refresh=manual_refresh  # Forçar atualização apenas no botão manual
+                # Botão manual, filtros alterados ou busca incremental (barata) sempre consultam o servidor
+                force_refresh=manual_refresh or consulta_alterada or busca_incremental,
+                # A busca incremental depende do conjunto da sessão: não pode ser dividida com outras
+                coalescer=not busca_incremental,
+                persistir=not busca_incremental,
+                idade_maxima_obsoleta=idade_maxima_obsoleta_min * 60 if revalidacao_segundo_plano else None,
+                obter_func_segundo_plano=lambda: buscar_surebets_mongodb(consulta_surebets, uri_sessao, database_sessao, collection_sessao)
             )
+            if origem_dados == "cache":
+                # Versão do cache exibida: a renovação em segundo plano é detectada por ela
+                st.session_state.timestamp_cache_exibido = st.session_state.mongodb_cache.get_timestamp()
+            st.session_state.assinatura_consulta = assinatura_consulta(consulta_surebets)
             
             if status and dados_mongodb:
-                # Processar os dados em oportunidades
-                st.session_state.oportunidades = processar_oportunidades_mongodb(dados_mongodb, investimento_usuario)
+                # Opções dos filtros de esporte/liga acumulam o que já foi visto
+                st.session_state.esportes_disponiveis.update(doc.get('esporte') for doc in dados_mongodb if doc.get('esporte'))
+                st.session_state.ligas_disponiveis.update(doc.get('liga') for doc in dados_mongodb if doc.get('liga'))
+                # Processar os dados em oportunidades (na busca incremental, só os documentos novos)
+                shards_processamento = int(n_shards) if paralelo_ativo else 1
+                if conjunto is not None and origem_dados == "mongodb":
+                    oportunidades = atualizar_oportunidades_incrementais(conjunto)
+                else:
+                    st.session_state.pop('motor_incremental', None)
+                    # Mesma entrada do cache (nesta ou em outra sessão): reaproveita o processamento
+                    oportunidades = processar_oportunidades_mongodb(dados_mongodb, n_shards=shards_processamento, memo=MEMO_OPORTUNIDADES)
+                if combinar_fontes:
+                    # Os documentos já buscados entram como mais uma fonte: o MongoDB não é consultado de novo
+                    fontes = [FonteSurebetsMongoDB(lambda: dados_mongodb, timeout=timeout_fontes)]
+                    fontes += [FONTES_EXTRAS[nome](timeout_fontes) for nome in fontes_extras]
+                    oportunidades, status_fontes = encontrar_oportunidades_fontes(fontes)
+                    for nome_fonte, status_fonte in status_fontes.items():
+                        if not status_fonte["ok"]:
+                            st.warning(f"Fonte '{nome_fonte}' ignorada: {status_fonte['erro']}")
+                    st.caption(" | ".join(
+                        f"{nome_fonte}: {status_fonte['linhas']} preços em {status_fonte['tempo']:.1f}s"
+                        for nome_fonte, status_fonte in status_fontes.items() if status_fonte["ok"]
+                    ))
+                # O índice top-K do filtro de casas é montado pelo snapshot no primeiro uso
+                st.session_state.snapshot = SnapshotDados(
+                    oportunidades, dados_mongodb, origem=origem_dados,
+                    consulta=consulta_surebets if origem_dados == "mongodb" else None
+                )
                 st.session_state.last_refresh = current_time
-                st.session_state.data_source = origem_dados
                 
                 # Mensagem adaptativa baseada na origem dos dados
                 if origem_dados == "mongodb":
@@ -836,13 +1085,14 @@ if should_refresh:
                     # Indica se é MongoDB Atlas ou local
                     is_atlas = "mongodb+srv://" in current_uri
                     mongodb_type = "MongoDB Atlas" if is_atlas else "MongoDB Local"
-                    st.success(f"Dados atualizados de {mongodb_type}! {len(st.session_state.oportunidades)} oportunidades encontradas.")
+                    st.success(f"Dados atualizados de {mongodb_type}! {len(st.session_state.snapshot)} oportunidades encontradas.")
                 elif origem_dados == "cache":
                     # Mostrar idade do cache
                     cache_age = st.session_state.mongodb_cache.get_age_seconds() / 60  # em minutos
-                    st.info(f"Usando dados em cache (de {cache_age:.1f} minutos atrás). {len(st.session_state.oportunidades)} oportunidades.")
+                    renovando = "" if st.session_state.mongodb_cache.is_valid() else " Atualizando em segundo plano..."
+                    st.info(f"Usando dados em cache (de {cache_age:.1f} minutos atrás). {len(st.session_state.snapshot)} oportunidades.{renovando}")
                 elif origem_dados == "backup":
-                    st.warning(f"Usando dados de backup local. {len(st.session_state.oportunidades)} oportunidades.")
+                    st.warning(f"Usando dados de backup local. {len(st.session_state.snapshot)} oportunidades.")
             else:
                 st.error("Não foi possível obter dados do MongoDB, cache ou backup.")
         except Exception as e:
@@ -853,19 +1103,36 @@ if should_refresh:
     current_uri = get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI
     is_atlas = "mongodb+srv://" in current_uri
     db_type = "MongoDB Atlas" if is_atlas else "MongoDB"
-    st.caption(f"Última atualização: {datetime.fromtimestamp(current_time).strftime('%H:%M:%S')} | Fonte: {st.session_state.data_source} ({db_type})")
-elif st.session_state.oportunidades:
+    st.caption(f"Última atualização: {datetime.fromtimestamp(current_time).strftime('%H:%M:%S')} | Fonte: {st.session_state.snapshot.origem if st.session_state.snapshot is not None else 'sem dados'} ({db_type})")
+elif st.session_state.snapshot is not None and st.session_state.snapshot.oportunidades:
     # Se não estiver atualizando, mostrar de onde vieram os dados atualmente exibidos
     idade_dados = (current_time - st.session_state.last_refresh) / 60  # em minutos
     # Obter a URI atual de forma segura
     current_uri = get_mongodb_atlas_uri() if "mongodb+srv://" in MONGODB_URI else MONGODB_URI
     is_atlas = "mongodb+srv://" in current_uri
     db_type = "MongoDB Atlas" if is_atlas else "MongoDB"
-    st.caption(f"Dados de {idade_dados:.1f} minutos atrás | Fonte: {st.session_state.data_source} ({db_type})")
+    st.caption(f"Dados de {idade_dados:.1f} minutos atrás | Fonte: {st.session_state.snapshot.origem} ({db_type})")
 
 st.markdown(f"<h2 style='color:{COR_TEXTO_BRANCO};'>🚨 Oportunidades de Arbitragem</h2>", unsafe_allow_html=True)
-if st.session_state.oportunidades:
-    oportunidades_filtradas = [op for op in st.session_state.oportunidades if op["lucro_percentual_garantido"] >= limiar_lucro]
+snapshot = st.session_state.snapshot
+if snapshot is not None and snapshot.oportunidades:
+    # Oportunidades e a sua tabela (frações de stake, lucro, esporte, liga) montadas uma vez por snapshot;
+    # com filtro de casas, recalculadas pelo índice top-K uma vez por filtro
+    if casas_selecionadas:
+        if modo_filtro_casas == "Excluir selecionadas":
+            oportunidades_base, tabela = snapshot.oportunidades_com_casas(casas_excluidas=casas_selecionadas)
+        else:
+            oportunidades_base, tabela = snapshot.oportunidades_com_casas(casas_permitidas=casas_selecionadas)
+    else:
+        oportunidades_base, tabela = snapshot.oportunidades, snapshot.tabela
+    # Os filtros já vão na consulta ao MongoDB; aqui valem para cache/backup e lucros em texto
+    mascara = tabela["lucro"] >= limiar_lucro
+    if esportes_selecionados:
+        mascara &= np.isin(tabela["esporte"], esportes_selecionados)
+    if ligas_selecionadas:
+        mascara &= np.isin(tabela["liga"], ligas_selecionadas)
+    posicoes = np.flatnonzero(mascara)
+    oportunidades_filtradas = [oportunidades_base[i] for i in posicoes]
     if oportunidades_filtradas:
         # Criar seletor de oportunidade
         opcoes_oportunidades = [f"{op['descricao_evento']} - {op['lucro_percentual_garantido']:.2f}% ({op['esporte']})" for op in oportunidades_filtradas]
@@ -873,13 +1140,37 @@ if st.session_state.oportunidades:
                                       options=range(len(opcoes_oportunidades)),
                                       format_func=lambda i: opcoes_oportunidades[i])
         
+        # Stakes e retornos das oportunidades filtradas: linhas da matriz do snapshot e uma multiplicação
+        fracoes, retorno_por_unidade = tabela["matriz"]
+        matriz = (fracoes[posicoes], retorno_por_unidade[posicoes])
+        stakes_escalados, retornos_escalados = escalar_stakes(matriz, investimento_usuario)
+        
+        def arredondar_exibidas(linhas):
+            """Arredonda os stakes só das oportunidades exibidas (linhas de oportunidades_filtradas)"""
+            if not arredondar_ativo:
+                return [None] * len(linhas)
+            arredondado = arredondar_stakes(
+                [oportunidades_filtradas[i] for i in linhas], investimento_usuario,
+                regras_casas=regras_casas_stake,
+                regra_padrao=regra_padrao_stake,
+                matriz=(matriz[0][linhas], matriz[1][linhas])
+            )
+            return [
+                {chave: valores[j] for chave, valores in arredondado.items()}
+                for j in range(len(linhas))
+            ]
+        
         # Mostrar detalhes da oportunidade selecionada
-        mostrar_detalhes_oportunidade(oportunidades_filtradas[indice_selecionado])
+        mostrar_detalhes_oportunidade(
+            oportunidades_filtradas[indice_selecionado], investimento_usuario, arredondar_exibidas([indice_selecionado])[0],
+            (stakes_escalados[indice_selecionado], retornos_escalados[indice_selecionado])
+        )
         
         # Opção para mostrar todas as oportunidades
         if st.checkbox("Mostrar todas as oportunidades"):
-            for op in oportunidades_filtradas:
-                mostrar_detalhes_oportunidade(op)
+            arredondamentos = arredondar_exibidas(list(range(len(oportunidades_filtradas))))
+            for op, arredondamento, stakes_op, retorno_op in zip(oportunidades_filtradas, arredondamentos, stakes_escalados, retornos_escalados):
+                mostrar_detalhes_oportunidade(op, investimento_usuario, arredondamento, (stakes_op, retorno_op))
     else:
         st.info(f"Nenhuma oportunidade de arbitragem encontrada com lucro acima de {limiar_lucro}%.")
 else:
@@ -887,14 +1178,11 @@ else:
 
 st.markdown(f"<h2 style='color:{COR_TEXTO_BRANCO};'>📊 Visualização de Dados de MongoDB</h2>", unsafe_allow_html=True)
 
-# Obter dados brutos do MongoDB para visualização
+# Dados brutos do snapshot atual: nenhuma consulta extra ao MongoDB a cada rerun
 with st.expander("Dados de Oportunidades no MongoDB"):
     try:
-        dados_mongodb_raw = obter_dados_mongodb()
-        if dados_mongodb_raw:
-            # Converter para DataFrame para visualização
-            df_mongo = pd.DataFrame(dados_mongodb_raw)
-            
+        df_mongo = filtrar_lucro_minimo(snapshot.frame, limiar_lucro) if snapshot is not None else pd.DataFrame()
+        if not df_mongo.empty:
             # Selecionar colunas relevantes para exibição
             colunas_exibir = ['esporte', 'liga', 'evento', 'data_hora', 'linha', 
                             'odd_1', 'casa_1', 'odd_2', 'casa_2', 'odd_3', 'casa_3', 
@@ -917,20 +1205,19 @@ with st.expander("Dados de Oportunidades no MongoDB"):
                                                             props=f'color:{COR_TEXTO_CINZA_ESCURO}; background-color:{COR_DESTAQUE_DOURADO};'),
                                 use_container_width=True)
                     
-                    # Mostrar estatísticas
-                    st.markdown(f"**Estatísticas de Lucro por Esporte:**")
-                    df_stats = df_mongo.groupby('esporte')['lucro_percentual'].agg(['mean', 'max', 'count']).reset_index()
-                    df_stats.columns = ['Esporte', 'Lucro Médio (%)', 'Lucro Máximo (%)', 'Quantidade de Oportunidades']
-                    df_stats['Lucro Médio (%)'] = df_stats['Lucro Médio (%)'].map(lambda x: f"{x:.2f}%")
-                    df_stats['Lucro Máximo (%)'] = df_stats['Lucro Máximo (%)'].map(lambda x: f"{x:.2f}%")
-                    st.table(df_stats.set_index('Esporte'))
-                    
-                    # Gráfico de distribuição de lucro
-                    if not df_mongo.empty and 'lucro_percentual' in df_mongo.columns:
-                        st.markdown("**Distribuição de Lucro Percentual:**")
-                        hist_data = df_mongo['lucro_percentual'].dropna()
-                        if not hist_data.empty:
-                            st.bar_chart(hist_data.value_counts(bins=10).sort_index())
+                    # Estatísticas calculadas uma vez por snapshot e limiar, com os mesmos documentos da tabela
+                    estatisticas = snapshot.estatisticas(calcular_estatisticas_snapshot, limiar_lucro)
+                    if estatisticas is not None:
+                        st.markdown(f"**Estatísticas de Lucro por Esporte:**")
+                        df_stats = estatisticas["por_esporte"].copy()
+                        df_stats['Lucro Médio (%)'] = df_stats['Lucro Médio (%)'].map(lambda x: f"{x:.2f}%")
+                        df_stats['Lucro Máximo (%)'] = df_stats['Lucro Máximo (%)'].map(lambda x: f"{x:.2f}%")
+                        st.table(df_stats.set_index('Esporte'))
+                        
+                        # Gráfico de distribuição de lucro
+                        if not estatisticas["distribuicao"].empty:
+                            st.markdown("**Distribuição de Lucro Percentual:**")
+                            st.bar_chart(estatisticas["distribuicao"])
                 else:
                     st.warning("Não há dados de esportes disponíveis.")
             else:
@@ -963,3 +1250,17 @@ with st.sidebar.expander("🔒 Segurança"):
 # Adicionar seção de variáveis de ambiente
 with st.sidebar.expander("🔑 Variáveis de Ambiente"):
     display_environment_variables()
+
+# Tempo real: espera a próxima mudança do ouvinte e roda o script de novo
+if ouvinte is not None:
+    aviso_tempo_real = st.empty()
+    limite_espera = time.time() + refresh_interval
+    while time.time() < limite_espera:
+        if ouvinte.conjunto.aguardar_mudanca(st.session_state.versao_tempo_real, timeout=0.5) != st.session_state.versao_tempo_real:
+            break
+        # Cada chamada ao Streamlit permite interromper a espera quando o usuário interage com a página
+        aviso_tempo_real.caption(f"Tempo real ({ouvinte.modo or 'iniciando'}): aguardando mudanças...")
+    if hasattr(st, "rerun"):
+        st.rerun()
+    else:
+        st.experimental_rerun()
@@ -0,0 +1,81 @@
+"""
+Testes do arredondamento de stakes com limites por casa (pytest)
+"""
+import numpy as np
+import pandas as pd
+from arbitrage_opportunity import Oportunidade
+from arbitrage_stakes import arredondar_stakes, regras_de_tabela
+
+
+def _oportunidade(odds, casas=('a', 'b')):
+    """Oportunidade de 2 vias com as frações de stake proporcionais às odds"""
+    soma = sum(1.0 / odd for odd in odds)
+    return Oportunidade(casas, ['Casa', 'Fora'], odds, [1.0 / (odd * soma) for odd in odds], soma, (1.0 / soma - 1) * 100)
+
+
+def test_maximo_escala_a_oportunidade_inteira():
+    resultado = arredondar_stakes([_oportunidade([2.1, 2.1])], 100, regras_casas={'b': {'maximo': 40}})
+
+    assert resultado['stakes'][0].tolist() == [40.0, 40.0]
+    assert resultado['investimento_total'][0] == 80.0
+    assert np.isclose(resultado['lucro'][0], 4.0)
+    assert resultado['surebet'][0]
+
+
+def test_maximo_com_odds_diferentes_continua_lucrativo():
+    resultado = arredondar_stakes([_oportunidade([2.05, 2.0])], 100, regras_casas={'b': {'maximo': 40}})
+
+    assert resultado['stakes'][0].tolist() == [39.0, 40.0]
+    assert resultado['lucro'][0] > 0
+    assert resultado['surebet'][0]
+
+
+def test_maximo_padrao_vale_para_todas_as_casas():
+    resultado = arredondar_stakes([_oportunidade([2.1, 2.1])], 100, regra_padrao={'maximo': 30})
+
+    assert resultado['stakes'][0].tolist() == [30.0, 30.0]
+    assert resultado['surebet'][0]
+
+
+def test_minimo_aumenta_o_investimento_ate_caber():
+    resultado = arredondar_stakes([_oportunidade([2.1, 2.1])], 10, regras_casas={'b': {'minimo': 20}})
+
+    assert resultado['stakes'][0].tolist() == [20.0, 20.0]
+    assert np.isclose(resultado['lucro'][0], 2.0)
+    assert resultado['surebet'][0]
+
+
+def test_minimo_e_maximo_incompativeis_nao_viram_surebet():
+    # a precisa de pelo menos 50 e b aceita no máximo 10 com odds iguais: não há alocação lucrativa
+    resultado = arredondar_stakes(
+        [_oportunidade([2.1, 2.1])], 100,
+        regras_casas={'a': {'minimo': 50}, 'b': {'maximo': 10}}
+    )
+
+    assert resultado['stakes'][0, 0] >= 50
+    assert resultado['stakes'][0, 1] <= 10
+    assert not resultado['surebet'][0]
+
+
+def test_sem_limites_mantem_o_investimento():
+    resultado = arredondar_stakes([_oportunidade([2.1, 2.1])], 100)
+
+    assert resultado['stakes'][0].tolist() == [50.0, 50.0]
+    assert resultado['investimento_total'][0] == 100.0
+
+
+def test_incremento_por_casa():
+    resultado = arredondar_stakes([_oportunidade([2.1, 2.1])], 100, regras_casas={'a': {'incremento': 5, 'minimo': 5}})
+
+    assert resultado['stakes'][0, 0] % 5 == 0
+
+
+def test_regras_de_tabela_ignora_celulas_vazias():
+    tabela = pd.DataFrame({
+        'casa': ['a', 'b', None],
+        'incremento': [0.5, np.nan, 1.0],
+        'minimo': [np.nan, 2.0, 1.0],
+        'maximo': [100.0, np.nan, np.nan]
+    })
+
+    assert regras_de_tabela(tabela) == {'a': {'incremento': 0.5, 'maximo': 100.0}, 'b': {'minimo': 2.0}}